@@ -2,18 +2,113 @@ from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import DBAPIError, OperationalError
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
+from utils.log import get_logger
+
 load_dotenv()
 
+logger = get_logger("db")
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica for dashboard/list queries; falls back to the primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg prepared statement cache per connection (0 disables, needed behind pgbouncer)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE", str(DB_POOL_SIZE)))
+
+
+def _engine_options(url: str, pool_size: int) -> dict:
+    """Build create_async_engine keyword arguments for a database URL"""
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+    # SQLite (local development) uses a single-connection pool without sizing options
+    if url.startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=pool_size,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if "asyncpg" in url:
+        options["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL, DB_POOL_SIZE))
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+if DATABASE_REPLICA_URL:
+    read_engine = create_async_engine(
+        DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL, DB_REPLICA_POOL_SIZE)
+    )
+    async_read_session = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+else:
+    read_engine = engine
+    async_read_session = async_session
+
+
+@asynccontextmanager
+async def read_session():
+    """
+    Session for read-only paths (list/detail endpoints, dashboards)
+
+    Uses the replica when DATABASE_REPLICA_URL is set. If the replica cannot
+    be reached the session is opened on the primary instead.
+    """
+    if async_read_session is async_session:
+        async with async_session() as session:
+            yield session
+        return
+
+    session = async_read_session()
+    try:
+        await session.connection()
+    except (OperationalError, DBAPIError, OSError) as e:
+        logger.warning("Read replica unavailable, falling back to primary: %s", e)
+        await session.close()
+        session = async_session()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_read_session():
+    """FastAPI dependency wrapper around read_session()"""
+    async with read_session() as session:
+        yield session
+
+
 async def init_db():
     async with engine.begin() as conn:
         # Create all tables if they don't exist
         # For schema changes, a proper migration tool (e.g., Alembic) should be used.
         await conn.run_sync(SQLModel.metadata.create_all)
+        # create_all skips existing tables, so add indexes introduced since
+        await conn.run_sync(_create_missing_indexes)
+
+
+def _create_missing_indexes(sync_conn):
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def close_db():
+    """Dispose connection pools on shutdown"""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
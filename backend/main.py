@@ -6,15 +6,31 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 from importlib import import_module
-import logging # For logging
-import traceback # For logging stack trace
 
 from routes.rules import router as rules_router
 from routes.webhooks import router as webhook_router
 from routes.integrations import router as integrations_router
+from routes.stats import router as stats_router
 
-from db import async_session, init_db
+from db import async_session, init_db, close_db
 from models.rule import Rule
+from middleware.correlation import correlation_id_middleware
+from services.bulk_mutations import flush_bulk_mutations
+from services.linear_batcher import flush_linear_batcher
+from services.discord_delivery import flush_discord_delivery
+from services.debounce import flush_debouncer
+from services.execution_log import start_execution_log, stop_execution_log
+from services.scheduler import start_scheduler, stop_scheduler
+from services.window_aggregator import start_window_checkpoints, stop_window_checkpoints
+from services.poller import start_poller, stop_poller
+from services.slack_directory import start_slack_directory, stop_slack_directory
+from services.execution_maintenance import (
+    ensure_partitions, start_execution_maintenance, stop_execution_maintenance
+)
+from utils.log import configure_logging, shutdown_logging, get_logger
+
+configure_logging()
+logger = get_logger("app")
 
 app = FastAPI()
 
@@ -28,8 +44,10 @@ ALLOWED_ORIGINS = [
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     # Log the exception with a traceback
-    logging.error(f"Unhandled exception for request {request.method} {request.url}: {exc}")
-    logging.error(traceback.format_exc())
+    logger.error(
+        "Unhandled exception for request %s %s: %s", request.method, request.url, exc,
+        exc_info=exc,
+    )
 
     response_content = {"detail": "Internal Server Error"}
     status_code = 500
@@ -64,24 +82,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Request-ID"], # Conditional GET, pagination cursor, correlation id
 )
 
 # Log incoming request origins for CORS debugging (keep this as it's useful)
 @app.middleware("http")
 async def log_origin(request: Request, call_next): # Added type hint for request
     origin = request.headers.get("origin")
-    logging.info(f"Request from origin: {origin} for {request.method} {request.url}") # Changed to logging.info
+    logger.debug("Request from origin: %s for %s %s", origin, request.method, request.url)
     response = await call_next(request)
     return response
 
+# Registered last so it wraps everything above and every log line carries the id
+app.middleware("http")(correlation_id_middleware)
+
 # Include routers
 app.include_router(rules_router, prefix="/rules", tags=["rules"])
 app.include_router(webhook_router, tags=["webhooks"])
 app.include_router(integrations_router, tags=["integrations"])
+app.include_router(stats_router, tags=["stats"])
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    await ensure_partitions()
+    start_execution_log()
+    start_execution_maintenance()
+    start_scheduler()
+    start_window_checkpoints()
+    start_poller()
+    start_slack_directory()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_execution_maintenance()
+    await stop_poller()
+    await stop_slack_directory()
+    await stop_scheduler()
+    await flush_debouncer()
+    await flush_bulk_mutations()
+    await flush_linear_batcher()
+    await flush_discord_delivery()
+    await stop_window_checkpoints()
+    await stop_execution_log()
+    await close_db()
+    shutdown_logging()
 
 async def get_session():
     async with async_session() as session:
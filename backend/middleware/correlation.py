@@ -0,0 +1,18 @@
+from fastapi import Request
+
+from utils.log import new_correlation_id
+
+CORRELATION_HEADER = "X-Request-ID"
+
+
+async def correlation_id_middleware(request: Request, call_next):
+    """
+    Tag every log line written while handling a request with one correlation id
+
+    The id is taken from the incoming X-Request-ID header when present and
+    echoed back on the response.
+    """
+    cid = new_correlation_id(request.headers.get(CORRELATION_HEADER))
+    response = await call_next(request)
+    response.headers[CORRELATION_HEADER] = cid
+    return response
@@ -0,0 +1,14 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class ActionReceipt(SQLModel, table=True):
+    """
+    Marker of an action that succeeded for an event, so retries and replays skip it
+
+    Only the idempotency key is kept (see services/idempotency.py); receipts
+    expire with the execution history maintenance.
+    """
+    __tablename__ = "action_receipt"
+
+    key: str = Field(primary_key=True, max_length=32)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,35 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+class EntityLink(SQLModel, table=True):
+    """
+    Object an action created on another platform for a helpdesk ticket
+
+    E.g. the Linear issue, Notion page or Trello card opened for a Zendesk
+    ticket, so follow-up rules reach it with a local lookup (see
+    services/entity_links.py). Links belong to the owner of the rule that
+    created them, as ticket IDs are only unique within a helpdesk account.
+    """
+    __tablename__ = "entity_link"
+    __table_args__ = (
+        # Links of a user's ticket, one per created object
+        Index(
+            "ix_entity_link_source_target",
+            "user_id", "source_platform", "source_id", "target_platform", "target_type", "target_id",
+            unique=True
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int  # Owner of the rule that created the object
+    source_platform: str  # zendesk, freshdesk
+    source_id: str  # Ticket ID
+    target_platform: str  # linear, notion, trello, zendesk, freshdesk
+    target_type: str  # issue, page, card, ticket
+    target_id: str
+    target_key: Optional[str] = None  # Human readable reference, e.g. "ENG-123"
+    url: Optional[str] = None
+    rule_id: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,52 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+class EventJob(SQLModel, table=True):
+    """
+    A unit of work waiting for (or claimed by) a worker process
+
+    Jobs are claimed in batches with SELECT ... FOR UPDATE SKIP LOCKED (see
+    repositories/event_job_repository.py). A claimed job is leased to one
+    worker until `locked_until`; the worker extends the lease with heartbeats,
+    and jobs whose lease expired (crashed worker) are claimed again.
+
+    Jobs with the same ordering_key (e.g. "freshdesk:123" for one ticket) are
+    run strictly one after another in id order; event_partition, a hash of the
+    ordering key, decides which worker claims them.
+    """
+    __tablename__ = "event_job"
+    __table_args__ = (
+        # Claim query: due jobs of the worker's partitions, oldest first
+        Index("ix_event_job_status_partition_available", "status", "event_partition", "available_at", "id"),
+        # Per-key ordering: earlier unfinished jobs with the same key
+        Index("ix_event_job_ordering_key_id", "ordering_key", "id"),
+        # Lease expiry scan
+        Index("ix_event_job_status_locked_until", "status", "locked_until"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(default="event")  # Handler name, see services/worker.py
+    platform: str
+    payload: str  # JSON stringified
+    event_id: Optional[str] = None
+    ordering_key: Optional[str] = None  # Jobs without a key are not ordered
+    event_partition: int = 0
+    status: str = Field(default="pending")  # pending, running, done, failed
+    attempts: int = 0
+    max_attempts: int = 5
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+class EventWorker(SQLModel, table=True):
+    """Live worker processes; partitions are divided among the workers listed here"""
+    __tablename__ = "event_worker"
+
+    worker_id: str = Field(primary_key=True)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    heartbeat_at: datetime = Field(default_factory=datetime.utcnow)
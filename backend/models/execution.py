@@ -0,0 +1,75 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import BigInteger, Index
+from typing import Optional
+from datetime import datetime
+import uuid
+
+# Upper bounds (ms) of the latency histogram buckets kept in the rollups;
+# lat_10 counts everything slower than the last bound.
+LATENCY_BUCKET_BOUNDS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+LATENCY_BUCKET_COLUMNS = tuple(f"lat_{i}" for i in range(len(LATENCY_BUCKET_BOUNDS_MS) + 1))
+
+class ExecutionLog(SQLModel, table=True):
+    """
+    One row per rule execution (kind="rule") and per action result (kind="action")
+
+    On PostgreSQL the table is range-partitioned by day on created_at; see
+    services/execution_maintenance.py for partition creation and expiry.
+    """
+    __tablename__ = "execution_log"
+    __table_args__ = (
+        Index("ix_execution_log_rule_created", "rule_id", "created_at"),
+        Index("ix_execution_log_event", "event_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # Generated client-side (a serial column can't be combined with the
+    # partition key in a primary key on every backend we run on)
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True, max_length=32)
+    # The partition key has to be part of the primary key
+    created_at: datetime = Field(default_factory=datetime.utcnow, primary_key=True)
+    user_id: int
+    rule_id: int
+    event_id: Optional[str] = None
+    kind: str  # rule, action
+    platform: str  # trigger platform for rule rows, action platform for action rows
+    action_index: Optional[int] = None
+    action_type: Optional[str] = None
+    status: str  # success, error
+    latency_ms: int
+    error: Optional[str] = None
+
+class ExecutionRollupBase(SQLModel):
+    """Pre-aggregated execution counts and latency histogram for one time bucket"""
+    bucket: datetime = Field(primary_key=True)
+    user_id: int = Field(primary_key=True)
+    rule_id: int = Field(primary_key=True)
+    platform: str = Field(primary_key=True)
+    kind: str = Field(primary_key=True)
+    count: int = 0
+    failures: int = 0
+    latency_sum_ms: int = Field(default=0, sa_type=BigInteger)
+    latency_max_ms: int = 0
+    lat_0: int = 0
+    lat_1: int = 0
+    lat_2: int = 0
+    lat_3: int = 0
+    lat_4: int = 0
+    lat_5: int = 0
+    lat_6: int = 0
+    lat_7: int = 0
+    lat_8: int = 0
+    lat_9: int = 0
+    lat_10: int = 0
+
+class ExecutionRollupMinute(ExecutionRollupBase, table=True):
+    __tablename__ = "execution_rollup_minute"
+    __table_args__ = (
+        Index("ix_execution_rollup_minute_user_bucket", "user_id", "bucket"),
+    )
+
+class ExecutionRollupHour(ExecutionRollupBase, table=True):
+    __tablename__ = "execution_rollup_hour"
+    __table_args__ = (
+        Index("ix_execution_rollup_hour_user_bucket", "user_id", "bucket"),
+    )
@@ -1,10 +1,19 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 from pydantic import validator
 import json
 
 class Integration(SQLModel, table=True):
+    __table_args__ = (
+        # Keyset pagination of a user's integrations (see IntegrationRepository.list_integrations)
+        Index("ix_integration_user_id", "user_id", "id"),
+        # Keyset pagination filtered by type
+        Index("ix_integration_user_type_id", "user_id", "integration_type", "id"),
+        Index("ix_integration_type_id", "integration_type", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int
     name: str
@@ -0,0 +1,29 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+class PollCheckpoint(SQLModel, table=True):
+    """
+    Position of the ticket change poller in one integration's export stream
+
+    See services/poller.py.
+    """
+    __tablename__ = "poll_checkpoint"
+    __table_args__ = (
+        # Due checkpoint scan
+        Index("ix_poll_checkpoint_next_poll", "next_poll_at"),
+    )
+
+    integration_id: int = Field(primary_key=True)
+    platform: str  # zendesk, freshdesk
+    cursor: Optional[str] = None  # Platform export cursor (null: start from started_at)
+    # JSON list of event IDs at the cursor's timestamp, skipped if exported again
+    recent_event_ids: str = Field(default="[]")
+    interval: float  # Current polling interval in seconds
+    next_poll_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    last_polled_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
@@ -1,7 +1,17 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 
 class Rule(SQLModel, table=True):
+    __table_args__ = (
+        # Keyset pagination of a user's rules (see RuleRepository.list_rules)
+        Index("ix_rule_user_id", "user_id", "id"),
+        # Keyset pagination filtered by platform and event
+        Index("ix_rule_user_platform_event_id", "user_id", "trigger_platform", "trigger_event", "id"),
+        # Webhook matching and platform-wide listing
+        Index("ix_rule_platform_event_id", "trigger_platform", "trigger_event", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int
     name: str = Field(default="New Rule")
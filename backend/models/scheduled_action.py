@@ -0,0 +1,35 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+class ScheduledAction(SQLModel, table=True):
+    """
+    A delayed rule action waiting for its due time
+
+    Rows are deleted once the action has run or was cancelled; see
+    services/scheduler.py.
+    """
+    __tablename__ = "scheduled_action"
+    __table_args__ = (
+        # Scheduler horizon scan
+        Index("ix_scheduled_action_status_due", "status", "due_at"),
+        # Cancellation when the ticket changes
+        Index("ix_scheduled_action_ticket", "platform", "ticket_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    rule_id: int
+    action_index: int
+    action: str  # JSON stringified action, as it was when scheduled
+    platform: str  # Trigger platform of the ticket
+    ticket_id: Optional[str] = None
+    # JSON list of statuses the ticket must still have (null: no condition)
+    if_status: Optional[str] = None
+    event_id: Optional[str] = None
+    due_at: datetime
+    status: str = Field(default="pending")  # pending, running
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,18 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+class TicketState(SQLModel, table=True):
+    """Last-known state of a helpdesk ticket, used to tell real transitions from repeated payloads"""
+    __tablename__ = "ticket_state"
+
+    platform: str = Field(primary_key=True)
+    ticket_id: str = Field(primary_key=True)
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    tags: str = "[]"  # JSON stringified, sorted
+    version: int = 1  # Optimistic concurrency check for cached copies
+    # Last event applied and the state before it, so a retried event sees the same changes
+    last_event_id: Optional[str] = None
+    previous: Optional[str] = None  # JSON stringified state, null for a new ticket
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class WindowState(SQLModel, table=True):
+    """Checkpoint of one group of a window_aggregate rule (see services/window_aggregator.py)"""
+    __tablename__ = "window_state"
+
+    rule_id: int = Field(primary_key=True)
+    group_key: str = Field(primary_key=True)
+    state: str  # JSON stringified buckets and last firing time
+    version: int = 1  # Optimistic concurrency check, so a stale owner cannot overwrite newer state
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
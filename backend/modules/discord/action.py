@@ -1,11 +1,134 @@
 import os
 import json
-import requests
+from typing import Any, Dict, Optional, Tuple
+
+from utils.http import http_session
+from utils.streaming import MultipartBody, StreamBody
+
+# Longest message content Discord accepts
+MAX_CONTENT_LENGTH = 2000
+# Largest file a webhook accepts (servers without boosts)
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
+def get_webhook_url(action_data: Dict[str, Any]) -> Optional[str]:
+    """Webhook URL of an action (from the action or the environment)"""
+    return action_data.get("webhook_url") or os.environ.get("DISCORD_WEBHOOK_URL")
+
+def build_payload(action_data: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Webhook payload of a send_message action
+
+    Returns:
+        Tuple of (payload, None) or (None, error result)
+    """
+    # Validate action data
+    if action_data.get("action") != "send_message":
+        return None, {"status": "error", "message": "Unsupported action for Discord"}
+
+    content = action_data.get("content")
+    username = action_data.get("username")
+    avatar_url = action_data.get("avatar_url")
+    embeds = action_data.get("embeds", [])
+
+    if not content and not embeds:
+        return None, {"status": "error", "message": "Message must have content or embeds"}
+
+    # Prepare the payload for Discord webhook
+    payload = {}
+
+    if content:
+        payload["content"] = content
+
+    if username:
+        payload["username"] = username
+
+    if avatar_url:
+        payload["avatar_url"] = avatar_url
+
+    if embeds:
+        payload["embeds"] = embeds
+    return payload, None
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def post_webhook(webhook_url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Send one webhook message
+
+    Returns:
+        The action result, with the rate limit state Discord reported:
+        'bucket', 'remaining' and 'reset_after' (from the X-RateLimit headers),
+        and for a 429 'retry_after' and 'global'
+    """
+    try:
+        response = http_session().post(webhook_url, json=payload, timeout=30)
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to execute Discord action: {str(e)}"}
+    return _result(response)
+
+def upload_file(
+    webhook_url: str, body: StreamBody, filename: str, content_type: str = None, payload: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    Send a message with one file, streamed from a sized body (see utils/streaming.py)
+
+    Returns:
+        The action result with the rate limit state, as post_webhook
+    """
+    if len(body) > MAX_FILE_SIZE:
+        return {"status": "error", "message": f"File is larger than Discord's {MAX_FILE_SIZE // (1024 * 1024)}MB limit"}
+    payload = dict(payload or {}, attachments=[{"id": 0, "filename": filename}])
+    multipart = MultipartBody({"payload_json": json.dumps(payload)}, "files[0]", filename, content_type, body)
+    try:
+        response = http_session().post(
+            webhook_url,
+            data=multipart,
+            headers={"Content-Type": multipart.content_type},
+            timeout=300
+        )
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to upload Discord file: {str(e)}"}
+    return _result(response)
+
+def _result(response) -> Dict[str, Any]:
+    headers = response.headers
+    limits = {
+        "bucket": headers.get("X-RateLimit-Bucket"),
+        "remaining": _float(headers.get("X-RateLimit-Remaining")),
+        "reset_after": _float(headers.get("X-RateLimit-Reset-After")),
+    }
+    # Check if the request was successful
+    if response.status_code in (200, 204):  # Discord returns 204 No Content on success (200 with ?wait=true)
+        return dict(limits, status="success", message="Sent Discord message")
+    if response.status_code == 429:
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        retry_after = _float(body.get("retry_after")) or _float(headers.get("Retry-After")) or 1.0
+        return dict(
+            limits,
+            status="error",
+            message="Discord rate limit exceeded",
+            retry_after=retry_after,
+            # A global limit applies to every webhook, not just this bucket
+            **{"global": bool(body.get("global")) or headers.get("X-RateLimit-Global") == "true"}
+        )
+    return dict(
+        limits,
+        status="error",
+        message=f"Failed to send Discord message: {response.status_code}",
+        details=response.text if response.content else None
+    )
 
 def execute_action(action_data):
     """
     Execute a Discord action to send a message to a channel via webhook.
-    
+
     Expected action_data format:
     {
         "platform": "discord",
@@ -14,6 +137,7 @@ def execute_action(action_data):
         "content": "Message content",
         "username": "Custom Bot Name", # Optional
         "avatar_url": "https://example.com/avatar.png", # Optional
+        "merge": true, # Optional, see services/discord_delivery.py
         "embeds": [ # Optional
             {
                 "title": "Embed Title",
@@ -29,58 +153,22 @@ def execute_action(action_data):
             }
         ]
     }
+
+    Rules run this through services/discord_delivery.py, which queues messages
+    per webhook and sends them at the rate Discord allows.
     """
     try:
-        # Validate action data
-        if action_data.get("action") != "send_message":
-            return {"status": "error", "message": "Unsupported action for Discord"}
-        
+        payload, error = build_payload(action_data)
+        if error:
+            return error
+
         # Get webhook URL from action data or environment variables
-        webhook_url = action_data.get("webhook_url") or os.environ.get("DISCORD_WEBHOOK_URL")
+        webhook_url = get_webhook_url(action_data)
         if not webhook_url:
             return {"status": "error", "message": "Discord webhook URL not configured"}
-        
-        content = action_data.get("content")
-        username = action_data.get("username")
-        avatar_url = action_data.get("avatar_url")
-        embeds = action_data.get("embeds", [])
-        
-        if not content and not embeds:
-            return {"status": "error", "message": "Message must have content or embeds"}
-        
-        # Prepare the payload for Discord webhook
-        payload = {}
-        
-        if content:
-            payload["content"] = content
-        
-        if username:
-            payload["username"] = username
-            
-        if avatar_url:
-            payload["avatar_url"] = avatar_url
-            
-        if embeds:
-            payload["embeds"] = embeds
-        
-        # Make the request to the Discord webhook
-        response = requests.post(
-            webhook_url,
-            json=payload
-        )
-        
-        # Check if the request was successful
-        if response.status_code == 204:  # Discord returns 204 No Content on success
-            return {
-                "status": "success",
-                "message": "Sent Discord message"
-            }
-        else:
-            return {
-                "status": "error",
-                "message": f"Failed to send Discord message: {response.status_code}",
-                "details": response.text if response.content else None
-            }
-            
+
+        result = post_webhook(webhook_url, payload)
+        return {key: value for key, value in result.items() if key in ("status", "message", "details")}
+
     except Exception as e:
         return {"status": "error", "message": f"Failed to execute Discord action: {str(e)}"}
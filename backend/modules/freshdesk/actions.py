@@ -1,5 +1,7 @@
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from utils.http import http_session
 
 def test_connection(config: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -229,3 +231,118 @@ def add_note(config: Dict[str, Any], ticket_id: int, note_data: Dict[str, Any])
             "success": False,
             "message": f"Error adding note: {str(e)}"
         }
+
+def _request(config: Dict[str, Any], method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Send an API request, returning {"success", "data"} or {"success": False, "message"}"""
+    domain = config.get('domain')
+    api_key = config.get('api_key')
+    
+    if not domain or not api_key:
+        return {
+            "success": False,
+            "message": "Missing required configuration: domain and api_key"
+        }
+    
+    # Remove https:// if included
+    if domain.startswith('https://'):
+        domain = domain[8:]
+    
+    # Remove trailing slash if present
+    if domain.endswith('/'):
+        domain = domain[:-1]
+    
+    url = f"https://{domain}/api/v2/{path}"
+    
+    try:
+        response = requests.request(
+            method,
+            url,
+            headers={"Content-Type": "application/json"},
+            auth=(api_key, 'X'),
+            json=payload,
+            timeout=30
+        )
+        
+        if response.status_code in [200, 202]:
+            return {
+                "success": True,
+                "data": response.json()
+            }
+        else:
+            return {
+                "success": False,
+                "status_code": response.status_code,
+                "message": f"API Error: {response.status_code} - {response.text}"
+            }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Request error: {str(e)}"
+        }
+
+def bulk_update(config: Dict[str, Any], ticket_ids: List[int], properties: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply the same properties to many tickets with one request
+    
+    Returns:
+        Dict with the background job ('job_id', 'href') in 'data' on success
+    """
+    payload = {"bulk_action": {"ids": ticket_ids, "properties": properties}}
+    return _request(config, "POST", "tickets/bulk_update", payload)
+
+def get_job(config: Dict[str, Any], job_id: str) -> Dict[str, Any]:
+    """Get a background job ('status' is IN PROGRESS, COMPLETED or FAILED, per-ticket results in 'data')"""
+    return _request(config, "GET", f"jobs/{job_id}")
+
+def get_ticket(config: Dict[str, Any], ticket_id: int) -> Dict[str, Any]:
+    """Get a ticket with its requester and company embedded"""
+    return _request(config, "GET", f"tickets/{ticket_id}?include=requester,company")
+
+def get_agent(config: Dict[str, Any], agent_id: int) -> Dict[str, Any]:
+    """Get an agent (e.g. a ticket's responder)"""
+    return _request(config, "GET", f"agents/{agent_id}")
+
+def list_attachments(config: Dict[str, Any], ticket_id: int, latest_only: bool = True) -> Dict[str, Any]:
+    """
+    Get the attachments of a ticket and its conversations
+    
+    Args:
+        config: Dictionary containing 'domain' and 'api_key'
+        ticket_id: ID of the ticket
+        latest_only: Only the attachments of the newest reply or note that has
+            any (the ticket's own when none has)
+    
+    Returns:
+        Dict with 'data': [{"file_name", "content_url", "content_type", "size"}]
+    """
+    ticket = _request(config, "GET", f"tickets/{ticket_id}")
+    if not ticket.get("success"):
+        return ticket
+    conversations = _request(config, "GET", f"tickets/{ticket_id}/conversations?per_page=100")
+    if not conversations.get("success"):
+        return conversations
+
+    # Newest first, the ticket's description last
+    sources = sorted(conversations["data"], key=lambda item: item.get("created_at") or "", reverse=True)
+    sources.append(ticket["data"])
+    attachments = []
+    for source in sources:
+        found = [
+            {
+                "file_name": attachment.get("name"),
+                "content_url": attachment.get("attachment_url"),
+                "content_type": attachment.get("content_type"),
+                "size": attachment.get("size")
+            }
+            for attachment in source.get("attachments") or []
+        ]
+        attachments.extend(found)
+        if found and latest_only:
+            break
+    return {"success": True, "data": attachments}
+
+def open_attachment(config: Dict[str, Any], content_url: str):
+    """Start downloading an attachment (a pre-signed URL); the response body is read as a stream"""
+    response = http_session().get(content_url, stream=True, timeout=30)
+    response.raise_for_status()
+    return response
@@ -0,0 +1,120 @@
+import requests
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+# Tickets per page (the Freshdesk maximum)
+PAGE_SIZE = 100
+
+# Freshdesk returns numeric statuses and priorities; webhooks carry the names
+STATUS_NAMES = {2: "Open", 3: "Pending", 4: "Resolved", 5: "Closed"}
+PRIORITY_NAMES = {1: "Low", 2: "Medium", 3: "High", 4: "Urgent"}
+
+def fetch_ticket_changes(config: Dict[str, Any], cursor: Optional[str] = None, start_time: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Fetch one page of tickets updated since a cursor
+
+    Freshdesk has no export cursor, so the cursor is "<updated_since>|<page>":
+    tickets are listed by updated_at ascending, and the cursor moves to the
+    last ticket's updated_at. The page number only grows when a whole page
+    shares one timestamp.
+
+    Args:
+        config: Dictionary containing 'domain' and 'api_key'
+        cursor: Cursor returned by the previous call
+        start_time: Unix time to start from when there is no cursor yet
+
+    Returns:
+        Dict with 'success', and on success 'tickets', 'cursor' and
+        'end_of_stream'; 'retry_after' (seconds) when rate limited
+    """
+    domain = config.get('domain')
+    api_key = config.get('api_key')
+    
+    if not domain or not api_key:
+        return {
+            "success": False,
+            "message": "Missing required configuration: domain and api_key"
+        }
+    
+    # Remove https:// if included
+    if domain.startswith('https://'):
+        domain = domain[8:]
+    
+    # Remove trailing slash if present
+    if domain.endswith('/'):
+        domain = domain[:-1]
+    
+    if cursor:
+        since, page = cursor.rsplit("|", 1)
+        page = int(page)
+    else:
+        since = datetime.utcfromtimestamp(int(start_time or 0)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        page = 1
+    
+    url = f"https://{domain}/api/v2/tickets"
+    params = {
+        "updated_since": since,
+        "order_by": "updated_at",
+        "order_type": "asc",
+        "per_page": PAGE_SIZE,
+        "page": page
+    }
+    
+    try:
+        response = requests.get(
+            url,
+            params=params,
+            auth=(api_key, 'X'),
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            tickets = response.json()
+            full_page = len(tickets) == PAGE_SIZE
+            if not tickets:
+                next_cursor = f"{since}|{page}"
+            elif full_page and tickets[-1].get("updated_at") == since:
+                next_cursor = f"{since}|{page + 1}"
+            else:
+                # updated_since is inclusive, so the last ticket is seen again and
+                # recognised by its event ID
+                next_cursor = f"{tickets[-1].get('updated_at')}|1"
+            return {
+                "success": True,
+                "tickets": tickets,
+                "cursor": next_cursor,
+                "end_of_stream": not full_page
+            }
+        if response.status_code == 429:
+            return {
+                "success": False,
+                "message": "Rate limited",
+                "retry_after": float(response.headers.get("Retry-After", 60))
+            }
+        return {
+            "success": False,
+            "message": f"API Error: {response.status_code} - {response.text}"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error fetching ticket changes: {str(e)}"
+        }
+
+def to_event(ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a listed ticket like a webhook payload"""
+    return {
+        "freshdesk_webhook": {
+            "ticket_id": ticket.get("id"),
+            "ticket_subject": ticket.get("subject"),
+            "ticket_type": ticket.get("type"),
+            "ticket_status": STATUS_NAMES.get(ticket.get("status"), ticket.get("status")),
+            "ticket_priority": PRIORITY_NAMES.get(ticket.get("priority"), ticket.get("priority")),
+            "tags": ticket.get("tags"),
+            "updated_at": ticket.get("updated_at")
+        }
+    }
+
+def event_id(integration_id: int, ticket: Dict[str, Any]) -> str:
+    """Stable ID of one ticket version, so re-listed versions are recognised"""
+    return f"poll:freshdesk:{integration_id}:{ticket.get('id')}:{ticket.get('updated_at')}"
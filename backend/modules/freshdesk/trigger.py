@@ -1,3 +1,7 @@
+from utils.log import get_logger, log_payload
+
+logger = get_logger("freshdesk.trigger")
+
 def handle_trigger(payload):
     """
     Handle incoming webhook from Freshdesk
@@ -17,8 +21,7 @@ def handle_trigger(payload):
         }
     }
     """
-    print("[FRESHDESK] Trigger received payload:")
-    print(payload)
+    log_payload(logger, "Trigger received payload", payload)
     
     try:
         # Extract ticket information
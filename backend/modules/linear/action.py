@@ -1,117 +1,378 @@
 import os
 import json
-import requests
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.http import http_session
+
+LINEAR_API_URL = "https://api.linear.app/graphql"
+
+ISSUE_FIELDS = "success issue { id identifier url }"
+
+METADATA_QUERY = """
+query Metadata($after: String) {
+  teams(first: 250) {
+    nodes { id key name }
+  }
+  issueLabels(first: 250, after: $after) {
+    nodes { id name team { id } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+FILE_UPLOAD_MUTATION = """
+mutation FileUpload($size: Int!, $contentType: String!, $filename: String!) {
+  fileUpload(size: $size, contentType: $contentType, filename: $filename) {
+    success
+    uploadFile { uploadUrl assetUrl headers { key value } }
+  }
+}
+"""
+
+ATTACHMENT_MUTATION = """
+mutation AttachFile($input: AttachmentCreateInput!) {
+  attachmentCreate(input: $input) { success attachment { id url } }
+}
+"""
+
+ISSUE_STATES_QUERY = """
+query IssueStates($id: String!) {
+  issue(id: $id) { team { states { nodes { id name type } } } }
+}
+"""
+
+ISSUE_QUERY = """
+query Issue($id: String!) {
+  issue(id: $id) { id identifier url }
+}
+"""
+
+UPDATE_ISSUE_MUTATION = """
+mutation UpdateIssue($id: String!, $input: IssueUpdateInput!) {
+  issueUpdate(id: $id, input: $input) { %s }
+}
+""" % ISSUE_FIELDS
+
+def get_token(action_data: Dict[str, Any]) -> Optional[str]:
+    """Linear API token of an action (from the environment)"""
+    return os.environ.get("LINEAR_API_TOKEN")
+
+def graphql(token: str, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Send one GraphQL request over the pooled HTTP session
+
+    Returns:
+        The response body ("data" and/or "errors"); transport failures are
+        returned as {"errors": [{"message": ...}]}
+    """
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    try:
+        response = http_session().post(
+            LINEAR_API_URL,
+            headers=headers,
+            json={"query": query, "variables": variables or {}},
+            timeout=30
+        )
+        if response.status_code == 200:
+            return response.json()
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return {"errors": body.get("errors") or [{"message": f"HTTP {response.status_code}"}]}
+    except Exception as e:
+        return {"errors": [{"message": str(e)}]}
+
+def fetch_metadata(token: str) -> Dict[str, Any]:
+    """
+    Get the workspace's teams and issue labels
+
+    Returns:
+        Dict with 'teams' ({id, key, name}) and 'labels' ({id, name, team_id},
+        team_id None for workspace labels), or 'error'
+    """
+    teams, labels, after = [], [], None
+    while True:
+        result = graphql(token, METADATA_QUERY, {"after": after})
+        if result.get("errors") or not result.get("data"):
+            errors = result.get("errors") or [{}]
+            return {"error": errors[0].get("message", "Unknown error")}
+        data = result["data"]
+        teams = data["teams"]["nodes"]
+        for label in data["issueLabels"]["nodes"]:
+            labels.append({
+                "id": label["id"],
+                "name": label["name"],
+                "team_id": (label.get("team") or {}).get("id")
+            })
+        page = data["issueLabels"]["pageInfo"]
+        if not page["hasNextPage"]:
+            break
+        after = page["endCursor"]
+    return {"teams": teams, "labels": labels}
+
+def resolve_team(metadata: Dict[str, Any], team: str) -> Optional[str]:
+    """Team ID for a team ID, key (e.g. "ENG") or name"""
+    for candidate in metadata.get("teams", []):
+        if team in (candidate["id"], candidate["key"]) or team.lower() == candidate["name"].lower():
+            return candidate["id"]
+    return None
+
+def resolve_labels(metadata: Dict[str, Any], team_id: str, names: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Label IDs for label names (or IDs) usable on a team's issues
+
+    Returns:
+        Tuple of (label IDs, names that matched no label)
+    """
+    usable = [label for label in metadata.get("labels", []) if label["team_id"] in (None, team_id)]
+    ids, unknown = [], []
+    for name in names:
+        match = next(
+            (label for label in usable if name == label["id"] or name.lower() == label["name"].lower()),
+            None
+        )
+        if match:
+            ids.append(match["id"])
+        else:
+            unknown.append(name)
+    return ids, unknown
+
+def build_issue_input(action_data: Dict[str, Any], team_id: str, label_ids: List[str]) -> Dict[str, Any]:
+    """IssueCreateInput for an action"""
+    issue_input = {
+        "teamId": team_id,
+        "title": action_data.get("title"),
+        "description": action_data.get("description", ""),
+        "priority": action_data.get("priority", 0)
+    }
+
+    # Add optional fields if provided
+    if action_data.get("assignee_id"):
+        issue_input["assigneeId"] = action_data["assignee_id"]
+    if label_ids:
+        issue_input["labelIds"] = label_ids
+    return issue_input
+
+# extensions.code of errors caused by the request's variables
+INPUT_ERROR_CODES = {"GRAPHQL_VALIDATION_FAILED", "BAD_USER_INPUT", "INVALID_INPUT"}
+
+def _is_input_error(error: Dict[str, Any]) -> bool:
+    """Whether a request-level error comes from the value of an issue input ($i0, $i1, ...)"""
+    if error.get("path"):
+        return False
+    code = (error.get("extensions") or {}).get("code")
+    return code in INPUT_ERROR_CODES or re.search(r"\$i\d+\b", error.get("message") or "") is not None
+
+def create_issues(token: str, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Create several issues with one GraphQL request of aliased issueCreate mutations
+
+    Returns:
+        One action result per input, in order
+    """
+    aliases = [f"i{index}" for index in range(len(inputs))]
+    mutation = "mutation CreateIssues({}) {{\n{}\n}}".format(
+        ", ".join(f"${alias}: IssueCreateInput!" for alias in aliases),
+        "\n".join(f"  {alias}: issueCreate(input: ${alias}) {{ {ISSUE_FIELDS} }}" for alias in aliases)
+    )
+    result = graphql(token, mutation, dict(zip(aliases, inputs)))
+    data = result.get("data") or {}
+    errors = result.get("errors") or []
+    if len(inputs) > 1 and not any(data.get(alias) for alias in aliases) \
+            and any(_is_input_error(error) for error in errors):
+        # One input failing variable validation rejects every mutation of the
+        # request; send each input on its own to isolate it. Other request-level
+        # errors (rate limits, HTTP and transport failures) are returned to every
+        # input as they are, as retrying them right away would fail the same way
+        return [create_issues(token, [issue_input])[0] for issue_input in inputs]
+
+    results = []
+    for alias in aliases:
+        payload = data.get(alias) or {}
+        if payload.get("success"):
+            issue = payload["issue"]
+            results.append({
+                "status": "success",
+                "message": "Created Linear issue",
+                "details": {
+                    "issue_id": issue.get("id"),
+                    "identifier": issue.get("identifier"),
+                    "url": issue.get("url")
+                }
+            })
+            continue
+        # Errors name the alias they belong to in their path; others concern the whole request
+        own = [error for error in errors if (error.get("path") or [None])[0] == alias]
+        error = (own or errors or [{}])[0]
+        results.append({
+            "status": "error",
+            "message": f"Failed to create Linear issue: {error.get('message', 'Unknown error')}",
+            "details": error or None
+        })
+    return results
+
+def upload_file(token: str, issue_id: str, body, filename: str, content_type: str = None) -> Dict[str, Any]:
+    """
+    Upload a file to Linear's storage and attach it to an issue
+
+    Args:
+        token: Linear API token
+        issue_id: Issue ID or identifier (e.g. "ENG-123")
+        body: Sized file-like body (see utils/streaming.py), sent as it is read
+        filename: Name of the file
+        content_type: MIME type of the file
+
+    Returns:
+        Action result with the asset URL in details
+    """
+    content_type = content_type or "application/octet-stream"
+    result = graphql(token, FILE_UPLOAD_MUTATION, {"size": len(body), "contentType": content_type, "filename": filename})
+    upload = ((result.get("data") or {}).get("fileUpload") or {}).get("uploadFile")
+    if not upload:
+        error = (result.get("errors") or [{}])[0]
+        return {"status": "error", "message": f"Failed to start Linear upload: {error.get('message', 'Unknown error')}"}
+
+    headers = {header["key"]: header["value"] for header in upload.get("headers") or []}
+    headers.update({"Content-Type": content_type, "Cache-Control": "public, max-age=31536000"})
+    try:
+        response = http_session().put(upload["uploadUrl"], data=body, headers=headers, timeout=300)
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to upload file to Linear: {str(e)}"}
+    if response.status_code not in (200, 201):
+        return {"status": "error", "message": f"Failed to upload file to Linear: {response.status_code}"}
+
+    result = graphql(token, ATTACHMENT_MUTATION, {
+        "input": {"issueId": issue_id, "title": filename, "url": upload["assetUrl"]}
+    })
+    if not ((result.get("data") or {}).get("attachmentCreate") or {}).get("success"):
+        error = (result.get("errors") or [{}])[0]
+        return {"status": "error", "message": f"Failed to attach file to Linear issue: {error.get('message', 'Unknown error')}"}
+    return {
+        "status": "success",
+        "message": "Attached file to Linear issue",
+        "details": {"issue_id": issue_id, "url": upload["assetUrl"]}
+    }
+
+def get_issue(token: str, issue_id: str) -> Optional[Dict[str, Any]]:
+    """The issue with an ID or identifier ({id, identifier, url}), None if it does not exist"""
+    result = graphql(token, ISSUE_QUERY, {"id": issue_id})
+    return (result.get("data") or {}).get("issue")
+
+def update_issue(token: str, action_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Update an issue (update_issue action)
+
+    The issue is given by ID or identifier (e.g. "{{links.linear.issue.id}}",
+    see services/entity_links.py). "state" is a workflow state name of the
+    issue's team ("Done") or a state type ("completed", "canceled").
+
+    Returns:
+        The action result, with the issue in 'details'
+    """
+    issue_id = action_data.get("issue_id")
+    if not issue_id:
+        return {"status": "error", "message": "Missing issue_id in action data"}
+
+    issue_input = {}
+    for key, field in (("title", "title"), ("description", "description"),
+                       ("priority", "priority"), ("assignee_id", "assigneeId")):
+        if action_data.get(key) is not None:
+            issue_input[field] = action_data[key]
+    state = action_data.get("state")
+    if state:
+        result = graphql(token, ISSUE_STATES_QUERY, {"id": issue_id})
+        issue = (result.get("data") or {}).get("issue")
+        if result.get("errors") or not issue:
+            error = (result.get("errors") or [{"message": "Issue not found"}])[0]
+            return {"status": "error", "message": f"Failed to load Linear issue {issue_id}: {error.get('message', 'Unknown error')}"}
+        states = issue["team"]["states"]["nodes"]
+        match = next((s for s in states if s["name"].lower() == state.lower()), None) \
+            or next((s for s in states if s["type"] == state.lower()), None)
+        if match is None:
+            return {"status": "error", "message": f"Unknown Linear workflow state: {state}"}
+        issue_input["stateId"] = match["id"]
+    if not issue_input:
+        return {"status": "error", "message": "Nothing to update in action data"}
+
+    result = graphql(token, UPDATE_ISSUE_MUTATION, {"id": issue_id, "input": issue_input})
+    payload = (result.get("data") or {}).get("issueUpdate") or {}
+    if not payload.get("success"):
+        error = (result.get("errors") or [{}])[0]
+        return {"status": "error", "message": f"Failed to update Linear issue: {error.get('message', 'Unknown error')}"}
+    issue = payload["issue"]
+    return {
+        "status": "success",
+        "message": "Updated Linear issue",
+        "details": {
+            "issue_id": issue.get("id"),
+            "identifier": issue.get("identifier"),
+            "url": issue.get("url")
+        }
+    }
+
+def validate(action_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Error result for an invalid create_issue action, None if it is valid"""
+    if action_data.get("action") != "create_issue":
+        return {"status": "error", "message": "Unsupported action for Linear"}
+    if not action_data.get("team_id"):
+        return {"status": "error", "message": "Missing team_id in action data"}
+    if not action_data.get("title"):
+        return {"status": "error", "message": "Missing title in action data"}
+    if not get_token(action_data):
+        return {"status": "error", "message": "Linear API token not configured"}
+    return None
 
 def execute_action(action_data):
     """
     Execute a Linear action to create an issue.
-    
+
     Expected action_data format:
     {
         "platform": "linear",
         "action": "create_issue",
-        "team_id": "your-team-id",
+        "team_id": "your-team-id",  # Team ID, key (e.g. "ENG") or name
         "title": "Issue title",
         "description": "Issue description",
         "priority": 2,  # 0-4 where 0 is no priority, 1 is urgent, 2 is high, 3 is medium, 4 is low
-        "labels": ["bug", "feature"],  # Optional
+        "labels": ["bug", "feature"],  # Optional, label names or IDs
         "assignee_id": "user-id"  # Optional
     }
+
+    Rules run this through services/linear_batcher.py, which caches the team
+    and label metadata and combines concurrent creations into one request.
+
+    Issues are changed with "action": "update_issue" (see update_issue).
     """
     try:
-        # Validate action data
-        if action_data.get("action") != "create_issue":
-            return {"status": "error", "message": "Unsupported action for Linear"}
-        
-        team_id = action_data.get("team_id")
-        title = action_data.get("title")
-        description = action_data.get("description", "")
-        priority = action_data.get("priority", 0)
-        labels = action_data.get("labels", [])
-        assignee_id = action_data.get("assignee_id")
-        
+        if action_data.get("action") == "update_issue":
+            token = get_token(action_data)
+            if not token:
+                return {"status": "error", "message": "Linear API token not configured"}
+            return update_issue(token, action_data)
+
+        error = validate(action_data)
+        if error:
+            return error
+
+        token = get_token(action_data)
+        metadata = fetch_metadata(token)
+        if "error" in metadata:
+            return {"status": "error", "message": f"Failed to load Linear teams and labels: {metadata['error']}"}
+
+        team_id = resolve_team(metadata, action_data["team_id"])
         if not team_id:
-            return {"status": "error", "message": "Missing team_id in action data"}
-        
-        if not title:
-            return {"status": "error", "message": "Missing title in action data"}
-        
-        # Get Linear API token from environment variables
-        linear_token = os.environ.get("LINEAR_API_TOKEN")
-        if not linear_token:
-            return {"status": "error", "message": "Linear API token not configured"}
-        
-        # Set up the API request
-        headers = {
-            "Authorization": f"Bearer {linear_token}",
-            "Content-Type": "application/json"
-        }
-        
-        # Prepare GraphQL mutation for creating an issue
-        mutation = """
-        mutation CreateIssue($input: IssueCreateInput!) {
-          issueCreate(input: $input) {
-            success
-            issue {
-              id
-              identifier
-              url
-            }
-          }
-        }
-        """
-        
-        # Prepare variables for the mutation
-        variables = {
-            "input": {
-                "teamId": team_id,
-                "title": title,
-                "description": description,
-                "priority": priority
-            }
-        }
-        
-        # Add optional fields if provided
-        if assignee_id:
-            variables["input"]["assigneeId"] = assignee_id
-        
-        # Make the API request to create an issue
-        response = requests.post(
-            "https://api.linear.app/graphql",
-            headers=headers,
-            json={
-                "query": mutation,
-                "variables": variables
-            }
-        )
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("data", {}).get("issueCreate", {}).get("success"):
-                issue = result["data"]["issueCreate"]["issue"]
-                return {
-                    "status": "success",
-                    "message": "Created Linear issue",
-                    "details": {
-                        "issue_id": issue.get("id"),
-                        "identifier": issue.get("identifier"),
-                        "url": issue.get("url")
-                    }
-                }
-            else:
-                errors = result.get("errors", [])
-                return {
-                    "status": "error",
-                    "message": f"Failed to create Linear issue: {errors[0].get('message') if errors else 'Unknown error'}",
-                    "details": result
-                }
-        else:
-            return {
-                "status": "error",
-                "message": f"Failed to create Linear issue: {response.status_code}",
-                "details": response.json() if response.content else None
-            }
-            
+            return {"status": "error", "message": f"Unknown Linear team: {action_data['team_id']}"}
+        label_ids, unknown = resolve_labels(metadata, team_id, action_data.get("labels") or [])
+
+        result = create_issues(token, [build_issue_input(action_data, team_id, label_ids)])[0]
+        if unknown:
+            result["unknown_labels"] = unknown
+        return result
+
     except Exception as e:
         return {"status": "error", "message": f"Failed to execute Linear action: {str(e)}"}
@@ -1,32 +1,242 @@
 import os
 import json
-import requests
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.http import http_session
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+# Property types computed by Notion, which pages cannot set
+READ_ONLY_TYPES = {
+    "formula", "rollup", "created_time", "created_by", "last_edited_time", "last_edited_by", "unique_id",
+    "verification", "button"
+}
+# All property types, to recognize values given in Notion's format
+ALL_TYPES = READ_ONLY_TYPES | {
+    "title", "rich_text", "number", "checkbox", "select", "multi_select", "status", "date", "url", "email",
+    "phone_number", "people", "relation", "files"
+}
+# Longest text content Notion accepts per rich text object
+MAX_TEXT_LENGTH = 2000
+
+def get_token() -> Optional[str]:
+    """Notion API token (from the environment)"""
+    return os.environ.get("NOTION_API_TOKEN")
+
+def _headers(token: str) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Notion-Version": NOTION_VERSION
+    }
+
+def fetch_database_schema(token: str, database_id: str) -> Dict[str, Any]:
+    """
+    Get a database's property schema
+
+    Returns:
+        Dict with 'success' and 'properties' (property name -> {"type", and
+        "options" for select, multi_select and status}) or 'message'
+    """
+    try:
+        response = http_session().get(
+            f"{NOTION_API_URL}/databases/{database_id}",
+            headers=_headers(token),
+            timeout=30
+        )
+        if response.status_code != 200:
+            return {
+                "success": False,
+                "message": f"Failed to fetch Notion database: {response.status_code} - {response.text}"
+            }
+        properties = {}
+        for name, prop in response.json().get("properties", {}).items():
+            schema = {"type": prop.get("type")}
+            options = (prop.get(schema["type"]) or {}).get("options")
+            if options is not None:
+                schema["options"] = [option.get("name") for option in options]
+            properties[name] = schema
+        return {"success": True, "properties": properties}
+    except Exception as e:
+        return {"success": False, "message": f"Failed to fetch Notion database: {str(e)}"}
+
+def _text(value: Any) -> List[Dict[str, Any]]:
+    text = value if isinstance(value, str) else json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+    # Long text is split into several rich text objects
+    return [
+        {"text": {"content": text[start:start + MAX_TEXT_LENGTH]}}
+        for start in range(0, max(len(text), 1), MAX_TEXT_LENGTH)
+    ]
+
+def _names(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item is not None and str(item) != ""]
+    return [str(value)]
+
+def _is_placeholder(value: Any) -> bool:
+    return isinstance(value, str) and "{{" in value
+
+def coerce_property(prop_type: str, value: Any, options: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Convert a plain value to a Notion property value of the given type
+
+    Raises:
+        ValueError: If the value cannot be converted
+    """
+    if prop_type in ("title", "rich_text"):
+        return {prop_type: _text("" if value is None else value)}
+    if prop_type == "number":
+        if value is None or value == "":
+            return {"number": None}
+        if isinstance(value, bool):
+            raise ValueError("expected a number")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"expected a number, got {value!r}")
+        return {"number": int(number) if number.is_integer() else number}
+    if prop_type == "checkbox":
+        if isinstance(value, bool):
+            return {"checkbox": value}
+        if str(value).strip().lower() in ("true", "yes", "1", "on"):
+            return {"checkbox": True}
+        if str(value).strip().lower() in ("false", "no", "0", "off", ""):
+            return {"checkbox": False}
+        raise ValueError(f"expected true or false, got {value!r}")
+    if prop_type == "select":
+        if value is None or value == "":
+            return {"select": None}
+        name = str(value)
+        if "," in name:
+            raise ValueError("select options cannot contain commas")
+        return {"select": {"name": name[:100]}}
+    if prop_type == "multi_select":
+        names = _names(value) if value is not None else []
+        return {"multi_select": [{"name": name[:100]} for name in names]}
+    if prop_type == "status":
+        name = str(value)
+        # Unlike select options, statuses cannot be created through the API
+        if options is not None and name not in options:
+            raise ValueError(f"unknown status {name!r} (one of: {', '.join(options)})")
+        return {"status": {"name": name}}
+    if prop_type == "date":
+        if value is None or value == "":
+            return {"date": None}
+        if isinstance(value, (datetime, date)):
+            return {"date": {"start": value.isoformat()}}
+        text = str(value)
+        try:
+            datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"expected an ISO 8601 date, got {value!r}")
+        return {"date": {"start": text}}
+    if prop_type in ("url", "email", "phone_number"):
+        return {prop_type: None if value in (None, "") else str(value)}
+    if prop_type in ("people", "relation"):
+        return {prop_type: [{"id": item} for item in _names(value)] if value is not None else []}
+    if prop_type in READ_ONLY_TYPES:
+        raise ValueError(f"{prop_type} properties are read-only")
+    raise ValueError(f"unsupported property type {prop_type}")
+
+def coerce_properties(
+    schema: Dict[str, Dict[str, Any]],
+    properties: Dict[str, Any],
+    allow_placeholders: bool = False
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Check rule properties against a database schema and convert them to Notion values
+
+    Values may be plain (coerced to the property's type) or already in Notion's
+    format ({"select": {"name": ...}}), which is only checked for the type.
+    With allow_placeholders, values with {{...}} placeholders are only checked
+    for the property (used when a rule is saved, before values are known).
+
+    Returns:
+        Tuple of (Notion property values, error messages)
+    """
+    coerced, errors = {}, []
+    for name, value in properties.items():
+        prop = schema.get(name)
+        if prop is None:
+            errors.append(f"{name}: no such property in the database")
+            continue
+        prop_type = prop["type"]
+        if prop_type in READ_ONLY_TYPES:
+            errors.append(f"{name}: {prop_type} properties are read-only")
+            continue
+        if isinstance(value, dict) and len(value) == 1 and next(iter(value)) in ALL_TYPES:
+            if prop_type not in value:
+                errors.append(f"{name}: is a {prop_type} property, got a {next(iter(value))} value")
+            else:
+                coerced[name] = value
+            continue
+        if allow_placeholders and _is_placeholder(value):
+            continue
+        try:
+            coerced[name] = coerce_property(prop_type, value, prop.get("options"))
+        except ValueError as e:
+            errors.append(f"{name}: {e}")
+    return coerced, errors
+
+def create_page(token: str, database_id: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Create a database item; a 400 validation error sets 'validation_error'"""
+    try:
+        response = http_session().post(
+            f"{NOTION_API_URL}/pages",
+            headers=_headers(token),
+            json={"parent": {"database_id": database_id}, "properties": properties},
+            timeout=30
+        )
+        if response.status_code == 200:
+            result = response.json()
+            return {
+                "status": "success",
+                "message": "Created Notion database item",
+                "details": {
+                    "page_id": result.get("id"),
+                    "url": result.get("url")
+                }
+            }
+        details = response.json() if response.content else None
+        return {
+            "status": "error",
+            "message": f"Failed to create Notion database item: {response.status_code}",
+            "details": details,
+            "validation_error": response.status_code == 400 and (details or {}).get("code") == "validation_error"
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to execute Notion action: {str(e)}"}
+
+def validate(action_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Error result for an invalid create_database_item action, None if it is valid"""
+    if action_data.get("action") != "create_database_item":
+        return {"status": "error", "message": "Unsupported action for Notion"}
+    if not action_data.get("database_id"):
+        return {"status": "error", "message": "Missing database_id in action data"}
+    if not action_data.get("properties"):
+        return {"status": "error", "message": "Missing properties in action data"}
+    if not isinstance(action_data["properties"], dict):
+        return {"status": "error", "message": "properties must be an object"}
+    return None
 
 def execute_action(action_data):
     """
     Execute a Notion action to create a database item.
-    
+
     Expected action_data format:
     {
         "platform": "notion",
         "action": "create_database_item",
         "database_id": "your-database-id",
         "properties": {
-            "Name": {
-                "title": [
-                    {
-                        "text": {
-                            "content": "New item title"
-                        }
-                    }
-                ]
-            },
-            "Status": {
-                "select": {
-                    "name": "Not started"
-                }
-            },
-            "Priority": {
+            "Name": "New item title",          # Plain values are converted to the property's type
+            "Status": "Not started",
+            "Tags": ["billing", "urgent"],
+            "Priority": {                       # or given in Notion's format
                 "select": {
                     "name": "High"
                 }
@@ -34,63 +244,30 @@ def execute_action(action_data):
             // Other properties as needed
         }
     }
+
+    Rules run this through services/notion_schema.py, which checks the
+    properties against a cached database schema before sending.
     """
     try:
-        # Validate action data
-        if action_data.get("action") != "create_database_item":
-            return {"status": "error", "message": "Unsupported action for Notion"}
-        
-        database_id = action_data.get("database_id")
-        properties = action_data.get("properties", {})
-        
-        if not database_id:
-            return {"status": "error", "message": "Missing database_id in action data"}
-        
-        if not properties:
-            return {"status": "error", "message": "Missing properties in action data"}
-        
+        error = validate(action_data)
+        if error:
+            return error
+
         # Get Notion API token from environment variables
-        notion_token = os.environ.get("NOTION_API_TOKEN")
+        notion_token = get_token()
         if not notion_token:
             return {"status": "error", "message": "Notion API token not configured"}
-        
-        # Set up the API request
-        headers = {
-            "Authorization": f"Bearer {notion_token}",
-            "Content-Type": "application/json",
-            "Notion-Version": "2022-06-28"  # Use the latest API version
-        }
-        
-        # Prepare the request payload
-        payload = {
-            "parent": {"database_id": database_id},
-            "properties": properties
-        }
-        
-        # Make the API request to create a database item
-        response = requests.post(
-            "https://api.notion.com/v1/pages",
-            headers=headers,
-            json=payload
-        )
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            result = response.json()
-            return {
-                "status": "success",
-                "message": "Created Notion database item",
-                "details": {
-                    "page_id": result.get("id"),
-                    "url": result.get("url")
-                }
-            }
-        else:
-            return {
-                "status": "error",
-                "message": f"Failed to create Notion database item: {response.status_code}",
-                "details": response.json()
-            }
-            
+
+        schema = fetch_database_schema(notion_token, action_data["database_id"])
+        if not schema["success"]:
+            return {"status": "error", "message": schema["message"]}
+        properties, errors = coerce_properties(schema["properties"], action_data["properties"])
+        if errors:
+            return {"status": "error", "message": f"Invalid Notion properties: {'; '.join(errors)}"}
+
+        result = create_page(notion_token, action_data["database_id"], properties)
+        result.pop("validation_error", None)
+        return result
+
     except Exception as e:
         return {"status": "error", "message": f"Failed to execute Notion action: {str(e)}"}
@@ -6,6 +6,8 @@ import json
 import logging
 from typing import Dict, Any
 
+from utils.http import http_session
+
 logger = logging.getLogger(__name__)
 
 def test_connection(config: Dict[str, Any]) -> Dict[str, Any]:
@@ -155,3 +157,102 @@ def send_message(config: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, An
             "success": False,
             "message": f"Error sending Slack message: {str(e)}"
         }
+
+def api_call(config: Dict[str, Any], method: str, params: Dict[str, Any] = None, payload: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Call a Slack Web API method over the pooled HTTP session
+    
+    Args:
+        config: Dictionary containing the Slack token
+        method: API method, e.g. conversations.list
+        params: Query parameters (GET)
+        payload: JSON body (POST)
+        
+    Returns:
+        The API response; a rate limited call returns
+        {"ok": False, "error": "ratelimited", "retry_after": seconds}
+    """
+    headers = {
+        "Authorization": f"Bearer {config['token']}",
+        "Content-Type": "application/json; charset=utf-8"
+    }
+    url = f"https://slack.com/api/{method}"
+    try:
+        if payload is not None:
+            response = http_session().post(url, headers=headers, json=payload, timeout=30)
+        else:
+            response = http_session().get(url, headers=headers, params=params, timeout=30)
+        
+        if response.status_code == 429:
+            return {
+                "ok": False,
+                "error": "ratelimited",
+                "retry_after": float(response.headers.get("Retry-After", 30))
+            }
+        return response.json()
+    except Exception as e:
+        logger.error(f"Error calling Slack {method}: {str(e)}")
+        return {"ok": False, "error": str(e)}
+
+def list_channels(config: Dict[str, Any], cursor: str = None) -> Dict[str, Any]:
+    """Get one page of the workspace's (non-archived) channels; next page cursor in response_metadata"""
+    params = {
+        "types": "public_channel,private_channel",
+        "exclude_archived": "true",
+        "limit": 1000
+    }
+    if cursor:
+        params["cursor"] = cursor
+    return api_call(config, "conversations.list", params=params)
+
+def lookup_user_by_email(config: Dict[str, Any], email: str) -> Dict[str, Any]:
+    """Find a workspace member by email ("user" in the response, error users_not_found otherwise)"""
+    return api_call(config, "users.lookupByEmail", params={"email": email})
+
+def post_message(config: Dict[str, Any], channel: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Post to one channel ID with chat.postMessage (message, blocks and attachments from params)"""
+    payload = {
+        "channel": channel,
+        "text": params.get('message', 'Message from SupportOps Automator')
+    }
+    if 'blocks' in params:
+        payload['blocks'] = params['blocks']
+    if 'attachments' in params:
+        payload['attachments'] = params['attachments']
+    return api_call(config, "chat.postMessage", payload=payload)
+
+def upload_file(config: Dict[str, Any], channel: str, body, filename: str, title: str = None, comment: str = None) -> Dict[str, Any]:
+    """
+    Share a file in one channel ID with the external upload flow
+    
+    Args:
+        config: Dictionary containing the Slack token
+        channel: Channel ID
+        body: Sized file-like body (see utils/streaming.py), sent as it is read
+        filename: Name of the file
+        title: Title shown in Slack (the filename by default)
+        comment: Message posted with the file
+        
+    Returns:
+        The files.completeUploadExternal response
+    """
+    start = api_call(config, "files.getUploadURLExternal", params={"filename": filename, "length": len(body)})
+    if not start.get("ok"):
+        return start
+    try:
+        response = http_session().post(
+            start["upload_url"],
+            data=body,
+            headers={"Content-Type": "application/octet-stream"},
+            timeout=300
+        )
+    except Exception as e:
+        logger.error(f"Error uploading file to Slack: {str(e)}")
+        return {"ok": False, "error": str(e)}
+    if response.status_code != 200:
+        return {"ok": False, "error": f"upload failed with status {response.status_code}"}
+
+    payload = {"files": [{"id": start["file_id"], "title": title or filename}], "channel_id": channel}
+    if comment:
+        payload["initial_comment"] = comment
+    return api_call(config, "files.completeUploadExternal", payload=payload)
@@ -0,0 +1,98 @@
+"""
+Trello integration actions module
+
+Integrations store the API key and token in their (encrypted) config:
+{"api_key": "...", "token": "..."}
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from utils.http import http_session
+
+logger = logging.getLogger(__name__)
+
+TRELLO_API_URL = "https://api.trello.com/1"
+
+def _request(
+    config: Dict[str, Any], method: str, path: str, params: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Call the Trello REST API over the pooled HTTP session
+
+    Returns:
+        Dict with success and data or message; a rate limited call also has
+        'retry_after' (seconds)
+    """
+    query = dict(params or {}, key=config.get("api_key"), token=config.get("token"))
+    try:
+        response = http_session().request(method, f"{TRELLO_API_URL}{path}", params=query, timeout=30)
+        if response.status_code == 200:
+            return {"success": True, "data": response.json()}
+        if response.status_code == 429:
+            return {
+                "success": False,
+                "message": "Trello rate limit exceeded",
+                "retry_after": float(response.headers.get("Retry-After", 10))
+            }
+        return {
+            "success": False,
+            "message": f"Trello API error: {response.status_code} - {response.text}"
+        }
+    except Exception as e:
+        logger.error(f"Error calling Trello {path}: {str(e)}")
+        return {"success": False, "message": f"Trello API error: {str(e)}"}
+
+def test_connection(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Test the connection to Trello using the provided configuration
+
+    Args:
+        config: Dictionary containing the Trello API key and token
+
+    Returns:
+        Dict with success status and optional error message
+    """
+    if not config.get("api_key") or not config.get("token"):
+        return {"success": False, "message": "Missing api_key or token"}
+    result = _request(config, "GET", "/members/me", {"fields": "username"})
+    if result["success"]:
+        return {"success": True}
+    return {"success": False, "message": f"Failed to connect to Trello: {result['message']}"}
+
+def list_boards(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the open boards of the token's member ({id, name} each)"""
+    return _request(config, "GET", "/members/me/boards", {"filter": "open", "fields": "name"})
+
+def get_board(config: Dict[str, Any], board_id: str) -> Dict[str, Any]:
+    """Get a board with its open lists and labels"""
+    return _request(config, "GET", f"/boards/{board_id}", {
+        "fields": "name",
+        "lists": "open",
+        "list_fields": "name",
+        "labels": "all",
+        "label_fields": "name,color"
+    })
+
+def create_card(config: Dict[str, Any], list_id: str, card: Dict[str, Any], label_ids: List[str] = None) -> Dict[str, Any]:
+    """
+    Create a card
+
+    Args:
+        config: Dictionary containing the Trello API key and token
+        list_id: List the card is added to
+        card: name, and optional desc, due, pos and member_ids
+        label_ids: Labels of the card
+    """
+    params = {
+        "idList": list_id,
+        "name": card.get("name"),
+        "desc": card.get("desc", "")
+    }
+    for key in ("due", "pos"):
+        if card.get(key) is not None:
+            params[key] = card[key]
+    if card.get("member_ids"):
+        params["idMembers"] = ",".join(card["member_ids"])
+    if label_ids:
+        params["idLabels"] = ",".join(label_ids)
+    return _request(config, "POST", "/cards", params)
@@ -1,5 +1,7 @@
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from utils.http import http_session
 
 def test_connection(config: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -59,13 +61,14 @@ def test_connection(config: Dict[str, Any]) -> Dict[str, Any]:
             "message": f"Connection error: {str(e)}"
         }
 
-def create_ticket(config: Dict[str, Any], ticket_data: Dict[str, Any]) -> Dict[str, Any]:
+def create_ticket(config: Dict[str, Any], ticket_data: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
     """
     Create a ticket in Zendesk
     
     Args:
         config: Dictionary containing 'subdomain', 'email', and 'api_token'
         ticket_data: Dictionary with ticket details
+        idempotency_key: Sent as Idempotency-Key, so a repeated request returns the first ticket
     
     Returns:
         Dict with ticket information or error details
@@ -92,6 +95,8 @@ def create_ticket(config: Dict[str, Any], ticket_data: Dict[str, Any]) -> Dict[s
     headers = {
         "Content-Type": "application/json"
     }
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
     
     # Zendesk expects ticket data in a specific format
     payload = {"ticket": ticket_data}
@@ -251,3 +256,133 @@ def add_comment(config: Dict[str, Any], ticket_id: int, comment: str, public: bo
             "success": False,
             "message": f"Error adding comment: {str(e)}"
         }
+
+def _request(config: Dict[str, Any], method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Send an API request, returning {"success", "data"} or {"success": False, "message"}"""
+    subdomain = config.get('subdomain')
+    email = config.get('email')
+    api_token = config.get('api_token')
+    
+    if not subdomain or not email or not api_token:
+        return {
+            "success": False,
+            "message": "Missing required configuration: subdomain, email, and api_token"
+        }
+    
+    # Remove https:// if included
+    if subdomain.startswith('https://'):
+        subdomain = subdomain[8:]
+    
+    # Remove .zendesk.com if included
+    if '.zendesk.com' in subdomain:
+        subdomain = subdomain.split('.zendesk.com')[0]
+    
+    url = f"https://{subdomain}.zendesk.com/api/v2/{path}"
+    
+    try:
+        response = requests.request(
+            method,
+            url,
+            headers={"Content-Type": "application/json"},
+            auth=(email + "/token", api_token),
+            json=payload,
+            timeout=30
+        )
+        
+        if response.status_code in [200, 201]:
+            return {
+                "success": True,
+                "data": response.json()
+            }
+        else:
+            return {
+                "success": False,
+                "status_code": response.status_code,
+                "message": f"API Error: {response.status_code} - {response.text}"
+            }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Request error: {str(e)}"
+        }
+
+def update_many(config: Dict[str, Any], tickets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Update up to 100 tickets with one request (each dict holds its ticket's "id")
+    
+    Returns:
+        Dict with the job_status of the background job in 'data' on success
+    """
+    return _request(config, "PUT", "tickets/update_many.json", {"tickets": tickets})
+
+def create_many(config: Dict[str, Any], tickets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Create up to 100 tickets with one request
+    
+    Returns:
+        Dict with the job_status of the background job in 'data' on success
+    """
+    return _request(config, "POST", "tickets/create_many.json", {"tickets": tickets})
+
+def get_job_status(config: Dict[str, Any], job_id: str) -> Dict[str, Any]:
+    """Get the job_status of a bulk job ('status' is queued, working, completed, failed or killed)"""
+    return _request(config, "GET", f"job_statuses/{job_id}.json")
+
+def show_many(config: Dict[str, Any], resource: str, ids: List[Any]) -> Dict[str, Any]:
+    """
+    Get up to 100 tickets, users or organizations with one request
+    
+    Args:
+        config: Dictionary containing 'subdomain', 'email', and 'api_token'
+        resource: tickets, users or organizations
+        ids: IDs to fetch
+    
+    Returns:
+        Dict with the records in 'data' on success (missing IDs are left out)
+    """
+    result = _request(config, "GET", f"{resource}/show_many.json?ids={','.join(str(i) for i in ids)}")
+    if result.get("success"):
+        result["data"] = result["data"].get(resource, [])
+    return result
+
+def list_attachments(config: Dict[str, Any], ticket_id: int, latest_only: bool = True) -> Dict[str, Any]:
+    """
+    Get the attachments of a ticket's comments
+    
+    Args:
+        config: Dictionary containing 'subdomain', 'email', and 'api_token'
+        ticket_id: ID of the ticket
+        latest_only: Only the attachments of the newest comment that has any
+    
+    Returns:
+        Dict with 'data': [{"file_name", "content_url", "content_type", "size"}]
+    """
+    result = _request(config, "GET", f"tickets/{ticket_id}/comments.json?sort_order=desc")
+    if not result.get("success"):
+        return result
+    attachments = []
+    for comment in result["data"].get("comments", []):
+        found = [
+            {
+                "file_name": attachment.get("file_name"),
+                "content_url": attachment.get("content_url"),
+                "content_type": attachment.get("content_type"),
+                "size": attachment.get("size")
+            }
+            for attachment in comment.get("attachments") or []
+        ]
+        attachments.extend(found)
+        if found and latest_only:
+            break
+    return {"success": True, "data": attachments}
+
+def open_attachment(config: Dict[str, Any], content_url: str):
+    """Start downloading an attachment; the response body is read as a stream"""
+    response = http_session().get(
+        content_url,
+        auth=(config.get('email', '') + "/token", config.get('api_token', '')),
+        stream=True,
+        timeout=30
+    )
+    response.raise_for_status()
+    return response
@@ -1,6 +1,9 @@
+from utils.log import get_logger, log_payload
+
+logger = get_logger("zendesk.trigger")
+
 def handle_trigger(payload):
-    print("[MOCK] Zendesk trigger received payload:")
-    print(payload)
+    log_payload(logger, "[MOCK] Zendesk trigger received payload", payload)
     return {
         "status": "success",
         "message": "Mock Zendesk trigger executed"
@@ -0,0 +1,231 @@
+from sqlalchemy import and_, delete, exists, or_, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+import json
+import os
+import uuid
+import zlib
+
+from models.event_job import EventJob, EventWorker
+
+# Must be the same for the web service (which assigns partitions) and the workers
+EVENT_PARTITIONS = int(os.getenv("EVENT_PARTITIONS", "64"))
+
+_jobs = EventJob.__table__
+_workers = EventWorker.__table__
+
+def partition_for(ordering_key: Optional[str]) -> int:
+    """Stable partition of an ordering key (jobs without a key are spread randomly)"""
+    key = ordering_key or uuid.uuid4().hex
+    return zlib.crc32(key.encode()) % EVENT_PARTITIONS
+
+class EventJobRepository:
+    """
+    Queue operations on the event_job table
+
+    Every method commits, so row locks taken while claiming are held only for
+    the duration of the claim statement itself.
+    """
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def enqueue(
+        self,
+        platform: str,
+        payload: Dict[str, Any],
+        event_id: Optional[str] = None,
+        ordering_key: Optional[str] = None,
+        kind: str = "event",
+        max_attempts: int = 5,
+        available_at: Optional[datetime] = None
+    ) -> EventJob:
+        """Add a pending job"""
+        job = EventJob(
+            kind=kind,
+            platform=platform,
+            payload=json.dumps(payload),
+            event_id=event_id,
+            ordering_key=ordering_key,
+            event_partition=partition_for(ordering_key),
+            max_attempts=max_attempts,
+            available_at=available_at or datetime.utcnow()
+        )
+        self.session.add(job)
+        await self.session.commit()
+        await self.session.refresh(job)
+        return job
+
+    async def reschedule(self, job_id: int, payload: Dict[str, Any], available_at: datetime) -> bool:
+        """Replace the payload and due time of a pending job; False once it was claimed"""
+        result = await self.session.execute(
+            update(_jobs)
+            .where(_jobs.c.id == job_id, _jobs.c.status == "pending")
+            .values(payload=json.dumps(payload), available_at=available_at)
+        )
+        await self.session.commit()
+        return result.rowcount == 1
+
+    async def claim(
+        self,
+        worker_id: str,
+        limit: int,
+        lease_seconds: float,
+        partitions: Optional[Sequence[int]] = None
+    ) -> List[EventJob]:
+        """
+        Lease up to `limit` due jobs to a worker
+
+        Due jobs are pending jobs whose available_at has passed and running
+        jobs whose lease expired. Rows locked by a concurrent claim are
+        skipped (FOR UPDATE SKIP LOCKED), so any number of workers can claim
+        at once without blocking each other or taking the same job.
+
+        A job is only due once every earlier job with the same ordering key
+        has finished, which keeps per-key ordering even while partitions move
+        between workers.
+
+        Args:
+            worker_id: Claiming worker
+            limit: Maximum number of jobs
+            lease_seconds: Lease length
+            partitions: Only claim jobs of these partitions (None for all)
+        """
+        now = datetime.utcnow()
+        earlier = _jobs.alias("earlier")
+        candidates = (
+            select(_jobs.c.id)
+            .where(
+                or_(
+                    and_(_jobs.c.status == "pending", _jobs.c.available_at <= now),
+                    and_(_jobs.c.status == "running", _jobs.c.locked_until < now),
+                ),
+                _jobs.c.attempts < _jobs.c.max_attempts,
+                or_(
+                    _jobs.c.ordering_key.is_(None),
+                    ~exists().where(
+                        earlier.c.ordering_key == _jobs.c.ordering_key,
+                        earlier.c.id < _jobs.c.id,
+                        earlier.c.status.in_(("pending", "running"))
+                    )
+                )
+            )
+            .order_by(_jobs.c.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if partitions is not None:
+            if not partitions:
+                return []
+            candidates = candidates.where(_jobs.c.event_partition.in_(list(partitions)))
+        statement = (
+            update(_jobs)
+            .where(_jobs.c.id.in_(candidates.scalar_subquery()))
+            .values(
+                status="running",
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=_jobs.c.attempts + 1
+            )
+            .returning(*_jobs.c)
+        )
+        result = await self.session.execute(statement)
+        jobs = [EventJob(**row._mapping) for row in result]
+        await self.session.commit()
+        return sorted(jobs, key=lambda job: job.id)
+
+    async def heartbeat(self, worker_id: str, job_ids: List[int], lease_seconds: float) -> int:
+        """Extend the lease of jobs still held by this worker; returns the number extended"""
+        if not job_ids:
+            return 0
+        result = await self.session.execute(
+            update(_jobs)
+            .where(_jobs.c.id.in_(job_ids), _jobs.c.locked_by == worker_id, _jobs.c.status == "running")
+            .values(locked_until=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        )
+        await self.session.commit()
+        return result.rowcount
+
+    async def complete(self, job_id: int, worker_id: str) -> bool:
+        """
+        Mark a job done
+
+        Returns False when the worker no longer holds the lease (it expired and
+        the job was claimed by another worker).
+        """
+        result = await self.session.execute(
+            update(_jobs)
+            .where(_jobs.c.id == job_id, _jobs.c.locked_by == worker_id, _jobs.c.status == "running")
+            .values(status="done", locked_by=None, locked_until=None, finished_at=datetime.utcnow())
+        )
+        await self.session.commit()
+        return result.rowcount == 1
+
+    async def fail(self, job: EventJob, worker_id: str, error: str, retry_at: Optional[datetime]) -> bool:
+        """
+        Record a failed attempt
+
+        The job goes back to pending until `retry_at`, or is marked failed when
+        it has no attempts left or `retry_at` is None.
+        """
+        values = {"locked_by": None, "locked_until": None, "last_error": error[:1000]}
+        if retry_at is None or job.attempts >= job.max_attempts:
+            values.update(status="failed", finished_at=datetime.utcnow())
+        else:
+            values.update(status="pending", available_at=retry_at)
+        result = await self.session.execute(
+            update(_jobs)
+            .where(_jobs.c.id == job.id, _jobs.c.locked_by == worker_id, _jobs.c.status == "running")
+            .values(**values)
+        )
+        await self.session.commit()
+        return result.rowcount == 1
+
+    async def fail_abandoned(self) -> int:
+        """Mark jobs failed whose lease expired on their last attempt (e.g. they crash the worker)"""
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            update(_jobs)
+            .where(
+                _jobs.c.status == "running",
+                _jobs.c.locked_until < now,
+                _jobs.c.attempts >= _jobs.c.max_attempts
+            )
+            .values(
+                status="failed", locked_by=None, locked_until=None, finished_at=now,
+                last_error="Lease expired on the last attempt"
+            )
+        )
+        await self.session.commit()
+        return result.rowcount
+
+    async def purge_finished(self, older_than: datetime) -> int:
+        """Delete done and failed jobs finished before `older_than`"""
+        result = await self.session.execute(
+            delete(_jobs).where(_jobs.c.status.in_(("done", "failed")), _jobs.c.finished_at < older_than)
+        )
+        await self.session.commit()
+        return result.rowcount
+
+    async def register_worker(self, worker_id: str):
+        """Add a worker to the registry or refresh its heartbeat"""
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            update(_workers).where(_workers.c.worker_id == worker_id).values(heartbeat_at=now)
+        )
+        if result.rowcount == 0:
+            self.session.add(EventWorker(worker_id=worker_id, started_at=now, heartbeat_at=now))
+        await self.session.commit()
+
+    async def unregister_worker(self, worker_id: str):
+        await self.session.execute(delete(_workers).where(_workers.c.worker_id == worker_id))
+        await self.session.commit()
+
+    async def live_workers(self, timeout_seconds: float) -> List[str]:
+        """IDs of workers that sent a heartbeat within `timeout_seconds`; stale entries are removed"""
+        cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+        await self.session.execute(delete(_workers).where(_workers.c.heartbeat_at < cutoff))
+        result = await self.session.execute(select(_workers.c.worker_id).order_by(_workers.c.worker_id))
+        workers = [worker_id for (worker_id,) in result]
+        await self.session.commit()
+        return workers
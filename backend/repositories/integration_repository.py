@@ -1,10 +1,14 @@
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 import json
 
-from models.integration import Integration, IntegrationCreate, IntegrationUpdate
+from models.integration import Integration, IntegrationCreate, IntegrationUpdate, IntegrationRead
 from utils.encryption import encrypt_config, decrypt_config
+from utils.pagination import encode_cursor
+
+# Columns that may be projected with `fields=`; config is never exposed
+INTEGRATION_FIELDS = list(IntegrationRead.__fields__.keys())
 
 class IntegrationRepository:
     def __init__(self, session: AsyncSession):
@@ -59,6 +63,55 @@ class IntegrationRepository:
         integrations = result.scalars().all()
         return list(integrations)
     
+    async def list_integrations(
+        self,
+        user_id: Optional[int] = None,
+        integration_type: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        limit: int = 100,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Get one page of integrations ordered by ID (keyset pagination)
+
+        Args:
+            user_id: Only integrations of this user
+            integration_type: Only integrations of this platform
+            is_active: Only active / inactive integrations
+            after_id: Return integrations with an ID greater than this (decoded cursor)
+            limit: Page size
+            fields: Optional column projection; rows are then returned as dicts
+
+        Returns:
+            Tuple of (rows, cursor for the next page or None)
+        """
+        if fields:
+            query = select(*[getattr(Integration, name) for name in fields])
+        else:
+            query = select(Integration)
+
+        if user_id is not None:
+            query = query.where(Integration.user_id == user_id)
+        if integration_type:
+            query = query.where(Integration.integration_type == integration_type)
+        if is_active is not None:
+            query = query.where(Integration.is_active == is_active)
+        if after_id is not None:
+            query = query.where(Integration.id > after_id)
+
+        # Fetch one extra row to know whether another page exists
+        query = query.order_by(Integration.id).limit(limit + 1)
+        result = await self.session.execute(query)
+        rows = [dict(row._mapping) for row in result] if fields else list(result.scalars().all())
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last["id"] if fields else last.id)
+        return rows, next_cursor
+    
     async def update_integration(self, integration_id: int, integration_data: IntegrationUpdate) -> Optional[Integration]:
         """Update an integration"""
         query = select(Integration).where(Integration.id == integration_id)
@@ -91,18 +144,18 @@ class IntegrationRepository:
         await self.session.refresh(integration)
         return integration
     
-    async def delete_integration(self, integration_id: int) -> bool:
-        """Delete an integration"""
+    async def delete_integration(self, integration_id: int) -> Optional[Integration]:
+        """Delete an integration, returning the deleted row (None if not found)"""
         query = select(Integration).where(Integration.id == integration_id)
         result = await self.session.execute(query)
         integration = result.scalar_one_or_none()
         
         if not integration:
-            return False
+            return None
         
         await self.session.delete(integration)
         await self.session.commit()
-        return True
+        return integration
     
     def get_decrypted_config(self, integration: Integration) -> dict:
         """Get decrypted configuration for an integration"""
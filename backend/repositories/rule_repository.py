@@ -0,0 +1,100 @@
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from models.rule import Rule
+from utils.pagination import encode_cursor
+
+RULE_FIELDS = list(Rule.__fields__.keys())
+
+class RuleRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_rule(self, rule_id: int) -> Optional[Rule]:
+        """Get rule by ID"""
+        return await self.session.get(Rule, rule_id)
+
+    async def list_rules(
+        self,
+        user_id: Optional[int] = None,
+        platform: Optional[str] = None,
+        event: Optional[str] = None,
+        after_id: Optional[int] = None,
+        limit: int = 100,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Get one page of rules ordered by ID (keyset pagination)
+
+        Args:
+            user_id: Only rules of this user
+            platform: Only rules with this trigger_platform
+            event: Only rules with this trigger_event
+            after_id: Return rules with an ID greater than this (decoded cursor)
+            limit: Page size
+            fields: Optional column projection; rows are then returned as dicts
+
+        Returns:
+            Tuple of (rows, cursor for the next page or None)
+        """
+        if fields:
+            query = select(*[getattr(Rule, name) for name in fields])
+        else:
+            query = select(Rule)
+
+        if user_id is not None:
+            query = query.where(Rule.user_id == user_id)
+        if platform:
+            query = query.where(Rule.trigger_platform == platform)
+        if event:
+            query = query.where(Rule.trigger_event == event)
+        if after_id is not None:
+            query = query.where(Rule.id > after_id)
+
+        # Fetch one extra row to know whether another page exists
+        query = query.order_by(Rule.id).limit(limit + 1)
+        result = await self.session.execute(query)
+        rows = [dict(row._mapping) for row in result] if fields else list(result.scalars().all())
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last["id"] if fields else last.id)
+        return rows, next_cursor
+
+    async def iter_rules(
+        self,
+        user_id: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield every rule (optionally of one user) as a dict, one keyset page at a time
+
+        Only one page is held in memory, so this is safe for very large exports.
+        """
+        fields = fields or RULE_FIELDS
+        after_id = None
+        while True:
+            rows, next_cursor = await self.list_rules(
+                user_id=user_id, after_id=after_id, limit=batch_size, fields=fields
+            )
+            for row in rows:
+                yield row
+            if not next_cursor:
+                break
+            after_id = rows[-1]["id"]
+
+    async def insert_many(self, rows: List[Dict[str, Any]]):
+        """
+        Insert a batch of rules in one round-trip
+
+        The statement is compiled once and cached; SQLAlchemy sends the rows
+        as multi-row INSERTs / a driver-level executemany. Does not commit;
+        the caller controls the transaction.
+        """
+        if rows:
+            await self.session.execute(insert(Rule), rows)
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
-from db import async_session
+from db import async_session, read_session
 from models.integration import IntegrationCreate, IntegrationUpdate, IntegrationRead
-from repositories.integration_repository import IntegrationRepository
+from repositories.integration_repository import IntegrationRepository, INTEGRATION_FIELDS
+from services.integration_health import connection_tester, integration_health, run_connection_test
+from services.response_cache import (
+    cached_response, request_key, response_cache, response_session, store_response, tenant_key
+)
+from utils.pagination import DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER, clamp_limit, decode_cursor, parse_fields
 
 router = APIRouter()
 
@@ -20,36 +25,93 @@ async def create_integration(
     """Create a new integration"""
     repository = IntegrationRepository(session)
     integration = await repository.create_integration(integration_data)
+    response_cache.bump(integration.user_id)
     return IntegrationRead.from_integration(integration)
 
 @router.get("/integrations", response_model=List[IntegrationRead])
 async def get_integrations(
+    request: Request,
     user_id: int = None,
     integration_type: str = None,
-    session: AsyncSession = Depends(get_session)
+    platform: str = None,
+    is_active: bool = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: str = None
 ):
-    """Get all integrations for a user, optionally filtered by type"""
-    repository = IntegrationRepository(session)
-    
-    # For now, if no user_id is provided, return all integrations
+    """
+    Get integrations one page at a time, optionally filtered by user, type and status
+
+    `platform` is an alias of `integration_type`. The next page is requested by
+    passing the X-Next-Cursor response header back as `cursor`.
+    Responses carry an ETag; If-None-Match is answered from the cache.
+    """
+    cache_key = request_key("integrations", request)
+    cached = cached_response(request, cache_key)
+    if cached:
+        return cached
+
+    try:
+        after_id = decode_cursor(cursor)
+        projection = parse_fields(fields, INTEGRATION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # For now, if no user_id is provided, integrations of all users are listed
     # In a real production app, you'd use authentication to get the current user
-    if user_id is None:
-        integrations = await repository.get_all_integrations()
-    elif integration_type:
-        integrations = await repository.get_integrations_by_type(user_id, integration_type)
-    else:
+    snapshot = response_cache.snapshot()
+    async with response_session() as session:
+        repository = IntegrationRepository(session)
+        integrations, next_cursor = await repository.list_integrations(
+            user_id=user_id,
+            integration_type=integration_type or platform,
+            is_active=is_active,
+            after_id=after_id,
+            limit=clamp_limit(limit),
+            fields=projection
+        )
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+    if not projection:
+        integrations = [IntegrationRead.from_integration(integration) for integration in integrations]
+    return store_response(request, cache_key, tenant_key(user_id), snapshot, integrations, headers)
+
+@router.get("/integrations/test-all")
+async def test_all_integrations(user_id: int, include_inactive: bool = False):
+    """
+    Connectivity of all of a user's integrations
+
+    Integrations are checked concurrently with a timeout per check. Results
+    are cached briefly; an expired result is returned with "stale": true
+    while it is refreshed in the background (see services/integration_health.py).
+    """
+    async with read_session() as session:
+        repository = IntegrationRepository(session)
         integrations = await repository.get_integrations_by_user(user_id)
-    
-    return [IntegrationRead.from_integration(integration) for integration in integrations]
+    if not include_inactive:
+        integrations = [integration for integration in integrations if integration.is_active]
+
+    results = await integration_health.check_all(integrations)
+    return {
+        "success": all(result["success"] for result in results),
+        "results": results
+    }
 
 @router.get("/integrations/{integration_id}", response_model=IntegrationRead)
 async def get_integration(
     integration_id: int,
-    session: AsyncSession = Depends(get_session)
+    request: Request
 ):
     """Get a specific integration by ID"""
-    repository = IntegrationRepository(session)
-    integration = await repository.get_integration(integration_id)
+    cache_key = request_key("integration", request)
+    cached = cached_response(request, cache_key)
+    if cached:
+        return cached
+
+    snapshot = response_cache.snapshot()
+    async with response_session() as session:
+        repository = IntegrationRepository(session)
+        integration = await repository.get_integration(integration_id)
     
     if not integration:
         raise HTTPException(
@@ -57,7 +119,10 @@ async def get_integration(
             detail=f"Integration with ID {integration_id} not found"
         )
     
-    return IntegrationRead.from_integration(integration)
+    return store_response(
+        request, cache_key, integration.user_id, snapshot,
+        IntegrationRead.from_integration(integration)
+    )
 
 @router.put("/integrations/{integration_id}", response_model=IntegrationRead)
 async def update_integration(
@@ -75,6 +140,7 @@ async def update_integration(
             detail=f"Integration with ID {integration_id} not found"
         )
     
+    response_cache.bump(integration.user_id)
     return IntegrationRead.from_integration(integration)
 
 @router.delete("/integrations/{integration_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -84,13 +150,15 @@ async def delete_integration(
 ):
     """Delete an integration"""
     repository = IntegrationRepository(session)
-    success = await repository.delete_integration(integration_id)
+    deleted = await repository.delete_integration(integration_id)
     
-    if not success:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Integration with ID {integration_id} not found"
         )
+    
+    response_cache.bump(deleted.user_id)
 
 @router.post("/integrations/{integration_id}/test", status_code=status.HTTP_200_OK)
 async def test_integration(
@@ -130,36 +198,16 @@ async def test_integration_connection(integration_type: str, config: dict):
     """Helper function to test integration connection"""
     # Import the appropriate module based on integration type
     try:
-        if integration_type == "zendesk":
-            from modules.zendesk.actions import test_connection
-        elif integration_type == "freshdesk":
-            from modules.freshdesk.actions import test_connection
-        elif integration_type == "slack":
-            from modules.slack.actions import test_connection
-        else:
+        if connection_tester(integration_type) is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Unsupported integration type: {integration_type}"
             )
-        
-        # Test the connection
-        result = test_connection(config)
-        
-        if result.get("success"):
-            return {"success": True, "message": "Connection successful"}
-        else:
-            return {
-                "success": False, 
-                "message": result.get("message", "Connection failed")
-            }
-    
     except ImportError:
         raise HTTPException(
             status_code=status.HTTP_501_NOT_IMPLEMENTED,
             detail=f"Integration module for {integration_type} not implemented"
         )
-    except Exception as e:
-        return {
-            "success": False,
-            "message": f"Error testing connection: {str(e)}"
-        }
+
+    # Test the connection (off the event loop, with a timeout)
+    return await run_connection_test(integration_type, config)
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, Response
-from fastapi.responses import JSONResponse
-from sqlalchemy.future import select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
-from db import async_session
+from db import async_session, read_session
 from models.rule import Rule
+from repositories.rule_repository import RuleRepository, RULE_FIELDS
+from services.rule_validation import RuleBatchValidator, validate_rule
+from services.response_cache import (
+    cached_response, request_key, response_cache, response_session, store_response, tenant_key
+)
 from typing import List, Optional
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER, clamp_limit, decode_cursor, parse_fields
+)
+from utils.json_stream import iter_json_items
+from utils.log import get_logger, log_payload
 
 router = APIRouter()
+logger = get_logger("rules")
 
 
 async def get_session():
@@ -14,13 +24,50 @@ async def get_session():
         yield session
 
 @router.get("/", response_model=List[Rule])  # Changed from "/rules" to "/"
-async def get_rules(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(Rule))
-    rules = result.scalars().all()
-    return [rule for rule in rules]
+async def get_rules(
+    request: Request,
+    user_id: Optional[int] = None,
+    platform: Optional[str] = None,
+    event: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None
+):
+    """
+    List rules one page at a time, ordered by ID
+
+    The next page is requested by passing the X-Next-Cursor response header
+    back as `cursor`. `fields=id,name` limits the returned columns.
+    Responses carry an ETag; If-None-Match is answered from the cache.
+    """
+    cache_key = request_key("rules", request)
+    cached = cached_response(request, cache_key)
+    if cached:
+        return cached
+
+    try:
+        after_id = decode_cursor(cursor)
+        projection = parse_fields(fields, RULE_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    snapshot = response_cache.snapshot()
+    async with response_session() as session:
+        repository = RuleRepository(session)
+        rules, next_cursor = await repository.list_rules(
+            user_id=user_id,
+            platform=platform,
+            event=event,
+            after_id=after_id,
+            limit=clamp_limit(limit),
+            fields=projection
+        )
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return store_response(request, cache_key, tenant_key(user_id), snapshot, rules, headers)
 
 import json
-from pydantic import BaseModel
+import tempfile
+from pydantic import BaseModel, ValidationError
 
 class RuleCreate(BaseModel):
     user_id: int
@@ -39,14 +86,137 @@ class RuleUpdate(BaseModel):
     trigger_data: Optional[str] = None
     actions: Optional[list] = None
 
+# Rules per multi-row INSERT during bulk import
+IMPORT_BATCH_SIZE = 1000
+# Bytes of validated import rows kept in memory before spooling to disk
+IMPORT_SPOOL_SIZE = 4 * 1024 * 1024
+
+def _rule_row(rule: RuleCreate) -> dict:
+    """Column values for a validated RuleCreate"""
+    row = rule.dict()
+    row["actions"] = json.dumps(row["actions"] or [])
+    return row
+
+@router.post("/import")
+async def import_rules(
+    request: Request,
+    user_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Bulk-create rules from a streamed JSON array or NDJSON body
+
+    Each item has the shape of a POST /rules/ payload. The whole body is read
+    and validated first (rows are spooled to a temporary file, remote checks
+    such as Notion schemas run once for all rules), then inserted with
+    multi-row INSERTs inside one transaction, so no request or remote call
+    holds the transaction open. If any item is invalid nothing is imported.
+    `user_id`, when given, is applied to every rule.
+    """
+    repository = RuleRepository(session)
+    validator = RuleBatchValidator()
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE, mode="w+")
+    imported = 0
+    index = 0
+    tenants = set()
+
+    try:
+        async for item in iter_json_items(request.stream()):
+            if not isinstance(item, dict):
+                raise ValueError("Expected a JSON object")
+            if user_id is not None:
+                item["user_id"] = user_id
+            rule = RuleCreate(**item)
+            validator.add(index, rule.trigger_event, rule.trigger_data, rule.actions)
+            tenants.add(rule.user_id)
+            spool.write(json.dumps(_rule_row(rule)) + "\n")
+            index += 1
+
+        failure = await validator.check()
+        if failure:
+            index, message = failure
+            raise ValueError(message)
+
+        spool.seek(0)
+        batch = []
+        for line in spool:
+            batch.append(json.loads(line))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await repository.insert_many(batch)
+                imported += len(batch)
+                batch = []
+        await repository.insert_many(batch)
+        imported += len(batch)
+        await session.commit()
+    except ValidationError as e:
+        await session.rollback()
+        return JSONResponse(status_code=422, content={
+            "message": f"Invalid rule at index {index}",
+            "index": index,
+            "errors": [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+        })
+    except ValueError as e:
+        await session.rollback()
+        return JSONResponse(status_code=422, content={
+            "message": f"Invalid rule at index {index}: {e}",
+            "index": index
+        })
+    finally:
+        spool.close()
+
+    for tenant in tenants:
+        response_cache.bump(tenant)
+    logger.info("Imported %s rules", imported)
+    return {"imported": imported}
+
+@router.get("/export")
+async def export_rules(user_id: Optional[int] = None, format: str = "ndjson"):
+    """
+    Stream all rules (optionally of one user) as NDJSON or a JSON array
+
+    Rules are read one keyset page at a time, so memory use does not grow
+    with the number of rules. The output can be fed back to /rules/import.
+    """
+    if format not in ("ndjson", "json"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format must be 'ndjson' or 'json'")
+    as_array = format == "json"
+
+    def encode(items, continued):
+        if as_array:
+            return (("," if continued else "") + ",".join(items)).encode()
+        return "".join(item + "\n" for item in items).encode()
+
+    async def generate():
+        async with read_session() as session:
+            repository = RuleRepository(session)
+            pending = []
+            continued = False
+            if as_array:
+                yield b"["
+            async for row in repository.iter_rules(user_id=user_id):
+                row["actions"] = json.loads(row["actions"] or "[]")
+                pending.append(json.dumps(row))
+                if len(pending) >= IMPORT_BATCH_SIZE:
+                    yield encode(pending, continued)
+                    continued = True
+                    pending = []
+            if pending:
+                yield encode(pending, continued)
+            if as_array:
+                yield b"]"
+
+    media_type = "application/json" if as_array else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type)
+
 @router.post("/", response_model=Rule)
 async def create_rule(rule: RuleCreate, session: AsyncSession = Depends(get_session)):
-    import logging, json
-    logging.warning(f"--- Creating new rule ---")
-    logging.warning(f"Received rule_create payload: {rule.dict()}")
+    log_payload(logger, "Received rule_create payload", rule.dict())
+    try:
+        await validate_rule(rule.trigger_event, rule.trigger_data, rule.actions)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"message": str(e)})
     
     actions_val = rule.actions if hasattr(rule, 'actions') else []
-    logging.warning(f"Actions value from payload: {actions_val}, Type: {type(actions_val)}")
 
     if not actions_val:
         actions_str = "[]"
@@ -54,8 +224,6 @@ async def create_rule(rule: RuleCreate, session: AsyncSession = Depends(get_sess
         actions_str = actions_val # Should not happen with Pydantic list type
     else:
         actions_str = json.dumps(actions_val)
-    
-    logging.warning(f"Actions converted to JSON string for DB: {actions_str}")
 
     db_rule = Rule(
         user_id=rule.user_id,
@@ -66,78 +234,69 @@ async def create_rule(rule: RuleCreate, session: AsyncSession = Depends(get_sess
         trigger_data=rule.trigger_data,
         actions=actions_str
     )
-    
-    logging.warning(f"Rule object to be saved: {db_rule.dict()}")
 
     session.add(db_rule)
     await session.commit()
     await session.refresh(db_rule)
     
-    logging.warning(f"Rule object AFTER saving to DB and refreshing: {db_rule.dict()}")
-    logging.warning(f"--- Finished creating rule ---")
+    response_cache.bump(db_rule.user_id)
+    logger.info("Created rule %s", db_rule.id, extra={"rule_id": db_rule.id})
     return db_rule
 
 @router.get("/{rule_id}", response_model=Rule)
-async def get_rule(rule_id: int, session: AsyncSession = Depends(get_session)):
-    rule = await session.get(Rule, rule_id)
+async def get_rule(rule_id: int, request: Request):
+    cache_key = request_key("rule", request)
+    cached = cached_response(request, cache_key)
+    if cached:
+        return cached
+
+    snapshot = response_cache.snapshot()
+    async with response_session() as session:
+        rule = await session.get(Rule, rule_id)
     if not rule:
         return JSONResponse(status_code=404, content={"message": "Rule not found"})
-    return rule
+    return store_response(request, cache_key, rule.user_id, snapshot, rule)
 
 @router.put("/{rule_id}", response_model=Rule)
 async def update_rule(rule_id: int, rule_update: RuleUpdate, session: AsyncSession = Depends(get_session)):
-    import logging # Ensure logging is imported
-    # Ensure json is imported if it's used and not at top-level of file already (it is in this file)
-    logging.warning(f"--- Updating rule ID: {rule_id} ---")
-    logging.warning(f"Received rule_update payload (exclude_unset=False to see all fields from model): {rule_update.dict(exclude_unset=False)}")
-    logging.warning(f"Received rule_update payload (exclude_none=True to see only provided non-null fields): {rule_update.dict(exclude_none=True)}")
     db_rule = await session.get(Rule, rule_id)
     if not db_rule:
-        logging.error(f"Rule {rule_id} not found for update.")
+        logger.warning("Rule %s not found for update", rule_id, extra={"rule_id": rule_id})
         return JSONResponse(status_code=404, content={"message": "Rule not found"})
-    
-    logging.warning(f"DB rule.actions BEFORE any update: {db_rule.actions}")
-    logging.warning(f"DB rule full object BEFORE any update: {db_rule.dict()}")
 
     update_data = rule_update.dict(exclude_unset=True)
-    logging.warning(f"Update_data (from rule_update.dict(exclude_unset=True)): {update_data}")
+    log_payload(logger, "Received rule_update payload", update_data, rule_id=rule_id)
+    try:
+        # Only actions sent with the update are checked
+        await validate_rule(
+            update_data.get("trigger_event", db_rule.trigger_event),
+            update_data.get("trigger_data", db_rule.trigger_data),
+            update_data.get("actions")
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"message": str(e)})
     
     if 'actions' in update_data:
-        logging.warning(f"'actions' field IS PRESENT in update_data. Value: {update_data['actions']}, Type: {type(update_data['actions'])}")
         if update_data['actions'] is not None:
-            # This is where the list of actions should be converted to a JSON string
-            actions_as_json_string = json.dumps(update_data['actions'])
-            update_data['actions'] = actions_as_json_string # Modify update_data to hold the string for the loop below
-            logging.warning(f"Converted 'actions' to JSON string for storage: {actions_as_json_string}")
+            # Store the list of actions as a JSON string
+            update_data['actions'] = json.dumps(update_data['actions'])
         else:
-            # If 'actions' was explicitly passed as null in the payload
-            logging.warning(f"'actions' field in update_data is None. It will be set as null/None on db_rule if 'actions' key is iterated.")
-            # SQLModel/SQLAlchemy might store this as Python None, which becomes SQL NULL.
-            # For a string field, storing '[]' for empty or 'null' string might be preferable.
-            # Let's ensure it's a string if the db field is string.
-            update_data['actions'] = "[]" # Default to empty JSON array string if payload sends null for actions
-            logging.warning(f"'actions' was None in payload, will store as '[]'.")
-    else:
-        logging.warning(f"'actions' field IS NOT PRESENT in update_data (was not in PUT request or was default). db_rule.actions will not be changed by this update.")
+            # Default to empty JSON array string if payload sends null for actions
+            update_data['actions'] = "[]"
 
     # Apply all changes from update_data to db_rule
     for key, value in update_data.items():
         if hasattr(db_rule, key):
             setattr(db_rule, key, value)
-            logging.warning(f"Set db_rule.{key} = {repr(value)}")
         else:
-            logging.warning(f"Attempted to set unknown attribute {key} on db_rule.")
-    
-    logging.warning(f"DB rule.actions JUST BEFORE commit: {db_rule.actions}")
-    logging.warning(f"Full db_rule object JUST BEFORE commit: {db_rule.dict()}")
+            logger.warning("Attempted to set unknown attribute %s on rule %s", key, rule_id)
     
     session.add(db_rule)
     await session.commit()
     await session.refresh(db_rule)
 
-    logging.warning(f"DB rule.actions AFTER commit and refresh: {db_rule.actions}")
-    logging.warning(f"Full db_rule object AFTER commit and refresh: {db_rule.dict()}")
-    logging.warning(f"--- Finished updating rule ID: {rule_id} ---")
+    response_cache.bump(db_rule.user_id)
+    logger.info("Updated rule %s (fields: %s)", rule_id, ", ".join(update_data), extra={"rule_id": rule_id})
     return db_rule
 
 @router.delete("/{rule_id}")
@@ -148,4 +307,5 @@ async def delete_rule(rule_id: int, session: AsyncSession = Depends(get_session)
     
     await session.delete(rule)
     await session.commit()
+    response_cache.bump(rule.user_id)
     return Response(status_code=204)
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from db import get_read_session
+from services.execution_stats import GROUP_COLUMNS, ROLLUP_MODELS, query_stats
+
+router = APIRouter()
+
+# Ranges up to this long default to per-minute buckets, longer ones to per-hour
+MINUTE_RESOLUTION_MAX_RANGE = timedelta(hours=6)
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Rollup buckets are naive UTC; convert a timestamp with an offset (e.g. "...Z") to that"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_stats(
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    group_by: str = "platform",
+    kind: str = "action",
+    series: bool = True,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Execution statistics from the pre-aggregated rollups
+
+    Examples:
+        Actions per platform per hour: /stats?group_by=platform&resolution=hour
+        Failure rate and p95 latency per rule over 90 days:
+            /stats?group_by=rule&kind=rule&series=false&since=<90 days ago>
+    """
+    until = _naive_utc(until) or datetime.utcnow()
+    since = _naive_utc(since) or until - timedelta(hours=24)
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be before until")
+    if resolution is None:
+        resolution = "minute" if until - since <= MINUTE_RESOLUTION_MAX_RANGE else "hour"
+    if resolution not in ROLLUP_MODELS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="resolution must be 'minute' or 'hour'")
+    if group_by not in GROUP_COLUMNS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="group_by must be 'platform', 'rule' or 'none'")
+    if kind not in ("action", "rule"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="kind must be 'action' or 'rule'")
+
+    rows = await query_stats(
+        session,
+        since=since,
+        until=until,
+        resolution=resolution,
+        group_by=group_by,
+        kind=kind,
+        user_id=user_id,
+        series=series
+    )
+    return {
+        "since": since,
+        "until": until,
+        "resolution": resolution,
+        "group_by": group_by,
+        "kind": kind,
+        "rows": rows
+    }
@@ -0,0 +1,207 @@
+"""
+Forwarding of ticket attachments to Slack, Discord and Linear
+
+    {"platform": "attachments", "action": "forward_attachments",
+     "integration_id": 1,                      # Zendesk or Freshdesk integration
+     "ticket_id": "{{ticket.ticket_id}}",
+     "latest_only": true,                      # Newest comment with files (default), or all
+     "content_types": ["image/", "text/plain"],  # Optional MIME type prefixes
+     "destination": {"platform": "slack", "integration_id": 2, "channel": "#support",
+                     "message": "Files of ticket {{ticket.ticket_id}}"}}
+
+Destinations: Slack (token integration, channel name or ID), Discord
+({"platform": "discord", "webhook_url": ..., "content": ...}) and Linear
+({"platform": "linear", "issue_id": "ENG-123"}, attached to the issue).
+
+Files are never held in memory: the download is read in small chunks while
+they are written to the destination's upload endpoint (see
+utils/streaming.py), so a transfer costs a few chunks of RAM whatever the
+file's size. At most ATTACHMENT_CONCURRENCY transfers run at once per
+process; files above ATTACHMENT_MAX_SIZE bytes are skipped.
+
+Environment variables:
+    ATTACHMENT_CONCURRENCY: Transfers running at the same time (default 4)
+    ATTACHMENT_MAX_SIZE: Largest file forwarded, in bytes (default 262144000)
+"""
+import asyncio
+import os
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from repositories.integration_repository import IntegrationRepository
+from utils.log import get_logger
+from utils.streaming import StreamBody, sized_body
+
+logger = get_logger("attachment_forwarder")
+
+ATTACHMENT_CONCURRENCY = int(os.getenv("ATTACHMENT_CONCURRENCY", "4"))
+ATTACHMENT_MAX_SIZE = int(os.getenv("ATTACHMENT_MAX_SIZE", str(250 * 1024 * 1024)))
+
+# Files forwarded per action
+MAX_ATTACHMENTS = 20
+
+# Uploads a sized body: (body, attachment) -> action result
+Sender = Callable[[StreamBody, Dict[str, Any]], Dict[str, Any]]
+
+
+def _succeeded(result: Dict[str, Any]) -> bool:
+    if "ok" in result:  # Slack API response
+        return bool(result["ok"])
+    if "success" in result:
+        return bool(result["success"])
+    return result.get("status") == "success"
+
+
+class AttachmentForwarder:
+    def __init__(self, concurrency: int = ATTACHMENT_CONCURRENCY, max_size: int = ATTACHMENT_MAX_SIZE):
+        self.max_size = max_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _transfer(self, open_download: Callable[[str], Any], send: Sender, attachment: Dict[str, Any]) -> Dict[str, Any]:
+        """Stream one attachment from its download into the destination (blocking)"""
+        try:
+            response = open_download(attachment["content_url"])
+        except Exception as e:
+            return {"success": False, "message": f"Failed to download attachment: {str(e)}"}
+        try:
+            body = sized_body(response, attachment.get("size"), self.max_size)
+            return send(body, attachment)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        finally:
+            response.close()
+
+    async def _destination(
+        self, session: AsyncSession, destination: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Prepare a destination
+
+        Returns:
+            Dict with 'send' (a Sender) and for Discord 'webhook_url', or 'message' on error
+        """
+        platform = destination.get("platform")
+        if platform == "slack":
+            from modules.slack.actions import upload_file
+            from services.slack_directory import slack_directory
+
+            integration_id = destination.get("integration_id")
+            repository = IntegrationRepository(session)
+            integration = await repository.get_integration(integration_id) if integration_id else None
+            if not integration or integration.integration_type != "slack":
+                return {"message": f"Slack integration with ID {integration_id} not found"}
+            config = repository.get_decrypted_config(integration)
+            if "token" not in config:
+                return {"message": "Slack file uploads need a token integration"}
+            channel = destination.get("channel") or "#general"
+            channel_id = await slack_directory.channel_id(integration_id, config, channel)
+            if channel_id is None:
+                return {"message": f"Unknown Slack channel: {channel}"}
+            message = destination.get("message")
+            return {"send": lambda body, attachment: upload_file(
+                config, channel_id, body, attachment["file_name"], comment=message
+            )}
+
+        if platform == "discord":
+            from modules.discord.action import get_webhook_url, upload_file
+
+            webhook_url = get_webhook_url(destination)
+            if not webhook_url:
+                return {"message": "Discord webhook URL not configured"}
+            payload = {key: destination[key] for key in ("content", "username", "avatar_url") if destination.get(key)}
+            return {"webhook_url": webhook_url, "send": lambda body, attachment: upload_file(
+                webhook_url, body, attachment["file_name"], attachment.get("content_type"), payload
+            )}
+
+        if platform == "linear":
+            from modules.linear.action import get_token, upload_file
+
+            token = get_token(destination)
+            if not token:
+                return {"message": "Linear API token not configured"}
+            if not destination.get("issue_id"):
+                return {"message": "Missing issue_id in Linear destination"}
+            return {"send": lambda body, attachment: upload_file(
+                token, destination["issue_id"], body, attachment["file_name"], attachment.get("content_type")
+            )}
+
+        return {"message": f"Unsupported attachment destination: {platform}"}
+
+    async def forward(self, session: AsyncSession, action: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Forward the attachments of a ticket
+
+        Returns:
+            Dict with success (every file forwarded) and per-file results
+        """
+        integration_id = action.get("integration_id")
+        ticket_id = action.get("ticket_id")
+        destination = action.get("destination")
+        if not integration_id or not ticket_id or not isinstance(destination, dict):
+            return {"success": False, "message": "Missing integration_id, ticket_id or destination for forward_attachments"}
+
+        repository = IntegrationRepository(session)
+        integration = await repository.get_integration(integration_id)
+        if not integration:
+            return {"success": False, "message": f"Integration with ID {integration_id} not found"}
+        if integration.integration_type == "zendesk":
+            from modules.zendesk import actions as source
+        elif integration.integration_type == "freshdesk":
+            from modules.freshdesk import actions as source
+        else:
+            return {"success": False, "message": f"Attachments cannot be read from {integration.integration_type}"}
+        config = repository.get_decrypted_config(integration)
+
+        listing = await asyncio.to_thread(source.list_attachments, config, ticket_id, action.get("latest_only", True))
+        if not listing.get("success"):
+            return {"success": False, "message": f"Failed to list attachments: {listing.get('message')}"}
+        content_types = action.get("content_types") or []
+        attachments = [
+            attachment for attachment in listing["data"]
+            if attachment.get("content_url") and (
+                not content_types
+                or any((attachment.get("content_type") or "").startswith(prefix) for prefix in content_types)
+            )
+        ][:MAX_ATTACHMENTS]
+        if not attachments:
+            return {"success": True, "message": "No attachments to forward", "results": []}
+
+        target = await self._destination(session, destination)
+        if "send" not in target:
+            return {"success": False, "message": target["message"]}
+        open_download = partial(source.open_attachment, config)
+
+        async def forward_one(attachment: Dict[str, Any]) -> Dict[str, Any]:
+            size = attachment.get("size")
+            if size and size > self.max_size:
+                return {"file_name": attachment["file_name"], "success": False,
+                        "message": f"File is larger than {self.max_size} bytes"}
+            transfer = partial(self._transfer, open_download, target["send"], attachment)
+            async with self._semaphore:
+                if "webhook_url" in target:
+                    # Discord uploads share the webhook's rate limit bucket with its messages
+                    from services.discord_delivery import discord_delivery
+                    result = await discord_delivery.send_file(target["webhook_url"], transfer)
+                else:
+                    result = await asyncio.to_thread(transfer)
+            success = _succeeded(result)
+            if not success:
+                logger.warning("Failed to forward attachment %s: %s", attachment["file_name"],
+                               result.get("message") or result.get("error"))
+            return {
+                "file_name": attachment["file_name"],
+                "success": success,
+                "message": result.get("message") or result.get("error") or ("Forwarded" if success else "Failed")
+            }
+
+        results: List[Dict[str, Any]] = list(await asyncio.gather(*[forward_one(a) for a in attachments]))
+        failed = [result for result in results if not result["success"]]
+        response = {"success": not failed, "results": results}
+        if failed:
+            response["message"] = "; ".join(f"{r['file_name']}: {r['message']}" for r in failed)
+        return response
+
+
+attachment_forwarder = AttachmentForwarder()
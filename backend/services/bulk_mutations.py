@@ -0,0 +1,290 @@
+"""
+Coalescing of ticket mutations into the platforms' bulk APIs
+
+During surges many rules update (or create) tickets through the same
+integration at once. Instead of one request per ticket, mutations of one
+integration and action type that arrive within BULK_MUTATION_WINDOW seconds
+are sent together:
+
+- Zendesk update_ticket / create_ticket: tickets/update_many and
+  tickets/create_many (100 tickets per request), each ticket with its own
+  changes. create_many takes no Idempotency-Key, so creations made with an
+  idempotency key (see services/idempotency.py) are sent on their own
+- Freshdesk update_ticket: tickets/bulk_update, which applies one set of
+  properties, so only identical updates are combined
+
+Both platforms run bulk requests as background jobs. The job is polled
+until it finishes and every caller gets the result for its own ticket, in
+the same {"success": ..., "data"/"message": ...} form as a single request.
+A window with one mutation, or a bulk request that is rejected, falls back
+to the single-ticket calls.
+
+Environment variables:
+    BULK_MUTATION_WINDOW: Seconds mutations wait for others to join them; 0 disables coalescing (default 0.5)
+    BULK_JOB_TIMEOUT: Seconds to wait for a bulk job before reporting failure (default 120)
+"""
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from services.idempotency import current_key
+from utils.log import get_logger
+
+logger = get_logger("bulk_mutations")
+
+BULK_MUTATION_WINDOW = float(os.getenv("BULK_MUTATION_WINDOW", "0.5"))
+BULK_JOB_TIMEOUT = float(os.getenv("BULK_JOB_TIMEOUT", "120"))
+
+# Tickets per bulk request (the Zendesk limit)
+BULK_LIMIT = 100
+# Longest pause between job status checks
+MAX_POLL_DELAY = 10
+
+BULK_ACTIONS = {
+    ("zendesk", "update_ticket"),
+    ("zendesk", "create_ticket"),
+    ("freshdesk", "update_ticket"),
+}
+
+
+class _Mutation:
+    __slots__ = ("ticket_id", "data", "future", "idempotency_key")
+
+    def __init__(self, ticket_id: Any, data: Dict[str, Any], future: asyncio.Future, idempotency_key: Optional[str] = None):
+        self.ticket_id = ticket_id
+        self.data = data
+        self.future = future
+        self.idempotency_key = idempotency_key
+
+
+class _Batch:
+    __slots__ = ("platform", "action_type", "config", "mutations", "handle")
+
+    def __init__(self, platform: str, action_type: str, config: Dict[str, Any]):
+        self.platform = platform
+        self.action_type = action_type
+        self.config = config
+        self.mutations: List[_Mutation] = []
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+def _chunks(mutations: List[_Mutation]) -> List[List[_Mutation]]:
+    """Split into bulk-sized chunks in which no ticket appears twice (keeping their order)"""
+    chunks, chunk, seen = [], [], set()
+    for mutation in mutations:
+        key = str(mutation.ticket_id) if mutation.ticket_id is not None else None
+        if len(chunk) >= BULK_LIMIT or (key is not None and key in seen):
+            chunks.append(chunk)
+            chunk, seen = [], set()
+        chunk.append(mutation)
+        if key is not None:
+            seen.add(key)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class BulkMutationCoalescer:
+    def __init__(self, window: float = BULK_MUTATION_WINDOW, job_timeout: float = BULK_JOB_TIMEOUT):
+        self.window = window
+        self.job_timeout = job_timeout
+        self._batches: Dict[Hashable, _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        platform: str,
+        integration_id: int,
+        config: Dict[str, Any],
+        action_type: str,
+        data: Dict[str, Any],
+        ticket_id: Any = None
+    ) -> Dict[str, Any]:
+        """
+        Run a ticket mutation, combined with others of the same integration
+
+        Args:
+            platform: zendesk or freshdesk
+            integration_id: Integration the mutation goes through
+            config: Decrypted integration config
+            action_type: create_ticket or update_ticket
+            data: Ticket fields to create or update
+            ticket_id: Ticket to update (update_ticket)
+
+        Returns:
+            The result of this mutation alone
+        """
+        # Forwarded to Zendesk, which only accepts it on single creations
+        idempotency_key = current_key.get()
+        keyed_create = action_type == "create_ticket" and idempotency_key is not None
+        if self.window <= 0 or (platform, action_type) not in BULK_ACTIONS or keyed_create:
+            return await asyncio.to_thread(self._single, platform, action_type, config, ticket_id, data, idempotency_key)
+
+        key = (platform, integration_id, action_type)
+        if platform == "freshdesk":
+            # Freshdesk applies one set of properties to every ticket of a bulk update
+            key += (json.dumps(data, sort_keys=True, default=str),)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(platform, action_type, config)
+            batch.handle = asyncio.get_running_loop().call_later(self.window, self._flush_key, key)
+        future = asyncio.get_running_loop().create_future()
+        batch.mutations.append(_Mutation(ticket_id, data, future, idempotency_key))
+        if len(batch.mutations) >= BULK_LIMIT:
+            self._flush_key(key)
+        return await future
+
+    def _flush_key(self, key: Hashable):
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.handle is not None:
+            batch.handle.cancel()
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _single(platform: str, action_type: str, config: Dict[str, Any], ticket_id: Any, data: Dict[str, Any],
+                idempotency_key: Optional[str] = None):
+        if platform == "zendesk":
+            from modules.zendesk.actions import create_ticket, update_ticket
+            if action_type == "create_ticket":
+                return create_ticket(config, data, idempotency_key)
+        else:
+            from modules.freshdesk.actions import create_ticket, update_ticket
+        if action_type == "create_ticket":
+            return create_ticket(config, data)
+        return update_ticket(config, ticket_id, data)
+
+    async def _run_single(self, batch: _Batch, mutations: List[_Mutation]):
+        for mutation in mutations:
+            result = await asyncio.to_thread(
+                self._single, batch.platform, batch.action_type, batch.config, mutation.ticket_id, mutation.data,
+                mutation.idempotency_key
+            )
+            if not mutation.future.done():
+                mutation.future.set_result(result)
+
+    async def _run(self, batch: _Batch):
+        try:
+            if len(batch.mutations) == 1:
+                await self._run_single(batch, batch.mutations)
+            else:
+                run = self._run_zendesk if batch.platform == "zendesk" else self._run_freshdesk
+                for chunk in _chunks(batch.mutations):
+                    await run(batch, chunk)
+        except Exception as e:
+            logger.exception("Bulk %s %s failed: %s", batch.platform, batch.action_type, e)
+            for mutation in batch.mutations:
+                if not mutation.future.done():
+                    mutation.future.set_result({"success": False, "message": f"Bulk mutation error: {str(e)}"})
+
+    async def _wait_for_job(
+        self,
+        fetch: Callable[[Dict[str, Any], str], Dict[str, Any]],
+        config: Dict[str, Any],
+        job_id: str,
+        finished: Callable[[Dict[str, Any]], bool]
+    ) -> Optional[Dict[str, Any]]:
+        """Poll a bulk job until it finishes; None when it did not finish in time"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.job_timeout
+        delay = 1.0
+        while loop.time() < deadline:
+            await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+            result = await asyncio.to_thread(fetch, config, job_id)
+            if result.get("success") and finished(result["data"]):
+                return result["data"]
+            delay = min(delay * 2, MAX_POLL_DELAY)
+        return None
+
+    async def _run_zendesk(self, batch: _Batch, mutations: List[_Mutation]):
+        from modules.zendesk.actions import create_many, get_job_status, update_many
+
+        if batch.action_type == "create_ticket":
+            response = await asyncio.to_thread(create_many, batch.config, [m.data for m in mutations])
+        else:
+            response = await asyncio.to_thread(
+                update_many, batch.config, [dict(m.data, id=m.ticket_id) for m in mutations]
+            )
+        if not response.get("success"):
+            logger.warning("Zendesk bulk request rejected, sending %s tickets one by one: %s",
+                           len(mutations), response.get("message"))
+            await self._run_single(batch, mutations)
+            return
+
+        job_id = response["data"]["job_status"]["id"]
+        logger.info("Zendesk bulk %s job %s for %s tickets", batch.action_type, job_id, len(mutations))
+        job = await self._wait_for_job(
+            get_job_status, batch.config, job_id,
+            lambda data: data["job_status"]["status"] in ("completed", "failed", "killed")
+        )
+        job = job["job_status"] if job else None
+        results = (job or {}).get("results") or []
+        for index, mutation in enumerate(mutations):
+            if batch.action_type == "create_ticket":
+                entry = next((r for r in results if r.get("index") == index), None)
+            else:
+                entry = next((r for r in results if str(r.get("id")) == str(mutation.ticket_id)), None)
+            if not mutation.future.done():
+                mutation.future.set_result(self._job_result(batch.platform, job_id, job, entry))
+
+    async def _run_freshdesk(self, batch: _Batch, mutations: List[_Mutation]):
+        from modules.freshdesk.actions import bulk_update, get_job
+
+        ticket_ids = [m.ticket_id for m in mutations]
+        response = await asyncio.to_thread(bulk_update, batch.config, ticket_ids, mutations[0].data)
+        if not response.get("success"):
+            logger.warning("Freshdesk bulk update rejected, sending %s tickets one by one: %s",
+                           len(mutations), response.get("message"))
+            await self._run_single(batch, mutations)
+            return
+
+        job_id = response["data"]["job_id"]
+        logger.info("Freshdesk bulk update job %s for %s tickets", job_id, len(ticket_ids))
+        job = await self._wait_for_job(
+            get_job, batch.config, job_id,
+            lambda data: data.get("status") in ("COMPLETED", "FAILED")
+        )
+        results = (job or {}).get("data") or []
+        for mutation in mutations:
+            entry = next((r for r in results if str(r.get("id")) == str(mutation.ticket_id)), None)
+            if not mutation.future.done():
+                mutation.future.set_result(self._job_result(batch.platform, job_id, job, entry))
+
+    def _job_result(self, platform: str, job_id: str, job: Optional[Dict[str, Any]], entry: Optional[Dict[str, Any]]):
+        """
+        Result of one ticket of a bulk job, shaped like the single-ticket call's
+
+        "data" holds the ticket as the platform's ticket endpoints return it
+        (wrapped in "ticket" for Zendesk), with only the fields the job reports;
+        the job's own entry is in "job_entry".
+        """
+        if job is None:
+            return {"success": False, "message": f"Bulk job {job_id} did not finish within {self.job_timeout:g}s"}
+        if entry is None:
+            return {"success": False, "message": f"Bulk job {job_id} returned no result for this ticket"}
+        if entry.get("success") is False or entry.get("error"):
+            return {
+                "success": False,
+                "message": f"Bulk job {job_id}: {entry.get('error') or entry.get('message') or entry.get('details')}"
+            }
+        ticket = {"id": entry.get("id")}
+        data = {"ticket": ticket} if platform == "zendesk" else ticket
+        return {"success": True, "data": data, "job_id": job_id, "job_entry": entry}
+
+    async def flush(self):
+        """Send every waiting batch now and wait for all bulk jobs (on shutdown)"""
+        for key in list(self._batches):
+            self._flush_key(key)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+bulk_mutations = BulkMutationCoalescer()
+
+
+async def flush_bulk_mutations():
+    await bulk_mutations.flush()
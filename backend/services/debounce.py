@@ -0,0 +1,126 @@
+"""
+Per-key burst collapsing for event processing
+
+Two modes, both keyed (for events) by platform, ticket and rule:
+
+- trailing: the first call opens a window; later calls within it replace (or
+  merge into) the stored value and push the deadline back (never past
+  max_wait after the first call). When the window closes the callback runs
+  once with the latest value.
+- leading: the first call in a window runs right away; later calls within
+  the window are dropped.
+
+Windows live in memory and are driven by event loop timers, so there is no
+task or polling per key. Pending trailing windows are fired on shutdown; a
+crash loses them, so queued events are debounced with delayed jobs instead
+(see services/event_pipeline.py).
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from utils.log import get_logger
+
+logger = get_logger("debounce")
+
+# Longest a burst can keep postponing its evaluation
+EVENT_DEBOUNCE_MAX_WAIT = float(os.getenv("EVENT_DEBOUNCE_MAX_WAIT", "30"))
+
+Callback = Callable[[Any], Awaitable[Any]]
+
+
+class _Window:
+    __slots__ = ("value", "callback", "first_at", "handle", "collapsed")
+
+    def __init__(self, value: Any, callback: Callback, first_at: float):
+        self.value = value
+        self.callback = callback
+        self.first_at = first_at
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.collapsed = 0
+
+
+class Debouncer:
+    def __init__(self, max_wait: float = EVENT_DEBOUNCE_MAX_WAIT):
+        self.max_wait = max_wait
+        self._trailing: Dict[Hashable, _Window] = {}
+        self._leading: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._trailing)
+
+    def leading(self, key: Hashable, window: float) -> bool:
+        """
+        Open a window for `key` unless one is open
+
+        Returns:
+            True for the first call of a window (process it), False for calls to drop
+        """
+        if key in self._leading:
+            return False
+        loop = asyncio.get_running_loop()
+        self._leading[key] = loop.call_later(window, self._leading.pop, key, None)
+        return True
+
+    def trailing(
+        self,
+        key: Hashable,
+        window: float,
+        value: Any,
+        callback: Callback,
+        merge: Optional[Callable[[Any, Any], Any]] = None
+    ):
+        """
+        Run `callback(value)` once `key` has been quiet for `window` seconds
+
+        The callback gets the latest value, or `merge(stored, latest)` folded
+        over the burst when `merge` is given.
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        entry = self._trailing.get(key)
+        if entry is None:
+            entry = self._trailing[key] = _Window(value, callback, now)
+        else:
+            entry.value = merge(entry.value, value) if merge else value
+            entry.callback = callback
+            entry.collapsed += 1
+            entry.handle.cancel()
+        fire_at = min(now + window, entry.first_at + self.max_wait)
+        entry.handle = loop.call_at(fire_at, self._fire, key)
+
+    def _fire(self, key: Hashable):
+        entry = self._trailing.pop(key, None)
+        if entry is None:
+            return
+        if entry.collapsed:
+            logger.debug("Collapsed %s events for %s", entry.collapsed + 1, key)
+        task = asyncio.create_task(self._run(entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, entry: _Window):
+        try:
+            await entry.callback(entry.value)
+        except Exception as e:
+            logger.exception("Debounced callback failed: %s", e)
+
+    async def flush(self):
+        """Fire every open trailing window now and wait for all callbacks"""
+        for key in list(self._trailing):
+            self._trailing[key].handle.cancel()
+            self._fire(key)
+        for handle in self._leading.values():
+            handle.cancel()
+        self._leading.clear()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+debouncer = Debouncer()
+
+
+async def flush_debouncer():
+    await debouncer.flush()
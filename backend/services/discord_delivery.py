@@ -0,0 +1,184 @@
+"""
+Queued Discord webhook delivery
+
+Discord rate limits webhooks per route bucket and reports the state of the
+bucket with every response (X-RateLimit-Bucket, -Remaining, -Reset-After).
+Messages to a webhook go through a queue per webhook URL, drained by one
+sender that follows those headers: it sends while the bucket has requests
+left and otherwise waits until it resets, so bursts are delivered at the
+highest rate Discord allows instead of failing with 429. A 429 that still
+happens pauses the bucket (or every webhook, for a global limit) for its
+retry_after and the message is sent again.
+
+With merging enabled (DISCORD_MERGE_MESSAGES, or "merge": true/false on the
+action), plain text messages waiting in a webhook's queue with the same
+username and avatar are sent as one message, their contents separated by
+newlines up to Discord's 2000 characters. Each merged action gets the result
+of the combined message.
+
+Environment variables:
+    DISCORD_MERGE_MESSAGES: Merge queued plain text messages per webhook (default false)
+    DISCORD_MAX_RETRIES: Times a rate limited message is retried (default 3)
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from modules.discord import action as discord
+from utils.log import get_logger
+
+logger = get_logger("discord_delivery")
+
+DISCORD_MERGE_MESSAGES = os.getenv("DISCORD_MERGE_MESSAGES", "false").lower() == "true"
+DISCORD_MAX_RETRIES = int(os.getenv("DISCORD_MAX_RETRIES", "3"))
+
+
+class _Message:
+    __slots__ = ("payload", "merge", "future")
+
+    def __init__(self, payload: Dict[str, Any], merge: bool, future: asyncio.Future):
+        self.payload = payload
+        self.merge = merge
+        self.future = future
+
+    @property
+    def mergeable(self) -> bool:
+        return self.merge and set(self.payload) <= {"content", "username", "avatar_url"}
+
+
+def _merge(queue: Deque[_Message]) -> List[_Message]:
+    """Take the next message off a queue, with the waiting ones it can be merged with"""
+    first = queue.popleft()
+    taken = [first]
+    if not first.mergeable:
+        return taken
+    length = len(first.payload["content"])
+    while queue and queue[0].mergeable:
+        message = queue[0]
+        same_sender = all(message.payload.get(key) == first.payload.get(key) for key in ("username", "avatar_url"))
+        # Every merged message adds its content and a newline
+        if not same_sender or length + 1 + len(message.payload["content"]) > discord.MAX_CONTENT_LENGTH:
+            break
+        length += 1 + len(message.payload["content"])
+        taken.append(queue.popleft())
+    return taken
+
+
+class DiscordDelivery:
+    def __init__(self, merge: bool = DISCORD_MERGE_MESSAGES, max_retries: int = DISCORD_MAX_RETRIES):
+        self.merge = merge
+        self.max_retries = max_retries
+        self._queues: Dict[str, Deque[_Message]] = {}
+        self._senders: Dict[str, asyncio.Task] = {}
+        # webhook URL -> Discord bucket ID
+        self._bucket_of: Dict[str, str] = {}
+        # bucket ID (or webhook URL before the first response) -> (remaining, reset time)
+        self._buckets: Dict[str, tuple] = {}
+        self._global_reset = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def execute(self, action_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a Discord action (send_message) and wait for its delivery"""
+        payload, error = discord.build_payload(action_data)
+        if error:
+            return error
+        webhook_url = discord.get_webhook_url(action_data)
+        if not webhook_url:
+            return {"status": "error", "message": "Discord webhook URL not configured"}
+
+        merge = action_data.get("merge")
+        future = asyncio.get_running_loop().create_future()
+        message = _Message(payload, self.merge if merge is None else bool(merge), future)
+        self._queues.setdefault(webhook_url, deque()).append(message)
+        sender = self._senders.get(webhook_url)
+        if sender is None:
+            sender = self._senders[webhook_url] = asyncio.create_task(self._drain(webhook_url))
+            self._tasks.add(sender)
+            sender.add_done_callback(self._tasks.discard)
+        return await future
+
+    async def _wait_for_bucket(self, webhook_url: str):
+        bucket = self._bucket_of.get(webhook_url, webhook_url)
+        while True:
+            now = time.monotonic()
+            remaining, reset_at = self._buckets.get(bucket, (1, 0.0))
+            wait = max(self._global_reset - now, reset_at - now if remaining < 1 else 0)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+            if time.monotonic() >= reset_at:
+                self._buckets.pop(bucket, None)
+
+    def _update_bucket(self, webhook_url: str, result: Dict[str, Any]):
+        bucket = result.get("bucket")
+        if bucket:
+            self._bucket_of[webhook_url] = bucket
+        bucket = self._bucket_of.get(webhook_url, webhook_url)
+        now = time.monotonic()
+        if "retry_after" in result:
+            if result.get("global"):
+                self._global_reset = now + result["retry_after"]
+            else:
+                self._buckets[bucket] = (0, now + result["retry_after"])
+        elif result.get("remaining") is not None and result.get("reset_after") is not None:
+            self._buckets[bucket] = (result["remaining"], now + result["reset_after"])
+
+    async def send_file(self, webhook_url: str, upload: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run a file upload to a webhook within its rate limit bucket
+
+        `upload` makes the whole request (a fresh download each time it is
+        called, as a rate limited attempt consumes its body) and returns a
+        discord.upload_file result.
+        """
+        return await self._send(webhook_url, upload)
+
+    async def _send(self, webhook_url: str, post: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_bucket(webhook_url)
+            result = await asyncio.to_thread(post)
+            self._update_bucket(webhook_url, result)
+            if "retry_after" not in result:
+                break
+            logger.warning("Discord webhook rate limited, retrying in %ss", result["retry_after"])
+        return {key: value for key, value in result.items() if key in ("status", "message", "details")}
+
+    async def _drain(self, webhook_url: str):
+        queue = self._queues[webhook_url]
+        try:
+            while queue:
+                messages = _merge(queue)
+                payload = messages[0].payload
+                if len(messages) > 1:
+                    payload = dict(payload, content="\n".join(m.payload["content"] for m in messages))
+                    logger.info("Merged %s Discord messages into one", len(messages))
+                try:
+                    result = await self._send(webhook_url, partial(discord.post_webhook, webhook_url, payload))
+                except Exception as e:
+                    result = {"status": "error", "message": f"Failed to execute Discord action: {str(e)}"}
+                for message in messages:
+                    if not message.future.done():
+                        message.future.set_result(result)
+        finally:
+            self._senders.pop(webhook_url, None)
+            if not queue:
+                self._queues.pop(webhook_url, None)
+            for message in queue:
+                if not message.future.done():
+                    message.future.set_result({"status": "error", "message": "Discord delivery stopped"})
+            queue.clear()
+
+    async def flush(self):
+        """Wait until every queued message is sent (on shutdown)"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+discord_delivery = DiscordDelivery()
+
+
+async def flush_discord_delivery():
+    await discord_delivery.flush()
@@ -0,0 +1,266 @@
+"""
+Ticket enrichment
+
+Webhook payloads carry little more than the ticket's ID and status. When a
+Zendesk or Freshdesk integration has `"enrichment": true` in its config, the
+events of its account are enriched once, right after trigger parsing, with
+the full ticket, its requester, assignee and organization:
+
+    {"ticket": {...}, "requester": {...}, "assignee": {...}, "organization": {...}}
+
+Ticket IDs only mean something within one helpdesk account, so the
+integration must be known: the one named by the payload's integration_id,
+or else the only opted-in integration among the owners of the platform's
+rules. Events matching none, or several, are not enriched.
+
+The view is stored on the event's ticket (ticket["enriched"]) and shared by
+all of its rules and actions, which can reference it with placeholders such
+as {{requester.email}} (see utils/templating.py).
+
+Lookups of concurrent events are combined: requests for the same record
+type that arrive within ENRICHMENT_BATCH_WINDOW seconds go out as one Zendesk
+show_many request (100 IDs each), and a record already being fetched is not
+requested twice. Users, organizations and agents are cached for
+ENRICHMENT_CACHE_TTL seconds; tickets are fetched fresh for every event, as
+they are what just changed. Freshdesk has no show_many, so its ticket is
+fetched with requester and company embedded. A failed lookup only leaves the
+view incomplete, rules still run.
+
+Environment variables:
+    ENRICHMENT_ENABLED: Enrich events of integrations that opted in (default true)
+    ENRICHMENT_CACHE_TTL: Seconds users and organizations are cached (default 300)
+    ENRICHMENT_CACHE_SIZE: Records cached per process (default 10000)
+    ENRICHMENT_BATCH_WINDOW: Seconds lookups wait to be combined (default 0.05)
+"""
+import asyncio
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.integration import Integration
+from utils.encryption import decrypt_config
+from utils.log import get_logger
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("enrichment")
+
+ENRICHMENT_ENABLED = os.getenv("ENRICHMENT_ENABLED", "true").lower() == "true"
+ENRICHMENT_CACHE_TTL = float(os.getenv("ENRICHMENT_CACHE_TTL", "300"))
+ENRICHMENT_CACHE_SIZE = int(os.getenv("ENRICHMENT_CACHE_SIZE", "10000"))
+ENRICHMENT_BATCH_WINDOW = float(os.getenv("ENRICHMENT_BATCH_WINDOW", "0.05"))
+
+# IDs per show_many request (the Zendesk limit)
+SHOW_MANY_LIMIT = 100
+# Seconds the list of integrations with enrichment is cached
+INTEGRATIONS_TTL = 60
+
+# Lookup key: (integration id, resource, record id)
+LookupKey = Tuple[int, str, str]
+
+
+class Enricher:
+    def __init__(
+        self,
+        cache_ttl: float = ENRICHMENT_CACHE_TTL,
+        cache_size: int = ENRICHMENT_CACHE_SIZE,
+        batch_window: float = ENRICHMENT_BATCH_WINDOW
+    ):
+        self.batch_window = batch_window
+        self._cache = TTLCache(cache_ttl, cache_size)
+        self._integrations = TTLCache(INTEGRATIONS_TTL, 100)
+        # Lookups queued or in flight, shared by everyone asking for the same record
+        self._futures: Dict[LookupKey, asyncio.Future] = {}
+        # (integration id, resource) -> (config, queued IDs, timer)
+        self._batches: Dict[Tuple[int, str], Tuple[Dict[str, Any], List[str], asyncio.TimerHandle]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _integration(
+        self, session: AsyncSession, platform: str, integration_id: Optional[int], user_ids: Iterable[int]
+    ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        The (id, decrypted config) of the integration an event came from
+
+        The event's own integration_id if it has one, otherwise the only
+        opted-in integration of the given users; None if there is no such
+        integration or several could match.
+        """
+        candidates = self._integrations.get(platform)
+        if candidates is None:
+            result = await session.execute(
+                select(Integration)
+                .where(Integration.integration_type == platform, Integration.is_active == True)
+                .order_by(Integration.id)
+            )
+            candidates = [
+                (integration.id, integration.user_id, decrypt_config(integration.config))
+                for integration in result.scalars().all()
+            ]
+            candidates = [candidate for candidate in candidates if candidate[2].get("enrichment")]
+            self._integrations.put(platform, candidates)
+        if integration_id is not None:
+            matches = [candidate for candidate in candidates if str(candidate[0]) == str(integration_id)]
+        else:
+            owners = set(user_ids)
+            matches = [candidate for candidate in candidates if candidate[1] in owners]
+        if len(matches) != 1:
+            if len(matches) > 1:
+                logger.info("Event of %s not enriched: %s integrations could own it", platform, len(matches))
+            return None
+        return matches[0][0], matches[0][2]
+
+    async def _lookup(
+        self, integration_id: int, config: Dict[str, Any], platform: str, resource: str, record_id: Any,
+        cache: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        if record_id is None:
+            return None
+        key = (integration_id, resource, str(record_id))
+        if cache:
+            cached = self._cache.get(key, False)
+            if cached is not False:
+                return cached
+        future = self._futures.get(key)
+        if future is None:
+            future = self._futures[key] = asyncio.get_running_loop().create_future()
+            if platform == "zendesk":
+                self._queue(integration_id, config, resource, str(record_id))
+            else:
+                self._spawn(self._fetch_one(key, config, resource, record_id, cache))
+        return await asyncio.shield(future)
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _resolve(self, key: LookupKey, record: Optional[Dict[str, Any]], cache: bool = True):
+        if cache and key[1] != "tickets":
+            self._cache.put(key, record)
+        future = self._futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(record)
+
+    def _queue(self, integration_id: int, config: Dict[str, Any], resource: str, record_id: str):
+        batch_key = (integration_id, resource)
+        batch = self._batches.get(batch_key)
+        if batch is None:
+            handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush, batch_key)
+            batch = self._batches[batch_key] = (config, [], handle)
+        batch[1].append(record_id)
+        if len(batch[1]) >= SHOW_MANY_LIMIT:
+            self._flush(batch_key)
+
+    def _flush(self, batch_key: Tuple[int, str]):
+        batch = self._batches.pop(batch_key, None)
+        if batch is None:
+            return
+        config, record_ids, handle = batch
+        handle.cancel()
+        self._spawn(self._fetch_many(batch_key, config, record_ids))
+
+    async def _fetch_many(self, batch_key: Tuple[int, str], config: Dict[str, Any], record_ids: List[str]):
+        from modules.zendesk.actions import show_many
+
+        integration_id, resource = batch_key
+        records: Dict[str, Dict[str, Any]] = {}
+        fetched = False
+        try:
+            result = await asyncio.to_thread(show_many, config, resource, record_ids)
+            if result.get("success"):
+                records = {str(record.get("id")): record for record in result["data"]}
+                fetched = True
+            else:
+                logger.warning("Zendesk %s lookup failed: %s", resource, result.get("message"))
+        except Exception as e:
+            logger.warning("Zendesk %s lookup failed: %s", resource, e)
+        for record_id in record_ids:
+            # Failures are not cached, the next event tries again
+            self._resolve((integration_id, resource, record_id), records.get(record_id), cache=fetched)
+
+    async def _fetch_one(self, key: LookupKey, config: Dict[str, Any], resource: str, record_id: Any, cache: bool):
+        from modules.freshdesk.actions import get_agent, get_ticket
+
+        record = None
+        try:
+            fetch = get_ticket if resource == "tickets" else get_agent
+            result = await asyncio.to_thread(fetch, config, record_id)
+            if result.get("success"):
+                record = result["data"]
+            else:
+                cache = False
+                logger.warning("Freshdesk %s lookup failed: %s", resource, result.get("message"))
+        except Exception as e:
+            cache = False
+            logger.warning("Freshdesk %s lookup failed: %s", resource, e)
+        self._resolve(key, record, cache)
+
+    async def enrich(
+        self,
+        session: AsyncSession,
+        platform: str,
+        payload: Dict[str, Any],
+        ticket: Dict[str, Any],
+        user_ids: Iterable[int] = ()
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the enriched view of an event's ticket
+
+        `user_ids` are the owners of the rules the event is evaluated for.
+
+        Returns:
+            Dict with ticket, requester, assignee and organization (None for
+            records that could not be fetched), or None when the platform has
+            no integration with enrichment enabled that is known to own the event
+        """
+        if ticket.get("ticket_id") is None:
+            return None
+        integration = await self._integration(session, platform, payload.get("integration_id"), user_ids)
+        if integration is None:
+            return None
+        integration_id, config = integration
+
+        full = await self._lookup(integration_id, config, platform, "tickets", ticket["ticket_id"], cache=False)
+        if full is None:
+            return {"ticket": None, "requester": None, "assignee": None, "organization": None}
+
+        if platform == "zendesk":
+            requester, assignee, organization = await asyncio.gather(
+                self._lookup(integration_id, config, platform, "users", full.get("requester_id")),
+                self._lookup(integration_id, config, platform, "users", full.get("assignee_id")),
+                self._lookup(integration_id, config, platform, "organizations", full.get("organization_id")),
+            )
+        else:
+            full = dict(full)
+            requester = full.pop("requester", None)
+            organization = full.pop("company", None)
+            agent = await self._lookup(integration_id, config, platform, "agents", full.get("responder_id"))
+            # Agent names and emails are on their contact
+            assignee = dict(agent.get("contact") or {}, id=agent.get("id")) if agent else None
+        return {"ticket": full, "requester": requester, "assignee": assignee, "organization": organization}
+
+
+enricher = Enricher()
+
+
+def template_context(ticket: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Placeholder context of an event (see utils/templating.py)
+
+    "ticket" holds the enriched ticket's fields overlaid with the normalized
+    ones (ticket_id, status, priority, tags), so both work without enrichment.
+    The rule engine adds "links" for rules that reference linked objects
+    (see services/entity_links.py).
+    """
+    if not ticket:
+        return {}
+    enriched = ticket.get("enriched") or {}
+    normalized = {key: value for key, value in ticket.items() if key not in ("enriched", "changes")}
+    return {
+        "ticket": dict(enriched.get("ticket") or {}, **normalized),
+        "requester": enriched.get("requester"),
+        "assignee": enriched.get("assignee"),
+        "organization": enriched.get("organization"),
+        "changes": ticket.get("changes"),
+    }
@@ -0,0 +1,153 @@
+"""
+Links between helpdesk tickets and the objects actions create for them
+
+When an action creates something for a ticket (a Linear issue, Notion page,
+Trello card or helpdesk ticket), the new object's ID is stored in the
+entity_link table under the ticket that triggered the rule: the rule's
+owner, the rule's platform and the ticket ID. Ticket IDs are small numbers
+per helpdesk account, so links are only shared between rules of one user.
+Follow-up rules reference those objects with placeholders instead of
+searching the destination's API:
+
+    {"platform": "linear", "action": "update_issue",
+     "issue_id": "{{links.linear.issue.id}}", "state": "Done"}
+
+A link exposes id, key (e.g. "ENG-123"), url and created_at, for the newest
+object of each platform and type of the ticket. Links are loaded with one
+indexed query when a rule's actions reference "links."; objects created by
+earlier actions of the same rule are visible to the later ones.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+
+from db import async_session, engine
+from models.entity_link import EntityLink
+from utils.log import get_logger
+
+logger = get_logger("entity_links")
+
+# Columns identifying a link
+LINK_KEY = ("user_id", "source_platform", "source_id", "target_platform", "target_type", "target_id")
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None or value == "" else str(value)
+
+
+def created_target(action: Dict[str, Any], result: Any) -> Optional[Dict[str, Any]]:
+    """
+    Object created by a successful action, from its result
+
+    Returns:
+        Dict with target_platform, target_type, target_id, target_key and url,
+        or None if the action does not create anything linkable
+    """
+    if not isinstance(result, dict) or result.get("skipped"):
+        return None
+    platform = action.get("platform")
+    details = result.get("details") if isinstance(result.get("details"), dict) else {}
+
+    if platform == "linear" and action.get("action") == "create_issue":
+        target = ("issue", details.get("issue_id"), details.get("identifier"), details.get("url"))
+    elif platform == "notion" and action.get("action") == "create_database_item":
+        target = ("page", details.get("page_id"), None, details.get("url"))
+    elif platform == "trello" and action.get("action", "create_card") == "create_card":
+        # Integration actions wrap the card in "data", the legacy module returns it as is
+        card = result.get("data") if isinstance(result.get("data"), dict) else result
+        target = ("card", card.get("id"), card.get("idShort"), card.get("shortUrl") or card.get("url"))
+    elif platform in ("zendesk", "freshdesk") and action.get("action_type") == "create_ticket":
+        data = result.get("data") if isinstance(result.get("data"), dict) else {}
+        # Zendesk wraps a created ticket in "ticket", Freshdesk does not
+        ticket = data.get("ticket") if isinstance(data.get("ticket"), dict) else data
+        target = ("ticket", ticket.get("id"), None, None)
+    else:
+        return None
+
+    target_type, target_id, target_key, url = target
+    if _text(target_id) is None:
+        return None
+    return {
+        "target_platform": platform,
+        "target_type": target_type,
+        "target_id": str(target_id),
+        "target_key": _text(target_key),
+        "url": _text(url)
+    }
+
+
+def _insert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(EntityLink.__table__)
+
+
+class EntityLinkStore:
+    async def record(
+        self, user_id: int, source_platform: str, source_id: Any, target: Dict[str, Any], rule_id: Optional[int] = None
+    ):
+        """Store the link of a user's ticket to an object created for it (see created_target)"""
+        values = dict(
+            target,
+            user_id=user_id,
+            source_platform=source_platform,
+            source_id=str(source_id),
+            rule_id=rule_id,
+            created_at=datetime.utcnow()
+        )
+        statement = _insert(engine.dialect.name)
+        async with async_session() as session:
+            if statement is not None:
+                await session.execute(
+                    statement.values(**values).on_conflict_do_nothing(index_elements=list(LINK_KEY))
+                )
+            else:
+                existing = await session.execute(
+                    select(EntityLink.id).where(*[getattr(EntityLink, column) == values[column] for column in LINK_KEY])
+                )
+                if existing.first() is None:
+                    session.add(EntityLink(**values))
+            await session.commit()
+        logger.info(
+            "Linked %s ticket %s to %s %s %s", source_platform, source_id,
+            target["target_platform"], target["target_type"], target["target_key"] or target["target_id"],
+            extra={"rule_id": rule_id}
+        )
+
+    async def links_for(
+        self, user_id: int, source_platform: str, source_id: Any
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Objects linked to a user's ticket, for placeholders
+
+        Returns:
+            {platform: {type: {"id", "key", "url", "created_at"}}} with the
+            newest object of each platform and type
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                select(EntityLink)
+                .where(
+                    EntityLink.user_id == user_id,
+                    EntityLink.source_platform == source_platform,
+                    EntityLink.source_id == str(source_id)
+                )
+                .order_by(EntityLink.created_at, EntityLink.id)
+            )
+            links: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for link in result.scalars().all():
+                links.setdefault(link.target_platform, {})[link.target_type] = {
+                    "id": link.target_id,
+                    "key": link.target_key,
+                    "url": link.url,
+                    "created_at": link.created_at.isoformat()
+                }
+        return links
+
+
+entity_link_store = EntityLinkStore()
@@ -0,0 +1,434 @@
+"""
+Inbound event pipeline shared by the webhook routes and the worker process
+
+An event is a trigger payload from a helpdesk platform. receive_event()
+validates it and either matches and executes rules right away (inline mode,
+the default) or stores it as an event_job for a worker process (queue mode,
+see worker.py). Queued events of the same ticket are processed in order.
+process_event() is the part both modes share.
+
+Bursts of events for one ticket can be debounced per rule (`debounce_seconds`
+in the rule's trigger_data) or per platform (EVENT_DEBOUNCE_SECONDS): the rule
+is then evaluated once against the latest event of the burst. ticket_created
+rules keep first-occurrence semantics instead; the first event of a burst runs
+them and the rest of the burst is dropped. Inline, bursts are collapsed in
+memory (services/debounce.py). In queue mode a burst is a delayed "debounce"
+job, updated by the later events of the burst while it is pending, so a
+queued event is only acked once its evaluation is stored and a worker crash
+cannot drop it.
+
+Environment variables:
+    PROCESSING_MODE: "inline" (default) or "queue"
+    EVENT_JOB_MAX_ATTEMPTS: Attempts per queued event before it is marked failed
+    EVENT_DEBOUNCE_SECONDS: Default debounce window, either one number for every
+        platform or per platform, e.g. "freshdesk=5,zendesk=2" (default 0, off)
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Optional
+
+from sqlalchemy.future import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import async_session
+from models.event_job import EventJob
+from models.rule import Rule
+from repositories.event_job_repository import EventJobRepository
+from repositories.rule_repository import RuleRepository
+from services import rule_engine
+from services.debounce import debouncer
+from services.enrichment import ENRICHMENT_ENABLED, enricher
+from services.scheduler import action_scheduler
+from services.ticket_state import TICKET_STATE_ENABLED, merge_changes, ticket_state_store
+from services.window_aggregator import WINDOW_TRIGGER, window_aggregator, window_ordering_key
+from utils.log import get_correlation_id, get_logger, new_correlation_id
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("event_pipeline")
+
+PROCESSING_MODE = os.getenv("PROCESSING_MODE", "inline").lower()
+EVENT_JOB_MAX_ATTEMPTS = int(os.getenv("EVENT_JOB_MAX_ATTEMPTS", "5"))
+
+
+def _parse_debounce_spec(spec: str) -> Dict[str, float]:
+    """Parse EVENT_DEBOUNCE_SECONDS; "*" holds the default for unlisted platforms"""
+    windows = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        platform, _, seconds = item.rpartition("=")
+        windows[platform.strip() or "*"] = float(seconds)
+    return windows
+
+EVENT_DEBOUNCE_SECONDS = _parse_debounce_spec(os.getenv("EVENT_DEBOUNCE_SECONDS", ""))
+
+# Queue mode: (platform, ticket, rule) -> {"job_id", "first_at", "event"} of the
+# burst's pending debounce job. A burst never stays open longer than max_wait
+DEBOUNCE_JOB_CACHE_SIZE = 10000
+_debounce_jobs = TTLCache(debouncer.max_wait, DEBOUNCE_JOB_CACHE_SIZE)
+
+
+def load_trigger_module(platform: str):
+    if platform == "zendesk":
+        from modules.zendesk.trigger import handle_trigger
+        return handle_trigger
+    if platform == "freshdesk":
+        from modules.freshdesk.trigger import handle_trigger
+        return handle_trigger
+    raise ValueError(f"Unknown trigger module: {platform}")
+
+
+def ticket_fields(platform: str, payload: Dict[str, Any], trigger_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize the ticket attributes rules match on
+
+    Returns:
+        Dict with ticket_id, status, priority and tags (None when not in the
+        payload), and source ("webhook" or "poll", see services/poller.py)
+    """
+    if platform == "freshdesk":
+        data = trigger_result.get("data", {})
+        webhook = payload.get("freshdesk_webhook", {})
+        fields = {
+            "ticket_id": data.get("ticket_id"),
+            "status": data.get("ticket_status"),
+            "priority": webhook.get("ticket_priority"),
+            "tags": webhook.get("tags"),
+        }
+    else:
+        ticket = payload.get("ticket", {})
+        fields = {
+            "ticket_id": ticket.get("id"),
+            "status": ticket.get("status"),
+            "priority": ticket.get("priority"),
+            "tags": ticket.get("tags"),
+        }
+    fields["source"] = "poll" if payload.get("source") == "poll" else "webhook"
+    if fields["source"] == "poll":
+        fields["created"] = bool(payload.get("created"))
+    return fields
+
+
+def ordering_key(platform: str, ticket_id: Any) -> Optional[str]:
+    """Events with the same key are processed in arrival order (one ticket's events)"""
+    if ticket_id is None:
+        return None
+    return f"{platform}:{ticket_id}"
+
+
+def debounce_window(platform: str, rule_data: Dict[str, Any]) -> float:
+    """Debounce window of a rule in seconds (0 when events are not debounced)"""
+    seconds = rule_data.get("debounce_seconds")
+    if seconds is None:
+        seconds = EVENT_DEBOUNCE_SECONDS.get(platform, EVENT_DEBOUNCE_SECONDS.get("*", 0))
+    try:
+        return max(float(seconds), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def rule_matches(rule: Rule, ticket: Dict[str, Any], rule_data: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Check whether a rule's trigger matches the event's ticket
+
+    When the ticket carries "changes" (see services/ticket_state.py), status
+    and tag rules only match real transitions: the status must have changed
+    (optionally from the rule's `from_status`) and the tag must be newly added.
+    """
+    if rule_data is None:
+        rule_data = json.loads(rule.trigger_data)
+    trigger_event = rule.trigger_event
+    changes = ticket.get("changes")
+
+    if trigger_event == "ticket_created":
+        if ticket.get("source") == "poll" and not (
+            ticket.get("created") and (changes is None or changes["is_new"])
+        ):
+            # Polling reports every change, not only creations
+            return False
+        logger.info("Trigger match: rule %s, new ticket created", rule.id, extra={"rule_id": rule.id})
+        return True
+
+    if trigger_event == "ticket_status_changed":
+        # Check if status matches the expected status in the rule
+        ticket_status = ticket.get("status")
+        expected_status = rule_data.get("status")
+        if changes is not None:
+            if not changes["status_changed"]:
+                return False
+            from_status = rule_data.get("from_status")
+            if from_status and (changes["status_from"] or "").lower() != from_status.lower():
+                return False
+        if expected_status and ticket_status and expected_status.lower() == ticket_status.lower():
+            logger.info("Trigger match: rule %s, status changed to '%s'", rule.id, ticket_status, extra={"rule_id": rule.id})
+            return True
+
+    elif trigger_event == "ticket_tag_added":
+        # Check if any tags match
+        tags = (changes["tags_added"] if changes is not None else ticket.get("tags")) or []
+        expected_tag = rule_data.get("tag")
+        if expected_tag and tags and expected_tag in tags:
+            logger.info("Trigger match: rule %s, tag '%s'", rule.id, expected_tag, extra={"rule_id": rule.id})
+            return True
+
+    return False
+
+
+async def process_event(
+    platform: str,
+    payload: Dict[str, Any],
+    session: AsyncSession,
+    event_id: Optional[str] = None,
+    trigger_result: Optional[Dict[str, Any]] = None,
+    queued: bool = False
+) -> Dict[str, Any]:
+    """
+    Match an event against the platform's rules and execute the matching ones
+
+    Args:
+        platform: Trigger platform (zendesk, freshdesk)
+        payload: Webhook payload
+        session: Database session
+        event_id: ID recorded with the executions (defaults to the correlation id)
+        trigger_result: Result of the platform's handle_trigger, if already computed
+        queued: Set by workers: forward window_aggregate rules to their per-rule
+            job stream instead of aggregating here, and store debounced bursts
+            as delayed jobs instead of in memory
+
+    Returns:
+        {"status": "processed", ...} or {"status": "error", "message": ...}
+    """
+    if trigger_result is None:
+        trigger_result = load_trigger_module(platform)(payload)
+    if trigger_result.get("status") != "success":
+        return {
+            "status": "error",
+            "message": trigger_result.get("message", "Unknown error processing webhook")
+        }
+
+    event_id = event_id or get_correlation_id()
+    ticket = ticket_fields(platform, payload, trigger_result)
+    if TICKET_STATE_ENABLED:
+        ticket["changes"] = await ticket_state_store.observe(session, platform, ticket, event_id=event_id)
+        if ticket["changes"] and ticket["changes"]["status_changed"] and not ticket["changes"]["is_new"]:
+            # Delayed actions conditional on the old status no longer apply
+            await action_scheduler.cancel_for_ticket(session, platform, ticket["ticket_id"], ticket["changes"]["status_to"])
+    result = await session.execute(select(Rule).where(Rule.trigger_platform == platform))
+    rules = result.scalars().all()
+    if rules and ENRICHMENT_ENABLED:
+        # One enriched view per event, shared by all of its rules and actions
+        enriched = await enricher.enrich(session, platform, payload, ticket, {rule.user_id for rule in rules})
+        if enriched is not None:
+            ticket["enriched"] = enriched
+
+    ticket_id = ticket.get("ticket_id")
+    executed_rules = 0
+    debounced_rules = 0
+    aggregated_rules = 0
+    for rule in rules:
+        try:
+            if rule.trigger_event == WINDOW_TRIGGER:
+                if queued:
+                    await EventJobRepository(session).enqueue(
+                        platform,
+                        {
+                            "rule_id": rule.id,
+                            "ticket": {key: value for key, value in ticket.items() if key != "changes"},
+                            "payload": payload,
+                            "at": time.time(),
+                        },
+                        event_id=event_id,
+                        ordering_key=window_ordering_key(rule.id),
+                        kind="window",
+                        max_attempts=EVENT_JOB_MAX_ATTEMPTS
+                    )
+                else:
+                    executed_rules += await _aggregate(session, rule, ticket, payload, event_id)
+                aggregated_rules += 1
+                continue
+
+            rule_data = json.loads(rule.trigger_data)
+            window = debounce_window(platform, rule_data)
+            if window and ticket_id is not None:
+                key = (platform, ticket_id, rule.id)
+                if rule.trigger_event == "ticket_created":
+                    if not debouncer.leading(key, window):
+                        continue
+                else:
+                    event = {
+                        "rule_id": rule.id,
+                        "platform": platform,
+                        "ticket": ticket,
+                        "event_id": event_id,
+                    }
+                    if queued:
+                        await _debounce_job(session, key, window, event)
+                    else:
+                        debouncer.trailing(key, window, event, _run_debounced, merge=_merge_debounced)
+                    debounced_rules += 1
+                    continue
+
+            if rule_matches(rule, ticket, rule_data):
+                await rule_engine.process_rule(rule, session, event_id=event_id, ticket=ticket)
+                executed_rules += 1
+        except Exception as e:
+            logger.exception("Failed to evaluate rule %s: %s", rule.id, e, extra={"rule_id": rule.id})
+
+    return {
+        "status": "processed",
+        "rules_executed": executed_rules,
+        "rules_debounced": debounced_rules,
+        "rules_aggregated": aggregated_rules,
+        "ticket_id": ticket_id
+    }
+
+
+async def _aggregate(
+    session: AsyncSession,
+    rule: Rule,
+    ticket: Dict[str, Any],
+    payload: Dict[str, Any],
+    event_id: Optional[str],
+    at: Optional[float] = None
+) -> int:
+    """Add an event to a window_aggregate rule and run the rule for every window that fired"""
+    fired = await window_aggregator.observe(session, rule, ticket, payload, at=at)
+    for window in fired:
+        logger.info(
+            "Window trigger fired: rule %s, group '%s', value %s", rule.id, window["group"], window["value"],
+            extra={"rule_id": rule.id}
+        )
+        # Each fired window is its own run of the rule, with its own idempotency keys
+        window_event_id = f"{event_id}:window:{window['group']}" if event_id else None
+        await rule_engine.process_rule(rule, session, event_id=window_event_id, ticket=ticket)
+    return len(fired)
+
+
+def _merge_debounced(earlier: Dict[str, Any], later: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the latest event of a burst, with the net ticket changes of the whole burst"""
+    if "changes" not in later["ticket"]:
+        return later
+    ticket = dict(later["ticket"], changes=merge_changes(earlier["ticket"].get("changes"), later["ticket"]["changes"]))
+    return dict(later, ticket=ticket)
+
+
+async def _evaluate_debounced(session: AsyncSession, event: Dict[str, Any]) -> bool:
+    """Evaluate a rule against the latest event of a debounced burst; True if it ran"""
+    # The rule may have been changed or deleted while the window was open
+    rule = await RuleRepository(session).get_rule(event["rule_id"])
+    if rule is None or not rule_matches(rule, event["ticket"]):
+        return False
+    await rule_engine.process_rule(rule, session, event_id=event["event_id"], ticket=event["ticket"])
+    return True
+
+
+async def _run_debounced(event: Dict[str, Any]):
+    """Debouncer callback (inline mode)"""
+    new_correlation_id(event["event_id"])
+    async with async_session() as session:
+        await _evaluate_debounced(session, event)
+
+
+async def _debounce_job(session: AsyncSession, key: Hashable, window: float, event: Dict[str, Any]):
+    """
+    Debounce an event in queue mode
+
+    The burst's evaluation is a "debounce" job due when the window closes. A
+    later event of the burst replaces the job's event and pushes its due time
+    back (never past max_wait after the first event) while the job is pending;
+    once a worker claimed it, the event opens a new burst.
+    """
+    repository = EventJobRepository(session)
+    now = time.time()
+    pending = _debounce_jobs.get(key)
+    if pending is not None:
+        merged = _merge_debounced(pending["event"], event)
+        delay = min(window, pending["first_at"] + debouncer.max_wait - now)
+        if await repository.reschedule(pending["job_id"], merged, datetime.utcnow() + timedelta(seconds=delay)):
+            pending["event"] = merged
+            return
+
+    platform, ticket_id, rule_id = key
+    job = await repository.enqueue(
+        platform,
+        event,
+        event_id=event["event_id"],
+        ordering_key=f"debounce:{platform}:{ticket_id}:{rule_id}",
+        kind="debounce",
+        max_attempts=EVENT_JOB_MAX_ATTEMPTS,
+        available_at=datetime.utcnow() + timedelta(seconds=window)
+    )
+    _debounce_jobs.put(key, {"job_id": job.id, "first_at": now, "event": event})
+
+
+async def receive_event(
+    platform: str,
+    payload: Dict[str, Any],
+    session: AsyncSession,
+    event_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Entry point for webhook (and polled) payloads
+
+    Invalid payloads are rejected right away in both modes. In queue mode the
+    event is stored for a worker and {"status": "queued", ...} is returned.
+    """
+    trigger_result = load_trigger_module(platform)(payload)
+    if trigger_result.get("status") != "success":
+        return {
+            "status": "error",
+            "message": trigger_result.get("message", "Unknown error processing webhook")
+        }
+
+    event_id = event_id or get_correlation_id()
+    if PROCESSING_MODE == "queue":
+        ticket_id = ticket_fields(platform, payload, trigger_result).get("ticket_id")
+        job = await EventJobRepository(session).enqueue(
+            platform,
+            payload,
+            event_id=event_id,
+            ordering_key=ordering_key(platform, ticket_id),
+            max_attempts=EVENT_JOB_MAX_ATTEMPTS
+        )
+        logger.info("Queued %s event as job %s", platform, job.id, extra={"job_id": job.id})
+        return {
+            "status": "queued",
+            "job_id": job.id,
+            "ticket_id": ticket_id
+        }
+
+    return await process_event(platform, payload, session, event_id=event_id, trigger_result=trigger_result)
+
+
+async def run_event_job(job: EventJob, session: AsyncSession) -> Dict[str, Any]:
+    """Worker handler for kind="event" jobs"""
+    result = await process_event(
+        job.platform, json.loads(job.payload), session, event_id=job.event_id, queued=True
+    )
+    if result.get("status") == "error":
+        # Payloads are validated before queueing, so retrying would not help
+        logger.warning("Job %s rejected by trigger: %s", job.id, result.get("message"), extra={"job_id": job.id})
+    return result
+
+
+async def run_window_job(job: EventJob, session: AsyncSession) -> int:
+    """Worker handler for kind="window" jobs: one event for one window_aggregate rule"""
+    data = json.loads(job.payload)
+    rule = await RuleRepository(session).get_rule(data["rule_id"])
+    if rule is None or rule.trigger_event != WINDOW_TRIGGER:
+        return 0
+    return await _aggregate(session, rule, data["ticket"], data["payload"], job.event_id, at=data["at"])
+
+
+async def run_debounce_job(job: EventJob, session: AsyncSession) -> bool:
+    """Worker handler for kind="debounce" jobs: the evaluation of a debounced burst"""
+    event = json.loads(job.payload)
+    key = (event["platform"], event["ticket"].get("ticket_id"), event["rule_id"])
+    pending = _debounce_jobs.get(key)
+    if pending is not None and pending["job_id"] == job.id:
+        # Claimed, so later events of the ticket open a new burst
+        _debounce_jobs.invalidate(key)
+    return await _evaluate_debounced(session, event)
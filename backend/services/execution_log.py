@@ -0,0 +1,203 @@
+"""
+Write-behind recorder for rule and action execution history
+
+Rows are buffered in memory and written with batched INSERTs when the batch
+is full or the flush interval elapses, so recording history does not add a
+database round-trip per action. When the buffer is full, record() waits
+(backpressure) instead of dropping rows. Remaining rows are flushed on stop().
+
+Each flush also folds the batch into the per-minute and per-hour rollup
+tables (one upsert per table), which is what the /stats API reads.
+"""
+import asyncio
+import os
+import uuid
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import case, insert
+from sqlalchemy.exc import DBAPIError
+
+from db import async_session
+from models.execution import (
+    ExecutionLog, ExecutionRollupHour, ExecutionRollupMinute,
+    LATENCY_BUCKET_BOUNDS_MS, LATENCY_BUCKET_COLUMNS
+)
+from utils.log import get_logger
+
+logger = get_logger("execution_log")
+
+EXECUTION_LOG_ENABLED = os.getenv("EXECUTION_LOG_ENABLED", "true").lower() == "true"
+EXECUTION_LOG_BATCH_SIZE = int(os.getenv("EXECUTION_LOG_BATCH_SIZE", "500"))
+EXECUTION_LOG_FLUSH_INTERVAL = float(os.getenv("EXECUTION_LOG_FLUSH_INTERVAL", "1.0"))
+EXECUTION_LOG_MAX_BUFFER = int(os.getenv("EXECUTION_LOG_MAX_BUFFER", "10000"))
+
+# Longest error message stored per row
+MAX_ERROR_LENGTH = 1000
+
+
+class ExecutionRecorder:
+    def __init__(
+        self,
+        batch_size: int = EXECUTION_LOG_BATCH_SIZE,
+        flush_interval: float = EXECUTION_LOG_FLUSH_INTERVAL,
+        max_buffer: int = EXECUTION_LOG_MAX_BUFFER
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background flusher on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_buffer)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still buffered and stop the flusher"""
+        if not self.running:
+            return
+        await self._queue.put(None)  # Sentinel: flush and exit
+        await self._task
+        self._task = None
+
+    async def record(self, **fields: Any):
+        """
+        Buffer one execution row (see models.execution.ExecutionLog for fields)
+
+        Waits when the buffer is full. Rows recorded while the recorder is not
+        running (e.g. from scripts) are not persisted.
+        """
+        if not self.running:
+            return
+        fields.setdefault("id", uuid.uuid4().hex)
+        fields.setdefault("created_at", datetime.utcnow())
+        if fields.get("error"):
+            fields["error"] = str(fields["error"])[:MAX_ERROR_LENGTH]
+        await self._queue.put(fields)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch.append(item)
+
+            # Collect until the batch is full or the flush interval has passed
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        try:
+            await self._write(rows)
+        except DBAPIError as e:
+            # Most likely no partition exists yet for these rows; create it and retry once
+            from services.execution_maintenance import ensure_partitions
+            logger.warning("Execution log write failed, ensuring partitions and retrying: %s", e)
+            try:
+                await ensure_partitions()
+                await self._write(rows)
+            except Exception as e:
+                logger.error("Failed to write %s execution log rows: %s", len(rows), e)
+        except Exception as e:
+            logger.error("Failed to write %s execution log rows: %s", len(rows), e)
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        """Insert raw rows and update both rollups in one transaction"""
+        async with async_session() as session:
+            dialect = session.bind.dialect.name
+            await session.execute(insert(ExecutionLog), rows)
+            for model, truncate in ((ExecutionRollupMinute, _minute), (ExecutionRollupHour, _hour)):
+                deltas = build_rollups(rows, truncate)
+                await session.execute(_rollup_upsert(dialect, model, deltas))
+            await session.commit()
+
+
+def _minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+def _hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+_ROLLUP_KEY = ("bucket", "user_id", "rule_id", "platform", "kind")
+_ROLLUP_SUMS = ("count", "failures", "latency_sum_ms") + LATENCY_BUCKET_COLUMNS
+
+def build_rollups(rows: List[Dict[str, Any]], truncate: Callable[[datetime], datetime]) -> List[Dict[str, Any]]:
+    """
+    Aggregate execution rows into rollup deltas, one per (bucket, user, rule, platform, kind)
+
+    Deltas are sorted by key so concurrent flushes lock rollup rows in the same order.
+    """
+    aggregates: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        key = (truncate(row["created_at"]), row["user_id"], row["rule_id"], row["platform"], row["kind"])
+        entry = aggregates.get(key)
+        if entry is None:
+            entry = dict(zip(_ROLLUP_KEY, key))
+            entry.update({column: 0 for column in _ROLLUP_SUMS})
+            entry["latency_max_ms"] = 0
+            aggregates[key] = entry
+        latency = row["latency_ms"]
+        entry["count"] += 1
+        entry["failures"] += row["status"] != "success"
+        entry["latency_sum_ms"] += latency
+        entry["latency_max_ms"] = max(entry["latency_max_ms"], latency)
+        entry[LATENCY_BUCKET_COLUMNS[bisect_left(LATENCY_BUCKET_BOUNDS_MS, latency)]] += 1
+    return [aggregates[key] for key in sorted(aggregates)]
+
+def _rollup_upsert(dialect: str, model, deltas: List[Dict[str, Any]]):
+    """INSERT ... ON CONFLICT DO UPDATE adding the deltas to existing rollup rows"""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise ValueError(f"Execution rollups are not supported on {dialect}")
+
+    table = model.__table__
+    statement = dialect_insert(table).values(deltas)
+    excluded = statement.excluded
+    updates = {column: table.c[column] + excluded[column] for column in _ROLLUP_SUMS}
+    updates["latency_max_ms"] = case(
+        (excluded.latency_max_ms > table.c.latency_max_ms, excluded.latency_max_ms),
+        else_=table.c.latency_max_ms
+    )
+    return statement.on_conflict_do_update(index_elements=list(_ROLLUP_KEY), set_=updates)
+
+
+execution_recorder = ExecutionRecorder()
+
+
+def start_execution_log():
+    if EXECUTION_LOG_ENABLED:
+        execution_recorder.start()
+
+
+async def stop_execution_log():
+    await execution_recorder.stop()
@@ -0,0 +1,141 @@
+"""
+Partition and retention management for the execution history
+
+On PostgreSQL, execution_log is partitioned by day. Partitions are created
+ahead of time and whole partitions past the retention window are dropped,
+which is far cheaper than DELETEing old rows. Rollup tables (and the raw log
+on other databases) are expired with a DELETE on their leading time column,
+as are idempotency receipts.
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, text
+
+from db import engine
+from models.action_receipt import ActionReceipt
+from models.execution import ExecutionLog, ExecutionRollupHour, ExecutionRollupMinute
+from services.idempotency import IDEMPOTENCY_RETENTION_DAYS
+from utils.log import get_logger
+
+logger = get_logger("execution_maintenance")
+
+EXECUTION_LOG_RETENTION_DAYS = int(os.getenv("EXECUTION_LOG_RETENTION_DAYS", "30"))
+EXECUTION_ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv("EXECUTION_ROLLUP_MINUTE_RETENTION_DAYS", "7"))
+EXECUTION_ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("EXECUTION_ROLLUP_HOUR_RETENTION_DAYS", "180"))
+EXECUTION_PARTITION_PRECREATE_DAYS = int(os.getenv("EXECUTION_PARTITION_PRECREATE_DAYS", "7"))
+EXECUTION_MAINTENANCE_INTERVAL = int(os.getenv("EXECUTION_MAINTENANCE_INTERVAL", "3600"))
+
+PARTITION_PREFIX = "execution_log_p"
+# Serializes maintenance across processes sharing the database
+_ADVISORY_LOCK_KEY = 0x53504F4C  # "SPOL"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+async def _is_partitioned(conn) -> bool:
+    result = await conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('execution_log')"
+    ))
+    return result.first() is not None
+
+
+async def _create_partitions(conn, today: date):
+    for offset in range(-1, EXECUTION_PARTITION_PRECREATE_DAYS + 1):
+        day = today + timedelta(days=offset)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF execution_log "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+        ))
+
+
+async def _drop_expired_partitions(conn, today: date):
+    cutoff = today - timedelta(days=EXECUTION_LOG_RETENTION_DAYS)
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('execution_log')"
+    ))
+    for (name,) in result:
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        try:
+            day = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+        except ValueError:
+            continue
+        if day < cutoff:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            logger.info("Dropped expired execution log partition %s", name)
+
+
+async def ensure_partitions(now: Optional[datetime] = None):
+    """Create the execution_log partitions for yesterday through the pre-create window"""
+    if engine.dialect.name != "postgresql":
+        return
+    today = (now or datetime.utcnow()).date()
+    async with engine.begin() as conn:
+        if await _is_partitioned(conn):
+            await _create_partitions(conn, today)
+
+
+async def run_maintenance(now: Optional[datetime] = None):
+    """Create upcoming partitions and expire old history and rollups"""
+    now = now or datetime.utcnow()
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            locked = await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            if not locked:
+                return  # Another process is already doing it
+            partitioned = await _is_partitioned(conn)
+        else:
+            partitioned = False
+
+        if partitioned:
+            await _create_partitions(conn, now.date())
+            await _drop_expired_partitions(conn, now.date())
+        else:
+            await conn.execute(delete(ExecutionLog).where(
+                ExecutionLog.created_at < now - timedelta(days=EXECUTION_LOG_RETENTION_DAYS)
+            ))
+
+        await conn.execute(delete(ExecutionRollupMinute).where(
+            ExecutionRollupMinute.bucket < now - timedelta(days=EXECUTION_ROLLUP_MINUTE_RETENTION_DAYS)
+        ))
+        await conn.execute(delete(ExecutionRollupHour).where(
+            ExecutionRollupHour.bucket < now - timedelta(days=EXECUTION_ROLLUP_HOUR_RETENTION_DAYS)
+        ))
+        await conn.execute(delete(ActionReceipt).where(
+            ActionReceipt.created_at < now - timedelta(days=IDEMPOTENCY_RETENTION_DAYS)
+        ))
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _maintenance_loop():
+    while True:
+        try:
+            await run_maintenance()
+        except Exception as e:
+            logger.error("Execution history maintenance failed: %s", e)
+        await asyncio.sleep(EXECUTION_MAINTENANCE_INTERVAL)
+
+
+def start_execution_maintenance():
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_maintenance_loop())
+
+
+async def stop_execution_maintenance():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,112 @@
+"""
+Dashboard queries over the execution rollup tables
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.execution import (
+    ExecutionRollupHour, ExecutionRollupMinute, LATENCY_BUCKET_BOUNDS_MS, LATENCY_BUCKET_COLUMNS
+)
+
+ROLLUP_MODELS = {"minute": ExecutionRollupMinute, "hour": ExecutionRollupHour}
+GROUP_COLUMNS = {"platform": "platform", "rule": "rule_id", "none": None}
+
+
+def percentile_from_histogram(counts: Sequence[int], quantile: float, max_ms: int) -> Optional[float]:
+    """
+    Estimate a latency percentile from rollup histogram counts
+
+    Interpolates linearly inside the bucket holding the requested rank; the
+    open-ended last bucket is capped by the observed maximum.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            lower = LATENCY_BUCKET_BOUNDS_MS[index - 1] if index > 0 else 0
+            upper = LATENCY_BUCKET_BOUNDS_MS[index] if index < len(LATENCY_BUCKET_BOUNDS_MS) else max(max_ms, lower)
+            estimate = lower + (upper - lower) * (rank - cumulative) / count
+            return round(float(min(estimate, max_ms)), 1)
+        cumulative += count
+    return float(max_ms)
+
+
+def _summarize(row: Dict[str, Any]) -> Dict[str, Any]:
+    counts = [row.pop(column) or 0 for column in LATENCY_BUCKET_COLUMNS]
+    count = row["count"] or 0
+    failures = row["failures"] or 0
+    max_ms = row.pop("latency_max_ms") or 0
+    latency_sum = row.pop("latency_sum_ms") or 0
+    row.update(
+        count=count,
+        failures=failures,
+        failure_rate=round(failures / count, 4) if count else 0.0,
+        avg_latency_ms=round(latency_sum / count, 1) if count else None,
+        p50_latency_ms=percentile_from_histogram(counts, 0.50, max_ms),
+        p95_latency_ms=percentile_from_histogram(counts, 0.95, max_ms),
+        max_latency_ms=max_ms,
+    )
+    return row
+
+
+async def query_stats(
+    session: AsyncSession,
+    since: datetime,
+    until: datetime,
+    resolution: str = "hour",
+    group_by: str = "platform",
+    kind: str = "action",
+    user_id: Optional[int] = None,
+    series: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate rollups between `since` and `until`
+
+    Args:
+        session: Database session
+        since: Start of the range (inclusive)
+        until: End of the range (exclusive)
+        resolution: "minute" or "hour" rollup table
+        group_by: "platform", "rule" or "none"
+        kind: "action" (per action results) or "rule" (whole rule executions)
+        user_id: Only executions of this user
+        series: One row per time bucket (True) or totals over the whole range (False)
+
+    Returns:
+        List of dicts with count, failures, failure_rate and latency statistics
+    """
+    model = ROLLUP_MODELS[resolution]
+    table = model.__table__
+    group_column = GROUP_COLUMNS[group_by]
+
+    keys = []
+    if series:
+        keys.append(table.c.bucket)
+    if group_column:
+        keys.append(table.c[group_column])
+
+    columns = keys + [
+        func.sum(table.c.count).label("count"),
+        func.sum(table.c.failures).label("failures"),
+        func.sum(table.c.latency_sum_ms).label("latency_sum_ms"),
+        func.max(table.c.latency_max_ms).label("latency_max_ms"),
+    ] + [func.sum(table.c[column]).label(column) for column in LATENCY_BUCKET_COLUMNS]
+
+    query = select(*columns).where(
+        table.c.bucket >= since,
+        table.c.bucket < until,
+        table.c.kind == kind,
+    )
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+
+    result = await session.execute(query)
+    return [_summarize(dict(row._mapping)) for row in result]
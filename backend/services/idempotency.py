@@ -0,0 +1,132 @@
+"""
+Idempotency keys of action executions
+
+Every action run for an event gets a deterministic key derived from
+(event id, rule id, action index). When the action succeeds, a receipt with
+the key is stored (models/action_receipt.py); a retried job, a replayed
+event or a re-run of a partially failed rule finds the receipt and skips the
+action instead of repeating its side effect. A rule run costs at most two
+queries whatever its number of actions: the receipts of all its actions are
+fetched with one query when it starts (checks are then set lookups), and
+the receipts of the actions that succeeded are written with one insert when
+it ends. A single action run outside a rule (a delayed action) checks and
+writes its own receipt.
+
+The key is also forwarded to providers that deduplicate themselves, covering
+the gap between a side effect and its receipt:
+
+- Zendesk ticket creation: Idempotency-Key header (keyed creations are
+  never coalesced into create_many, which has no such header)
+- Linear issue creation: the issue's ID is derived from the key, so a second
+  creation finds the first issue instead of duplicating it
+
+Environment variables:
+    IDEMPOTENCY_ENABLED: Skip actions that already succeeded for an event (default true)
+    IDEMPOTENCY_RETENTION_DAYS: Days receipts are kept (default 7)
+"""
+import contextvars
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import select
+
+from db import async_session, engine
+from models.action_receipt import ActionReceipt
+from utils.log import get_logger
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("idempotency")
+
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+IDEMPOTENCY_RETENTION_DAYS = int(os.getenv("IDEMPOTENCY_RETENTION_DAYS", "7"))
+
+# Receipts cached per process
+CACHE_SIZE = 100000
+CACHE_TTL = 3600
+
+# Key of the action executing in the current context, for providers that accept one
+current_key: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("idempotency_key", default=None)
+
+
+def idempotency_key(event_id: str, rule_id: int, action_index: int) -> str:
+    """Deterministic key of one action of a rule run for an event"""
+    return hashlib.sha256(f"{event_id}:{rule_id}:{action_index}".encode()).hexdigest()[:32]
+
+
+def key_uuid(key: str) -> str:
+    """UUID (v4 format) derived from a key, for providers that take client-generated IDs"""
+    return str(uuid.UUID(hex=key, version=4))
+
+
+def _insert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(ActionReceipt.__table__)
+
+
+class RunReceipts:
+    """Receipts of one rule run: keys completed before it and keys completed by it"""
+
+    def __init__(self, completed: Set[str]):
+        self.completed = completed
+        self.new: List[str] = []
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.completed
+
+    def add(self, key: str):
+        self.completed.add(key)
+        self.new.append(key)
+
+
+class IdempotencyStore:
+    def __init__(self):
+        # Keys with a receipt (only positive results; a missing receipt may appear any time)
+        self._completed = TTLCache(CACHE_TTL, CACHE_SIZE)
+
+    async def prefetch(self, keys: Iterable[str]) -> RunReceipts:
+        """Receipts of several keys, loaded with one query (none if all are cached)"""
+        keys = list(keys)
+        completed = {key for key in keys if key in self._completed}
+        missing = [key for key in keys if key not in completed]
+        if missing:
+            async with async_session() as session:
+                result = await session.execute(select(ActionReceipt.key).where(ActionReceipt.key.in_(missing)))
+                for key in result.scalars().all():
+                    self._completed.put(key, True)
+                    completed.add(key)
+        return RunReceipts(completed)
+
+    async def is_completed(self, key: str) -> bool:
+        return key in await self.prefetch([key])
+
+    async def mark_completed(self, keys: Iterable[str]):
+        """Store the receipts of successful actions with one insert"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return
+        for key in keys:
+            self._completed.put(key, True)
+        now = datetime.utcnow()
+        statement = _insert(engine.dialect.name)
+        async with async_session() as session:
+            if statement is not None:
+                await session.execute(
+                    statement.values([{"key": key, "created_at": now} for key in keys])
+                    .on_conflict_do_nothing(index_elements=["key"])
+                )
+            else:
+                existing = await session.execute(select(ActionReceipt.key).where(ActionReceipt.key.in_(keys)))
+                stored = set(existing.scalars().all())
+                session.add_all([ActionReceipt(key=key, created_at=now) for key in keys if key not in stored])
+            await session.commit()
+
+
+idempotency_store = IdempotencyStore()
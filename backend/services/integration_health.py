@@ -0,0 +1,144 @@
+"""
+Cached connectivity checks of integrations
+
+GET /integrations/test-all checks all integrations of a tenant at once: up
+to INTEGRATION_TEST_CONCURRENCY test_connection calls run concurrently, each
+cut off after INTEGRATION_TEST_TIMEOUT seconds.
+
+Results are cached per integration (and config, so an edited integration is
+checked again). A result younger than INTEGRATION_HEALTH_TTL seconds is
+returned as it is; an older one is still returned immediately, marked
+"stale", while a new check runs in the background. Integrations without a
+result are checked before the response. Dashboards polling the health view
+therefore load instantly and providers see at most one check per
+integration and TTL.
+
+Environment variables:
+    INTEGRATION_HEALTH_TTL: Seconds a check result is fresh (default 60)
+    INTEGRATION_TEST_TIMEOUT: Seconds one connectivity check may take (default 10)
+    INTEGRATION_TEST_CONCURRENCY: Checks running at the same time (default 10)
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from models.integration import Integration
+from utils.encryption import decrypt_config
+from utils.log import get_logger
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("integration_health")
+
+INTEGRATION_HEALTH_TTL = float(os.getenv("INTEGRATION_HEALTH_TTL", "60"))
+INTEGRATION_TEST_TIMEOUT = float(os.getenv("INTEGRATION_TEST_TIMEOUT", "10"))
+INTEGRATION_TEST_CONCURRENCY = int(os.getenv("INTEGRATION_TEST_CONCURRENCY", "10"))
+
+# Stale results are kept this many TTLs before they are dropped
+STALE_TTLS = 10
+
+
+def connection_tester(integration_type: str) -> Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    """The test_connection function of an integration type (None if it has none)"""
+    if integration_type == "zendesk":
+        from modules.zendesk.actions import test_connection
+    elif integration_type == "freshdesk":
+        from modules.freshdesk.actions import test_connection
+    elif integration_type == "slack":
+        from modules.slack.actions import test_connection
+    elif integration_type == "trello":
+        from modules.trello.actions import test_connection
+    else:
+        return None
+    return test_connection
+
+
+async def run_connection_test(integration_type: str, config: Dict[str, Any], timeout: float = INTEGRATION_TEST_TIMEOUT) -> Dict[str, Any]:
+    """
+    Test a configuration off the event loop
+
+    Returns:
+        Dict with success and message
+    """
+    test_connection = connection_tester(integration_type)
+    if test_connection is None:
+        return {"success": False, "message": f"Unsupported integration type: {integration_type}"}
+    try:
+        result = await asyncio.wait_for(asyncio.to_thread(test_connection, config), timeout)
+    except asyncio.TimeoutError:
+        return {"success": False, "message": f"Connection test timed out after {timeout:g}s"}
+    except Exception as e:
+        return {"success": False, "message": f"Error testing connection: {str(e)}"}
+    if result.get("success"):
+        return {"success": True, "message": "Connection successful"}
+    return {"success": False, "message": result.get("message", "Connection failed")}
+
+
+class IntegrationHealth:
+    def __init__(
+        self,
+        ttl: float = INTEGRATION_HEALTH_TTL,
+        timeout: float = INTEGRATION_TEST_TIMEOUT,
+        concurrency: int = INTEGRATION_TEST_CONCURRENCY
+    ):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # (integration id, config) -> (result, check time)
+        self._results = TTLCache(ttl * STALE_TTLS, 10000)
+        # Checks in flight, shared by concurrent requests
+        self._checks: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _check(self, key: Tuple[int, str], integration: Integration) -> Dict[str, Any]:
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                config = decrypt_config(integration.config)
+            except Exception as e:
+                result = {"success": False, "message": f"Invalid integration config: {str(e)}"}
+            else:
+                result = await run_connection_test(integration.integration_type, config, self.timeout)
+            result["latency_ms"] = round((time.monotonic() - started) * 1000)
+        result["checked_at"] = datetime.utcnow().isoformat()
+        self._results.put(key, (result, time.monotonic()))
+        if not result["success"]:
+            logger.warning("Integration %s failed its connection test: %s", integration.id, result["message"])
+        return result
+
+    def _start(self, key: Tuple[int, str], integration: Integration) -> asyncio.Task:
+        task = self._checks.get(key)
+        if task is None:
+            task = self._checks[key] = asyncio.create_task(self._check(key, integration))
+            task.add_done_callback(lambda _: self._checks.pop(key, None))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def status(self, integration: Integration) -> Dict[str, Any]:
+        """Connectivity of one integration, from the cache when possible"""
+        key = (integration.id, integration.config)
+        cached = self._results.get(key)
+        if cached is None:
+            result = dict(await asyncio.shield(self._start(key, integration)), stale=False)
+        else:
+            result, checked_at = cached
+            stale = time.monotonic() - checked_at > self.ttl
+            if stale:
+                # Answer with the last result, refresh for the next request
+                self._start(key, integration)
+            result = dict(result, stale=stale)
+        return dict(
+            result,
+            integration_id=integration.id,
+            name=integration.name,
+            integration_type=integration.integration_type
+        )
+
+    async def check_all(self, integrations: List[Integration]) -> List[Dict[str, Any]]:
+        """Connectivity of several integrations, checked concurrently"""
+        return list(await asyncio.gather(*[self.status(integration) for integration in integrations]))
+
+
+integration_health = IntegrationHealth()
@@ -0,0 +1,182 @@
+"""
+Batched Linear issue creation
+
+Linear needs team and label IDs, while rules name them ("ENG", ["bug"]).
+The teams and issue labels of a workspace are loaded once and cached for
+LINEAR_METADATA_TTL seconds per token; a name that is not in the cache
+triggers a reload (at most once a minute) so new labels are picked up.
+
+issueCreate mutations for the same token that arrive within
+LINEAR_BATCH_WINDOW seconds are sent as one GraphQL request of aliased
+mutations (up to LINEAR_BATCH_SIZE), and each action gets the result of its
+own alias. One request instead of many saves round-trips and rate-limit
+budget during ticket surges.
+
+Environment variables:
+    LINEAR_METADATA_TTL: Seconds team and label metadata is cached (default 600)
+    LINEAR_BATCH_WINDOW: Seconds creations wait to be combined (default 0.1)
+    LINEAR_BATCH_SIZE: Most issues created per request (default 20)
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from modules.linear import action as linear
+from services.idempotency import current_key, key_uuid
+from utils.log import get_logger
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("linear_batcher")
+
+LINEAR_METADATA_TTL = float(os.getenv("LINEAR_METADATA_TTL", "600"))
+LINEAR_BATCH_WINDOW = float(os.getenv("LINEAR_BATCH_WINDOW", "0.1"))
+LINEAR_BATCH_SIZE = int(os.getenv("LINEAR_BATCH_SIZE", "20"))
+
+# Shortest time between two reloads for names missing from the metadata
+MIN_RELOAD_INTERVAL = 60
+
+
+class LinearBatcher:
+    def __init__(self, window: float = LINEAR_BATCH_WINDOW, batch_size: int = LINEAR_BATCH_SIZE):
+        self.window = window
+        self.batch_size = batch_size
+        # token -> (metadata, load time)
+        self._metadata = TTLCache(LINEAR_METADATA_TTL, 100)
+        self._loading: Dict[str, asyncio.Task] = {}
+        # token -> (queued (input, future) pairs, timer)
+        self._batches: Dict[str, Tuple[List[Tuple[Dict[str, Any], asyncio.Future]], asyncio.TimerHandle]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _load(self, token: str) -> Dict[str, Any]:
+        # Concurrent callers share one load
+        task = self._loading.get(token)
+        if task is None:
+            task = self._loading[token] = asyncio.create_task(asyncio.to_thread(linear.fetch_metadata, token))
+            task.add_done_callback(lambda _: self._loading.pop(token, None))
+        metadata = await asyncio.shield(task)
+        if "error" not in metadata:
+            self._metadata.put(token, (metadata, time.monotonic()))
+        return metadata
+
+    async def metadata(self, token: str, team: str, labels: List[str]) -> Dict[str, Any]:
+        """Cached metadata, reloaded if it lacks the team or one of the labels"""
+        cached = self._metadata.get(token)
+        if cached is None:
+            return await self._load(token)
+        metadata, loaded_at = cached
+        team_id = linear.resolve_team(metadata, team)
+        missing = team_id is None or linear.resolve_labels(metadata, team_id, labels)[1]
+        if missing and time.monotonic() - loaded_at > MIN_RELOAD_INTERVAL:
+            reloaded = await self._load(token)
+            if "error" not in reloaded:
+                return reloaded
+        return metadata
+
+    async def execute(self, action_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a Linear action (create_issue, batched with concurrent ones, or update_issue)"""
+        try:
+            if action_data.get("action") == "update_issue":
+                token = linear.get_token(action_data)
+                if not token:
+                    return {"status": "error", "message": "Linear API token not configured"}
+                return await asyncio.to_thread(linear.update_issue, token, action_data)
+            error = linear.validate(action_data)
+            if error:
+                return error
+            token = linear.get_token(action_data)
+            labels = action_data.get("labels") or []
+            metadata = await self.metadata(token, action_data["team_id"], labels)
+            if "error" in metadata:
+                return {"status": "error", "message": f"Failed to load Linear teams and labels: {metadata['error']}"}
+
+            team_id = linear.resolve_team(metadata, action_data["team_id"])
+            if not team_id:
+                return {"status": "error", "message": f"Unknown Linear team: {action_data['team_id']}"}
+            label_ids, unknown = linear.resolve_labels(metadata, team_id, labels)
+            if unknown:
+                logger.warning("Unknown Linear labels ignored: %s", ", ".join(unknown))
+
+            issue_input = linear.build_issue_input(action_data, team_id, label_ids)
+            key = current_key.get()
+            if key:
+                # A repeated creation with the same ID fails instead of duplicating the issue
+                issue_input["id"] = key_uuid(key)
+            result = await self._submit(token, issue_input)
+            if key and result.get("status") != "success":
+                result = await self._created_before(token, issue_input["id"]) or result
+            if unknown:
+                result = dict(result, unknown_labels=unknown)
+            return result
+        except Exception as e:
+            return {"status": "error", "message": f"Failed to execute Linear action: {str(e)}"}
+
+    async def _created_before(self, token: str, issue_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Result of an earlier creation of the issue with this ID
+
+        A retry after Linear created the issue, but before the action's receipt
+        was stored, is rejected as a duplicate ID; the existing issue is its result.
+        """
+        try:
+            issue = await asyncio.to_thread(linear.get_issue, token, issue_id)
+        except Exception:
+            return None
+        if not issue:
+            return None
+        logger.info("Linear issue %s already created for this action", issue.get("identifier"))
+        return {
+            "status": "success",
+            "message": "Created Linear issue",
+            "details": {
+                "issue_id": issue.get("id"),
+                "identifier": issue.get("identifier"),
+                "url": issue.get("url")
+            }
+        }
+
+    async def _submit(self, token: str, issue_input: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._batches.get(token)
+        if batch is None:
+            batch = self._batches[token] = ([], loop.call_later(self.window, self._flush, token))
+        batch[0].append((issue_input, future))
+        if len(batch[0]) >= self.batch_size:
+            self._flush(token)
+        return await future
+
+    def _flush(self, token: str):
+        batch = self._batches.pop(token, None)
+        if batch is None:
+            return
+        items, handle = batch
+        handle.cancel()
+        task = asyncio.create_task(self._send(token, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, token: str, items: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            results = await asyncio.to_thread(linear.create_issues, token, [issue_input for issue_input, _ in items])
+            if len(items) > 1:
+                logger.info("Created %s Linear issues in one request", len(items))
+        except Exception as e:
+            results = [{"status": "error", "message": f"Failed to execute Linear action: {str(e)}"}] * len(items)
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def flush(self):
+        """Send every waiting batch now and wait for the requests (on shutdown)"""
+        for token in list(self._batches):
+            self._flush(token)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+linear_batcher = LinearBatcher()
+
+
+async def flush_linear_batcher():
+    await linear_batcher.flush()
@@ -0,0 +1,142 @@
+"""
+Cached Notion database schemas and local property validation
+
+A database's property schema (names, types, select and status options) is
+fetched once and cached for NOTION_SCHEMA_TTL seconds. Rule properties are
+checked and converted against it before the page is created, so a rule may
+give plain values ("Tags": "billing, urgent", "Due": "2024-05-01") and a value
+that cannot fit its property fails without a request to Notion.
+
+A property name missing from the cached schema triggers a fetch (at most
+once a minute per database) in case it was just added. If Notion still
+rejects a page with a validation error, the database may have changed since
+the schema was cached: the schema is invalidated and fetched again, and the
+page is retried once when the schema did change.
+
+Rules are checked against the schema when they are saved (see
+services/rule_validation.py). Values with {{...}} placeholders are only
+known per event and are checked when the action runs.
+
+Environment variables:
+    NOTION_SCHEMA_TTL: Seconds database schemas are cached (default 600)
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from modules.notion import action as notion
+from utils.log import get_logger
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("notion_schema")
+
+NOTION_SCHEMA_TTL = float(os.getenv("NOTION_SCHEMA_TTL", "600"))
+
+# Shortest time between two fetches for property names missing from a schema
+MIN_REFETCH_INTERVAL = 60
+
+
+class NotionSchemaCache:
+    def __init__(self, ttl: float = NOTION_SCHEMA_TTL):
+        # database id -> (properties, load time)
+        self._schemas = TTLCache(ttl, 1000)
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    async def schema(self, token: str, database_id: str, names: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Cached schema of a database, fetched again if it lacks one of the property names
+
+        Returns:
+            Dict with 'success' and 'properties', or 'message'
+        """
+        cached = self._schemas.get(database_id)
+        if cached is not None:
+            properties, loaded_at = cached
+            missing = any(name not in properties for name in names)
+            if not missing or time.monotonic() - loaded_at <= MIN_REFETCH_INTERVAL:
+                return {"success": True, "properties": properties}
+            fetched = await self._fetch(token, database_id)
+            return fetched if fetched["success"] else {"success": True, "properties": properties}
+        return await self._fetch(token, database_id)
+
+    async def _fetch(self, token: str, database_id: str) -> Dict[str, Any]:
+        # Concurrent callers share one fetch
+        task = self._loading.get(database_id)
+        if task is None:
+            task = self._loading[database_id] = asyncio.create_task(
+                asyncio.to_thread(notion.fetch_database_schema, token, database_id)
+            )
+            task.add_done_callback(lambda _: self._loading.pop(database_id, None))
+        result = await asyncio.shield(task)
+        if result["success"]:
+            self._schemas.put(database_id, (result["properties"], time.monotonic()))
+        return result
+
+    def invalidate(self, database_id: Optional[str] = None):
+        """Drop a database's cached schema (or all of them)"""
+        if database_id is None:
+            self._schemas.clear()
+        else:
+            self._schemas.invalidate(database_id)
+
+    async def execute(self, action_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a Notion action (create_database_item) with locally validated properties"""
+        try:
+            error = notion.validate(action_data)
+            if error:
+                return error
+            token = notion.get_token()
+            if not token:
+                return {"status": "error", "message": "Notion API token not configured"}
+            database_id = action_data["database_id"]
+
+            schema = await self.schema(token, database_id, action_data["properties"])
+            if not schema["success"]:
+                return {"status": "error", "message": schema["message"]}
+            properties, errors = notion.coerce_properties(schema["properties"], action_data["properties"])
+            if errors:
+                return {"status": "error", "message": f"Invalid Notion properties: {'; '.join(errors)}"}
+
+            result = await asyncio.to_thread(notion.create_page, token, database_id, properties)
+            if result.pop("validation_error", False):
+                # The database may have changed since its schema was cached
+                self.invalidate(database_id)
+                fresh = await self.schema(token, database_id)
+                if fresh["success"] and fresh["properties"] != schema["properties"]:
+                    logger.info("Notion database %s schema changed, retrying", database_id)
+                    properties, errors = notion.coerce_properties(fresh["properties"], action_data["properties"])
+                    if errors:
+                        return {"status": "error", "message": f"Invalid Notion properties: {'; '.join(errors)}"}
+                    result = await asyncio.to_thread(notion.create_page, token, database_id, properties)
+                    result.pop("validation_error", None)
+            return result
+        except Exception as e:
+            return {"status": "error", "message": f"Failed to execute Notion action: {str(e)}"}
+
+    async def validate_action(self, action_data: Dict[str, Any]):
+        """
+        Check a rule's Notion action when the rule is saved
+
+        The properties are only checked against the database when a token is
+        configured and the schema can be fetched.
+
+        Raises:
+            ValueError: With a message suitable for the API response
+        """
+        error = notion.validate(action_data)
+        if error:
+            raise ValueError(error["message"])
+        token = notion.get_token()
+        if not token:
+            return
+        schema = await self.schema(token, action_data["database_id"], action_data["properties"])
+        if not schema["success"]:
+            logger.warning("Skipping Notion property check: %s", schema["message"])
+            return
+        _, errors = notion.coerce_properties(schema["properties"], action_data["properties"], allow_placeholders=True)
+        if errors:
+            raise ValueError(f"Invalid Notion properties: {'; '.join(errors)}")
+
+
+notion_schema = NotionSchemaCache()
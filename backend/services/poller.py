@@ -0,0 +1,317 @@
+"""
+Polling trigger source for accounts that cannot send webhooks
+
+Zendesk and Freshdesk integrations with `"polling": true` in their config are
+polled for ticket changes through the platforms' incremental export
+endpoints (see modules/<platform>/poller.py). Each poll fetches only what
+changed since the cursor stored in the poll_checkpoint table, and every
+changed ticket goes through event_pipeline.receive_event exactly like a
+webhook. Polling starts at the time the integration was first seen, it does
+not replay history.
+
+Integrations are polled concurrently (up to POLL_CONCURRENCY at a time), each
+on its own adaptive interval: it halves after a poll that found changes and
+grows by half after an empty one, between POLL_MIN_INTERVAL and
+POLL_MAX_INTERVAL. A poll that stops at POLL_MAX_PAGES before the end of the
+stream continues right away. Errors and rate limits back off. Checkpoints are
+claimed with a lease, so any number of processes can run the poller and each
+integration is polled by one at a time.
+
+Polled events carry "source": "poll". ticket_created rules only match them
+when the ticket was created after polling started and has not been seen
+before.
+
+Environment variables:
+    POLLER_ENABLED: Run the poller in this process (default true)
+    POLL_MIN_INTERVAL: Shortest interval between polls of an integration (default 30)
+    POLL_MAX_INTERVAL: Longest interval between polls of an integration (default 600)
+    POLL_CONCURRENCY: Integrations polled at the same time (default 10)
+    POLL_MAX_PAGES: Export pages fetched per poll (default 10)
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from db import async_session
+from models.integration import Integration
+from models.poll_checkpoint import PollCheckpoint
+from repositories.integration_repository import IntegrationRepository
+from services import event_pipeline
+from utils.log import get_logger, new_correlation_id
+
+logger = get_logger("poller")
+
+POLLER_ENABLED = os.getenv("POLLER_ENABLED", "true").lower() == "true"
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "30"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "600"))
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "10"))
+POLL_MAX_PAGES = int(os.getenv("POLL_MAX_PAGES", "10"))
+
+POLLED_PLATFORMS = ("zendesk", "freshdesk")
+# Seconds between lookups of due checkpoints
+TICK_INTERVAL = 5
+# Seconds between scans for integrations that enabled polling
+SYNC_INTERVAL = 60
+# Lease on a claimed checkpoint; longer than any poll takes
+LEASE_SECONDS = 600
+
+_checkpoints = PollCheckpoint.__table__
+
+
+def load_poller_module(platform: str):
+    if platform == "zendesk":
+        from modules.zendesk import poller
+        return poller
+    if platform == "freshdesk":
+        from modules.freshdesk import poller
+        return poller
+    raise ValueError(f"Unknown poller module: {platform}")
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    """Parse an API timestamp into a naive UTC datetime"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def next_interval(interval: float, changes: int) -> float:
+    """Adapt an integration's polling interval to how busy it is"""
+    if changes:
+        return max(POLL_MIN_INTERVAL, interval / 2)
+    return min(POLL_MAX_INTERVAL, interval * 1.5)
+
+
+class TicketPoller:
+    def __init__(self, concurrency: int = POLL_CONCURRENCY):
+        self.poller_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self._task: Optional[asyncio.Task] = None
+        self._polling: set = set()
+
+    async def sync_integrations(self):
+        """Create checkpoints for integrations that have polling enabled"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(Integration).where(
+                    Integration.integration_type.in_(POLLED_PLATFORMS),
+                    Integration.is_active == True
+                )
+            )
+            integrations = [
+                integration for integration in result.scalars().all()
+                if json.loads(integration.config).get("polling")
+            ]
+            if not integrations:
+                return
+            known = await session.execute(
+                select(_checkpoints.c.integration_id).where(
+                    _checkpoints.c.integration_id.in_([integration.id for integration in integrations])
+                )
+            )
+            known = set(known.scalars().all())
+            for integration in integrations:
+                if integration.id in known:
+                    continue
+                session.add(PollCheckpoint(
+                    integration_id=integration.id,
+                    platform=integration.integration_type,
+                    interval=POLL_MIN_INTERVAL
+                ))
+                logger.info("Polling enabled for %s integration %s", integration.integration_type, integration.id)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Another process created them first
+                await session.rollback()
+
+    async def _claim(self, limit: int) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        due = and_(
+            _checkpoints.c.next_poll_at <= now,
+            or_(_checkpoints.c.locked_until.is_(None), _checkpoints.c.locked_until < now)
+        )
+        async with async_session() as session:
+            result = await session.execute(
+                update(_checkpoints)
+                .where(
+                    _checkpoints.c.integration_id.in_(
+                        select(_checkpoints.c.integration_id)
+                        .where(due)
+                        .order_by(_checkpoints.c.next_poll_at)
+                        .limit(limit)
+                    ),
+                    due
+                )
+                .values(locked_by=self.poller_id, locked_until=now + timedelta(seconds=LEASE_SECONDS))
+                .returning(*_checkpoints.c)
+            )
+            rows = [dict(row._mapping) for row in result]
+            await session.commit()
+        return rows
+
+    async def _save(self, integration_id: int, **values):
+        async with async_session() as session:
+            await session.execute(
+                update(_checkpoints)
+                .where(_checkpoints.c.integration_id == integration_id, _checkpoints.c.locked_by == self.poller_id)
+                .values(**values)
+            )
+            await session.commit()
+
+    async def poll(self, checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fetch and process one integration's ticket changes since its checkpoint
+
+        Returns:
+            Dict with the number of changed tickets processed and whether the
+            end of the export stream was reached
+        """
+        integration_id = checkpoint["integration_id"]
+        platform = checkpoint["platform"]
+        cursor = checkpoint["cursor"]
+        recent = set(json.loads(checkpoint["recent_event_ids"] or "[]"))
+        started_at = checkpoint["started_at"]
+        interval = checkpoint["interval"]
+        changes = 0
+        end_of_stream = False
+        error = None
+
+        async with async_session() as session:
+            repo = IntegrationRepository(session)
+            integration = await repo.get_integration(integration_id)
+            config = repo.get_decrypted_config(integration) if integration else {}
+        if not integration or not integration.is_active or not config.get("polling"):
+            # Disabled since; keep the checkpoint in case it is enabled again
+            await self._save(integration_id, next_poll_at=datetime.utcnow() + timedelta(seconds=POLL_MAX_INTERVAL),
+                             locked_by=None, locked_until=None)
+            return {"changes": 0, "end_of_stream": True}
+
+        module = load_poller_module(platform)
+        start_time = int(started_at.replace(tzinfo=timezone.utc).timestamp())
+        for _ in range(POLL_MAX_PAGES):
+            result = await asyncio.to_thread(module.fetch_ticket_changes, config, cursor, start_time)
+            if not result.get("success"):
+                error = result.get("message")
+                interval = min(POLL_MAX_INTERVAL, max(interval * 2, result.get("retry_after", 0)))
+                logger.warning("Polling %s integration %s failed: %s", platform, integration_id, error)
+                break
+
+            tickets = result["tickets"]
+            async with async_session() as session:
+                for ticket in tickets:
+                    event_id = module.event_id(integration_id, ticket)
+                    if event_id in recent:
+                        continue
+                    new_correlation_id(event_id)
+                    payload = module.to_event(ticket)
+                    payload["source"] = "poll"
+                    payload["integration_id"] = integration_id
+                    created_at = _parse_time(ticket.get("created_at"))
+                    payload["created"] = created_at is not None and created_at >= started_at
+                    response = await event_pipeline.receive_event(platform, payload, session, event_id=event_id)
+                    if response.get("status") == "error":
+                        logger.warning("Skipping polled %s ticket %s: %s", platform, ticket.get("id"),
+                                       response.get("message"))
+                    else:
+                        changes += 1
+
+            if tickets:
+                # Versions at the new cursor's timestamp may be exported again
+                last_updated = tickets[-1].get("updated_at")
+                boundary = {
+                    module.event_id(integration_id, ticket) for ticket in tickets
+                    if ticket.get("updated_at") == last_updated
+                }
+                recent = boundary | recent if result["cursor"] == cursor else boundary
+            cursor = result["cursor"]
+            # Save progress per page, so a crash does not process the page again
+            await self._save(integration_id, cursor=cursor, recent_event_ids=json.dumps(sorted(recent)))
+            if result["end_of_stream"]:
+                end_of_stream = True
+                break
+
+        if error is None:
+            interval = next_interval(interval, changes)
+        now = datetime.utcnow()
+        # Not at the end of the stream yet: continue with the next pages right away
+        delay = interval if end_of_stream or error is not None else 0
+        await self._save(
+            integration_id,
+            interval=interval,
+            next_poll_at=now + timedelta(seconds=delay),
+            last_polled_at=now,
+            last_error=error,
+            locked_by=None,
+            locked_until=None
+        )
+        if changes:
+            logger.info("Polled %s changed tickets from %s integration %s", changes, platform, integration_id)
+        return {"changes": changes, "end_of_stream": end_of_stream}
+
+    async def _poll_claimed(self, checkpoint: Dict[str, Any]):
+        try:
+            await self.poll(checkpoint)
+        except Exception as e:
+            # The lease expires and the integration is polled again
+            logger.exception("Polling integration %s failed: %s", checkpoint["integration_id"], e)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_sync = loop.time()
+        while True:
+            try:
+                if loop.time() >= next_sync:
+                    await self.sync_integrations()
+                    next_sync = loop.time() + SYNC_INTERVAL
+                # Only claim what can start now, so leases do not run out while waiting
+                free = self.concurrency - len(self._polling)
+                for checkpoint in (await self._claim(free) if free > 0 else []):
+                    task = asyncio.create_task(self._poll_claimed(checkpoint))
+                    self._polling.add(task)
+                    task.add_done_callback(self._polling.discard)
+            except Exception as e:
+                logger.error("Poller loop failed: %s", e)
+            await asyncio.sleep(TICK_INTERVAL)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._polling):
+            task.cancel()
+        if self._polling:
+            await asyncio.gather(*list(self._polling), return_exceptions=True)
+
+
+ticket_poller = TicketPoller()
+
+
+def start_poller():
+    if POLLER_ENABLED:
+        ticket_poller.start()
+
+
+async def stop_poller():
+    await ticket_poller.stop()
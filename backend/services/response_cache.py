@@ -0,0 +1,179 @@
+"""
+Conditional GET support for rule and integration endpoints
+
+Every rule/integration write bumps a per-tenant (user_id) version counter.
+Serialized response bodies are cached together with the version they were
+built from, so a refetch with a matching If-None-Match is answered with 304
+(and any other refetch with the cached bytes) without touching the database.
+
+The counters live in process memory: with several web replicas each one only
+sees its own writes, so the cache is off by default; set
+RESPONSE_CACHE_ENABLED=true only when all writes for a tenant go through one
+process.
+
+Cached responses are built from the primary database, not the read replica
+(see response_session()).
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from db import async_session, read_session
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+
+# Version key for responses spanning all tenants (e.g. GET /rules/ without user_id)
+ALL_TENANTS = "*"
+
+
+class ResponseCache:
+    """LRU of serialized JSON bodies validated against tenant version counters"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._versions: Dict[Hashable, int] = {}
+        # key -> (tenant, version, etag, body, headers)
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, int, str, bytes, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> int:
+        """
+        Version of ALL_TENANTS, which changes on every write
+
+        Take it before querying the database and pass it to put(), so a write
+        that races with the query is never cached.
+        """
+        return self._versions.get(ALL_TENANTS, 0)
+
+    def bump(self, tenant: Hashable):
+        """Invalidate every cached response of a tenant, and all cross-tenant ones"""
+        with self._lock:
+            self._versions[tenant] = self._versions.get(tenant, 0) + 1
+            self._versions[ALL_TENANTS] = self._versions.get(ALL_TENANTS, 0) + 1
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, bytes, Dict[str, str]]]:
+        """Get (etag, body, headers) for a key if it is still current"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            tenant, version, etag, body, headers = entry
+            if version != self._versions.get(tenant, 0):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return etag, body, headers
+
+    def put(self, key: Hashable, tenant: Hashable, snapshot: int, body: bytes, headers: Dict[str, str]) -> str:
+        """
+        Store a serialized body that was built after taking `snapshot`
+
+        Returns:
+            The ETag of the body
+        """
+        etag = _etag(body)
+        with self._lock:
+            # A write landed while the response was being built; don't cache stale data
+            if snapshot == self._versions.get(ALL_TENANTS, 0):
+                version = self._versions.get(tenant, 0)
+                self._entries[key] = (tenant, version, etag, body, headers)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+response_cache = ResponseCache()
+
+
+def tenant_key(user_id: Optional[int]) -> Hashable:
+    """Version key for a user_id filter (None means all tenants)"""
+    return ALL_TENANTS if user_id is None else user_id
+
+
+def request_key(kind: str, request: Request) -> Hashable:
+    """Cache key for a request: resource kind, path and normalized query string"""
+    return (kind, request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _build_response(request: Request, etag: str, body: bytes, headers: Dict[str, str]) -> Response:
+    headers = {**headers, "ETag": etag}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_response(request: Request, key: Hashable) -> Optional[Response]:
+    """Answer a request from the cache (200 with cached bytes, or 304), if possible"""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    hit = response_cache.get(key)
+    if hit is None:
+        return None
+    etag, body, headers = hit
+    return _build_response(request, etag, body, headers)
+
+
+@asynccontextmanager
+async def response_session():
+    """
+    Session to build cacheable responses from
+
+    The primary while the cache is enabled: a replica lagging behind a write
+    would return the data from before it, which would be cached under the
+    version after it and served until the next write. Without the cache,
+    reads go to the replica (db.read_session).
+    """
+    if RESPONSE_CACHE_ENABLED:
+        async with async_session() as session:
+            yield session
+    else:
+        async with read_session() as session:
+            yield session
+
+
+def store_response(
+    request: Request,
+    key: Hashable,
+    tenant: Hashable,
+    snapshot: int,
+    content: Any,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serialize content once, cache it and return it with an ETag
+
+    `snapshot` must be taken with response_cache.snapshot() before querying
+    the database, so a write that races with the query is not cached.
+    """
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+    headers = headers or {}
+    if RESPONSE_CACHE_ENABLED:
+        etag = response_cache.put(key, tenant, snapshot, body, headers)
+    else:
+        etag = _etag(body)
+    return _build_response(request, etag, body, headers)
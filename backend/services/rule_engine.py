@@ -1,9 +1,21 @@
 import json
 import importlib
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional
 from sqlmodel.ext.asyncio.session import AsyncSession
 from models.rule import Rule
 from repositories.integration_repository import IntegrationRepository
+from services.bulk_mutations import bulk_mutations
+from services.enrichment import template_context
+from services.entity_links import created_target, entity_link_store
+from services.execution_log import execution_recorder
+from services.idempotency import (
+    IDEMPOTENCY_ENABLED, RunReceipts, current_key as current_idempotency_key, idempotency_key, idempotency_store
+)
+from utils.log import get_correlation_id, get_logger, log_payload
+from utils.templating import render
+
+logger = get_logger("rule_engine")
 
 # Define our own module loader to avoid circular imports
 def load_action_module(name: str):
@@ -64,10 +76,11 @@ async def execute_integration_action(
         
         # Execute action based on platform and action_type
         if platform == "zendesk":
-            from modules.zendesk.actions import create_ticket, update_ticket, add_comment
+            from modules.zendesk.actions import add_comment
             
+            # Ticket mutations are combined with concurrent ones into bulk requests
             if action_type == "create_ticket":
-                return create_ticket(config, action_data)
+                return await bulk_mutations.submit(platform, integration_id, config, action_type, action_data)
             elif action_type == "update_ticket":
                 ticket_id = action_data.pop("ticket_id", None)
                 if not ticket_id:
@@ -75,7 +88,9 @@ async def execute_integration_action(
                         "success": False,
                         "message": "Missing ticket_id for update_ticket action"
                     }
-                return update_ticket(config, ticket_id, action_data)
+                return await bulk_mutations.submit(
+                    platform, integration_id, config, action_type, action_data, ticket_id=ticket_id
+                )
             elif action_type == "add_comment":
                 ticket_id = action_data.pop("ticket_id", None)
                 comment = action_data.pop("comment", "")
@@ -93,7 +108,7 @@ async def execute_integration_action(
                 }
                 
         elif platform == "freshdesk":
-            from modules.freshdesk.actions import create_ticket, update_ticket, add_note
+            from modules.freshdesk.actions import create_ticket, add_note
             
             if action_type == "create_ticket":
                 return create_ticket(config, action_data)
@@ -104,7 +119,9 @@ async def execute_integration_action(
                         "success": False,
                         "message": "Missing ticket_id for update_ticket action"
                     }
-                return update_ticket(config, ticket_id, action_data)
+                return await bulk_mutations.submit(
+                    platform, integration_id, config, action_type, action_data, ticket_id=ticket_id
+                )
             elif action_type == "add_note":
                 ticket_id = action_data.pop("ticket_id", None)
                 note_data = {
@@ -138,109 +155,399 @@ async def execute_integration_action(
                 "message": f"Unsupported integration platform: {platform}"
             }
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error executing %s action %s: %s", platform, action_type, e)
         return {
             "success": False,
             "message": f"Error executing integration action: {str(e)}"
         }
 
-async def process_rule(rule: Rule, session: AsyncSession = None):
+async def execute_action(rule: Rule, action: Dict[str, Any], session: AsyncSession = None) -> Dict[str, Any]:
+    """
+    Execute a single action of a rule
+
+    Returns:
+        The action module's result dict, or a {"success": False, "message": ...}
+        dict when the action is misconfigured
+    """
+    platform = action.get("platform")
+    logger.debug("Processing action for platform '%s'", platform, extra={"rule_id": rule.id})
+    
+    # Check if this is an integration action
+    if platform in ["zendesk", "freshdesk"]:
+        if not session:
+            logger.error("Database session required for integration actions", extra={"rule_id": rule.id})
+            return {
+                "success": False,
+                "message": "Database session required for integration actions"
+            }
+            
+        action_type = action.get("action_type")
+        action_data = action.get("data", {})
+        integration_id = action.get("integration_id")
+        
+        if not action_type or not integration_id:
+            logger.error("Missing action_type or integration_id for %s action", platform, extra={"rule_id": rule.id})
+            return {
+                "success": False,
+                "message": f"Missing action_type or integration_id for {platform} action"
+            }
+        
+        return await execute_integration_action(
+            platform, 
+            action_type, 
+            action_data, 
+            integration_id,
+            session
+        )
+    elif platform == "slack":
+        # Handle Slack actions using integration from database
+        if not session:
+            logger.error("Database session required for Slack integration actions", extra={"rule_id": rule.id})
+            return {
+                "success": False,
+                "message": "Database session required for Slack actions"
+            }
+            
+        action_type = action.get("action")
+        integration_id = action.get("integration_id")
+        
+        if not action_type or not integration_id:
+            logger.error("Missing action_type or integration_id for Slack action", extra={"rule_id": rule.id})
+            return {
+                "success": False,
+                "message": "Missing action_type or integration_id for Slack action"
+            }
+        
+        # Get integration from database
+        repository = IntegrationRepository(session)
+        integration = await repository.get_integration(integration_id)
+        
+        if not integration:
+            return {
+                "success": False,
+                "message": f"Slack integration with ID {integration_id} not found"
+            }
+        
+        # Get decrypted config
+        config = repository.get_decrypted_config(integration)
+        
+        # Extract parameters from action
+        params = {}
+        for key, value in action.items():
+            if key not in ["platform", "action", "integration_id"]:
+                params[key] = value
+        
+        # Import and execute action
+        from modules.slack.actions import send_message
+        from services.slack_directory import slack_directory
+        
+        if action_type == "send_message":
+            if 'token' in config:
+                # Channel names, @email mentions and multi-channel fan-out
+                return await slack_directory.send(integration_id, config, params)
+            return send_message(config, params)
+        else:
+            return {
+                "success": False,
+                "message": f"Unsupported Slack action: {action_type}"
+            }
+    elif platform == "trello" and action.get("integration_id"):
+        # Handle Trello actions using integration from database
+        if not session:
+            logger.error("Database session required for Trello integration actions", extra={"rule_id": rule.id})
+            return {
+                "success": False,
+                "message": "Database session required for Trello actions"
+            }
+
+        integration_id = action["integration_id"]
+        repository = IntegrationRepository(session)
+        integration = await repository.get_integration(integration_id)
+
+        if not integration:
+            return {
+                "success": False,
+                "message": f"Trello integration with ID {integration_id} not found"
+            }
+
+        config = repository.get_decrypted_config(integration)
+
+        # Board, list and label names resolved from cached metadata
+        from services.trello_directory import trello_directory
+
+        if action.get("action", "create_card") == "create_card":
+            return await trello_directory.create_card(integration_id, config, action)
+        else:
+            return {
+                "success": False,
+                "message": f"Unsupported Trello action: {action.get('action')}"
+            }
+    elif platform == "attachments":
+        # Files streamed from the ticket's platform into Slack, Discord or Linear
+        if not session:
+            logger.error("Database session required for attachment actions", extra={"rule_id": rule.id})
+            return {
+                "success": False,
+                "message": "Database session required for attachment actions"
+            }
+        if action.get("action", "forward_attachments") != "forward_attachments":
+            return {
+                "success": False,
+                "message": f"Unsupported attachments action: {action.get('action')}"
+            }
+        from services.attachment_forwarder import attachment_forwarder
+        return await attachment_forwarder.forward(session, action)
+    elif platform == "linear":
+        # Label names resolved from cached metadata; concurrent creations share a request
+        from services.linear_batcher import linear_batcher
+        return await linear_batcher.execute(action)
+    elif platform == "notion":
+        # Properties checked and converted against the cached database schema
+        from services.notion_schema import notion_schema
+        return await notion_schema.execute(action)
+    elif platform == "discord":
+        # Queued per webhook and sent at the rate Discord's buckets allow
+        from services.discord_delivery import discord_delivery
+        return await discord_delivery.execute(action)
+    else:
+        # Handle legacy action modules
+        action_fn = load_action_module(platform)
+        return action_fn(action)
+
+def action_succeeded(result: Any) -> bool:
+    """Interpret the different result shapes returned by action modules"""
+    if not isinstance(result, dict):
+        return False
+    if "success" in result:
+        return bool(result["success"])
+    if "status" in result:
+        return result["status"] == "success"
+    if "ok" in result:  # Raw Slack API response
+        return bool(result["ok"])
+    return "error" not in result
+
+def action_error(result: Any) -> Optional[str]:
+    """Error message of a failed action result"""
+    if not isinstance(result, dict):
+        return f"Unexpected action result: {result!r}"
+    return result.get("message") or result.get("error") or "Action failed"
+
+async def run_action(
+    rule: Rule,
+    index: int,
+    action: Dict[str, Any],
+    session: AsyncSession = None,
+    event_id: Optional[str] = None,
+    ticket_id: Any = None,
+    receipts: Optional[RunReceipts] = None
+) -> Dict[str, Any]:
+    """
+    Execute one action of a rule now and record the outcome in the execution log
+
+    With an event ID, an action that already succeeded for the event is
+    skipped and a success is recorded as a receipt (see services/idempotency.py):
+    into `receipts` when the rule run passes its receipts, which it writes
+    once at its end, otherwise right away.
+    With a ticket ID, an object the action creates is linked to the ticket
+    (see services/entity_links.py).
+
+    Args:
+        rule: Rule the action belongs to
+        index: Position of the action in the rule
+        action: Action configuration
+        session: Database session (required for integration-backed actions)
+        event_id: ID of the event that triggered the rule
+        ticket_id: ID of the ticket the rule ran for (on the rule's platform)
+        receipts: Receipts of the rule run (see IdempotencyStore.prefetch)
+
+    Returns:
+        The action result
+    """
+    platform = action.get("platform")
+    key = idempotency_key(event_id, rule.id, index) if IDEMPOTENCY_ENABLED and event_id else None
+    if key:
+        try:
+            completed = key in receipts if receipts is not None else await idempotency_store.is_completed(key)
+        except Exception as e:
+            logger.error("Failed to check idempotency key %s: %s", key, e, extra={"rule_id": rule.id})
+            completed = False
+        if completed:
+            logger.info(
+                "Action for platform '%s' already succeeded for this event, skipped", platform,
+                extra={"rule_id": rule.id, "idempotency_key": key}
+            )
+            return {"success": True, "skipped": True, "message": "Already executed for this event", "idempotency_key": key}
+
+    started = time.perf_counter()
+    token = current_idempotency_key.set(key)
+    try:
+        result = await execute_action(rule, action, session)
+    except Exception as e:
+        logger.exception("Action for platform '%s' raised: %s", platform, e, extra={"rule_id": rule.id})
+        result = {"success": False, "message": f"Error executing action: {str(e)}"}
+    finally:
+        current_idempotency_key.reset(token)
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    
+    # Check if result is a dictionary with a 'message' key containing 'missing scopes'
+    if isinstance(result, dict) and result.get('message') == 'missing scopes':
+        logger.warning("Action for platform '%s' failed: missing scopes", platform, extra={"rule_id": rule.id})
+    
+    succeeded = action_succeeded(result)
+    if succeeded and key and receipts is not None:
+        receipts.add(key)
+    elif succeeded and key:
+        try:
+            await idempotency_store.mark_completed([key])
+        except Exception as e:
+            logger.error("Failed to store idempotency key %s: %s", key, e, extra={"rule_id": rule.id})
+    target = created_target(action, result) if succeeded and ticket_id is not None else None
+    if target:
+        try:
+            await entity_link_store.record(rule.user_id, rule.trigger_platform, ticket_id, target, rule.id)
+        except Exception as e:
+            logger.error("Failed to link ticket %s: %s", ticket_id, e, extra={"rule_id": rule.id})
+    logger.info(
+        "Action executed for platform '%s' (%s)", platform, "success" if succeeded else "error",
+        extra={"rule_id": rule.id, "latency_ms": latency_ms}
+    )
+    log_payload(logger, "Action result", result, rule_id=rule.id, platform=platform)
+
+    await execution_recorder.record(
+        user_id=rule.user_id,
+        rule_id=rule.id,
+        event_id=event_id,
+        kind="action",
+        platform=platform,
+        action_index=index,
+        action_type=action.get("action_type") or action.get("action") or action.get("type"),
+        status="success" if succeeded else "error",
+        latency_ms=latency_ms,
+        error=None if succeeded else action_error(result)
+    )
+    return result
+
+async def process_rule(
+    rule: Rule,
+    session: AsyncSession = None,
+    event_id: Optional[str] = None,
+    ticket: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Execute every action of a rule and record the outcome in the execution log
+
+    Actions with `delay_seconds` are not executed but scheduled (see
+    services/scheduler.py); their result is {"success": True, "scheduled_id": ...}.
+    Actions that already succeeded for the same event are skipped (see
+    services/idempotency.py).
+    Placeholders in actions are filled from the ticket (see utils/templating.py)
+    and the objects earlier actions created for it (see services/entity_links.py).
+
+    Args:
+        rule: Rule to execute
+        session: Database session (required for integration-backed and delayed actions)
+        event_id: ID of the event that triggered the rule (defaults to the correlation id)
+        ticket: Normalized (and enriched) ticket of the triggering event, used
+            by placeholders and delayed actions
+
+    Returns:
+        List of action results, in action order
+    """
+    event_id = event_id or get_correlation_id()
+    results = []
+    rule_started = time.perf_counter()
+    rule_error = None
+    receipts = None
     try:
         actions = json.loads(rule.actions)
-        for action in actions:
+        context = template_context(ticket)
+        ticket_id = ticket.get("ticket_id") if ticket else None
+        # Linked objects are loaded only for rules that reference them, again after a new link
+        needs_links = ticket_id is not None and "links." in rule.actions
+        links_stale = needs_links
+        if IDEMPOTENCY_ENABLED and event_id:
+            # Receipts of earlier runs of this rule for the event, in one query
+            try:
+                receipts = await idempotency_store.prefetch(
+                    idempotency_key(event_id, rule.id, index) for index in range(len(actions))
+                )
+            except Exception as e:
+                logger.error("Failed to load idempotency receipts: %s", e, extra={"rule_id": rule.id})
+                receipts = RunReceipts(set())
+        for index, action in enumerate(actions):
             platform = action.get("platform")
             if not platform:
                 continue
-                
-            print(f"[DEBUG] Processing action for platform '{platform}'")
-            
-            # Check if this is an integration action
-            if platform in ["zendesk", "freshdesk"]:
-                if not session:
-                    print(f"[ERROR] Database session required for integration actions")
-                    continue
-                    
-                action_type = action.get("action_type")
-                action_data = action.get("data", {})
-                integration_id = action.get("integration_id")
-                
-                if not action_type or not integration_id:
-                    print(f"[ERROR] Missing action_type or integration_id for {platform} action")
-                    continue
-                
-                result = await execute_integration_action(
-                    platform, 
-                    action_type, 
-                    action_data, 
-                    integration_id,
-                    session
-                )
-            elif platform == "slack":
-                # Handle Slack actions using integration from database
-                if not session:
-                    print(f"[ERROR] Database session required for Slack integration actions")
-                    result = {
-                        "success": False,
-                        "message": "Database session required for Slack actions"
-                    }
-                    continue
-                    
-                action_type = action.get("action")
-                integration_id = action.get("integration_id")
-                
-                if not action_type or not integration_id:
-                    print(f"[ERROR] Missing action_type or integration_id for Slack action")
-                    result = {
-                        "success": False,
-                        "message": "Missing action_type or integration_id for Slack action"
-                    }
-                    continue
-                
-                # Get integration from database
-                repository = IntegrationRepository(session)
-                integration = await repository.get_integration(integration_id)
-                
-                if not integration:
-                    result = {
-                        "success": False,
-                        "message": f"Slack integration with ID {integration_id} not found"
-                    }
-                    continue
-                
-                # Get decrypted config
-                config = repository.get_decrypted_config(integration)
-                
-                # Extract parameters from action
-                params = {}
-                for key, value in action.items():
-                    if key not in ["platform", "action", "integration_id"]:
-                        params[key] = value
-                
-                # Import and execute action
-                from modules.slack.actions import send_message
-                
-                if action_type == "send_message":
-                    result = send_message(config, params)
-                else:
-                    result = {
-                        "success": False,
-                        "message": f"Unsupported Slack action: {action_type}"
-                    }
+            if links_stale and "links." in json.dumps(action):
+                try:
+                    context["links"] = await entity_link_store.links_for(rule.user_id, rule.trigger_platform, ticket_id)
+                except Exception as e:
+                    logger.error("Failed to load linked objects: %s", e, extra={"rule_id": rule.id})
+                links_stale = False
+            if context:
+                action = render(action, context)
+
+            if action.get("delay_seconds"):
+                result = await schedule_action(rule, index, action, session, event_id, ticket)
             else:
-                # Handle legacy action modules
-                action_fn = load_action_module(platform)
-                result = action_fn(action)
-            
-            print(f"[DEBUG] Raw result type: {type(result)}")
-            print(f"[DEBUG] Raw result content: {result}")
-            
-            # Check if result is a dictionary with a 'message' key containing 'missing scopes'
-            if isinstance(result, dict) and result.get('message') == 'missing scopes':
-                print(f"[DEBUG] Found 'missing scopes' message in result")
-            
-            print(f"[INFO] Action executed for platform '{platform}':", result)
+                result = await run_action(rule, index, action, session, event_id, ticket_id, receipts)
+                if needs_links and action_succeeded(result) and created_target(action, result):
+                    links_stale = True
+            results.append(result)
+            if not action_succeeded(result):
+                rule_error = rule_error or action_error(result)
     except Exception as e:
-        print("[ERROR] Failed to process rule:", e)
-        import traceback
-        traceback.print_exc()
+        rule_error = f"Failed to process rule: {str(e)}"
+        logger.exception("Failed to process rule %s: %s", rule.id, e, extra={"rule_id": rule.id})
+
+    if receipts is not None and receipts.new:
+        # Receipts of the actions that succeeded in this run, in one insert
+        try:
+            await idempotency_store.mark_completed(receipts.new)
+        except Exception as e:
+            logger.error("Failed to store %s idempotency keys: %s", len(receipts.new), e, extra={"rule_id": rule.id})
+
+    await execution_recorder.record(
+        user_id=rule.user_id,
+        rule_id=rule.id,
+        event_id=event_id,
+        kind="rule",
+        platform=rule.trigger_platform,
+        status="error" if rule_error else "success",
+        latency_ms=int((time.perf_counter() - rule_started) * 1000),
+        error=rule_error
+    )
+    return results
+
+async def schedule_action(
+    rule: Rule,
+    index: int,
+    action: Dict[str, Any],
+    session: AsyncSession,
+    event_id: Optional[str],
+    ticket: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Persist a delayed action for the scheduler"""
+    if not session:
+        return {
+            "success": False,
+            "message": "Database session required for delayed actions"
+        }
+    try:
+        delay = float(action["delay_seconds"])
+    except (TypeError, ValueError):
+        return {
+            "success": False,
+            "message": f"Invalid delay_seconds: {action.get('delay_seconds')!r}"
+        }
+    from services.scheduler import action_scheduler
+    scheduled = await action_scheduler.schedule(session, rule, index, action, delay, event_id, ticket)
+    logger.info(
+        "Action for platform '%s' scheduled in %ss", action.get("platform"), delay,
+        extra={"rule_id": rule.id, "scheduled_id": scheduled.id}
+    )
+    return {
+        "success": True,
+        "message": f"Scheduled for {scheduled.due_at.isoformat()}",
+        "scheduled_id": scheduled.id
+    }
@@ -0,0 +1,115 @@
+"""
+Checks run when a rule is saved, so misconfigured rules are rejected up front
+instead of failing on every event
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.window_aggregator import WINDOW_TRIGGER, WindowSpec
+
+# Platforms whose actions are checked against the remote service
+REMOTE_CHECKED_PLATFORMS = ("notion",)
+
+
+async def validate_rule(trigger_event: Optional[str], trigger_data: Optional[str], actions: Optional[List[Any]] = None):
+    """
+    Validate a rule's trigger configuration and actions
+
+    Raises:
+        ValueError: With a message suitable for the API response
+    """
+    validate_trigger(trigger_event, trigger_data)
+    if actions:
+        await validate_actions(actions)
+
+
+def validate_trigger(trigger_event: Optional[str], trigger_data: Optional[str]):
+    """
+    Validate a rule's trigger configuration (no remote calls)
+
+    Raises:
+        ValueError: With a message suitable for the API response
+    """
+    if trigger_event == WINDOW_TRIGGER:
+        try:
+            data = json.loads(trigger_data or "")
+            if not isinstance(data, dict):
+                raise ValueError("trigger_data must be a JSON object")
+            WindowSpec(data)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid {WINDOW_TRIGGER} trigger: {e}")
+
+
+async def validate_actions(actions: List[Any]):
+    """
+    Validate the actions of a rule
+
+    Raises:
+        ValueError: With a message suitable for the API response
+    """
+    for index, action in enumerate(actions):
+        if isinstance(action, dict):
+            await _validate_action(index, action)
+
+
+async def _validate_action(index: int, action: Dict[str, Any]):
+    from services.notion_schema import notion_schema
+
+    if action.get("platform") == "notion":
+        try:
+            await notion_schema.validate_action(action)
+        except ValueError as e:
+            raise ValueError(f"Invalid action {index}: {e}")
+
+
+class RuleBatchValidator:
+    """
+    Validation of many rules (an import) with the remote checks deferred
+
+    add() checks a rule locally; check() then runs the remote checks of all
+    added rules, with the Notion schemas they use fetched concurrently first,
+    so callers can validate everything before opening a transaction.
+    """
+
+    def __init__(self):
+        # (rule index, [(action index, action)]) of rules with remote checked actions
+        self._deferred: List[Tuple[int, List[Tuple[int, Dict[str, Any]]]]] = []
+
+    def add(self, index: int, trigger_event: Optional[str], trigger_data: Optional[str], actions: Optional[List[Any]]):
+        """
+        Raises:
+            ValueError: If the rule's trigger is invalid
+        """
+        validate_trigger(trigger_event, trigger_data)
+        remote = [
+            (action_index, action) for action_index, action in enumerate(actions or [])
+            if isinstance(action, dict) and action.get("platform") in REMOTE_CHECKED_PLATFORMS
+        ]
+        if remote:
+            self._deferred.append((index, remote))
+
+    async def check(self) -> Optional[Tuple[int, str]]:
+        """
+        Run the deferred checks
+
+        Returns:
+            (rule index, message) of the first invalid rule, or None
+        """
+        from modules.notion.action import get_token
+        from services.notion_schema import notion_schema
+
+        token = get_token()
+        if token:
+            database_ids = {
+                action["database_id"] for _, actions in self._deferred for _, action in actions
+                if isinstance(action.get("database_id"), str)
+            }
+            await asyncio.gather(*[notion_schema.schema(token, database_id) for database_id in database_ids])
+        for index, actions in self._deferred:
+            try:
+                for action_index, action in actions:
+                    await _validate_action(action_index, action)
+            except ValueError as e:
+                return index, str(e)
+        return None
@@ -0,0 +1,306 @@
+"""
+Scheduler for delayed rule actions
+
+An action with `delay_seconds` (e.g. 7200) is stored in the scheduled_action
+table instead of being executed. With `if_status` (e.g. ["open", "new"]) it
+only runs if the ticket still has one of those statuses when it is due, and
+it is cancelled as soon as an event moves the ticket to another status.
+
+Only actions due within the next SCHEDULER_HORIZON seconds are held in
+memory, in a heap ordered by due time; one task sleeps until the earliest
+one is due. The horizon is reloaded from the (status, due_at) index every
+SCHEDULER_LOAD_INTERVAL seconds, so millions of far-off actions cost nothing
+until they come close. Due actions are claimed with a conditional UPDATE, so
+any number of processes can run the scheduler and each action runs once; a
+claimed action whose process dies is picked up again after its lease.
+
+Environment variables:
+    SCHEDULER_ENABLED: Run the scheduler in this process (default true)
+    SCHEDULER_HORIZON: Seconds ahead loaded into memory (default 300)
+    SCHEDULER_LOAD_INTERVAL: Seconds between horizon loads (default 60)
+    SCHEDULER_LEASE_SECONDS: Lease on claimed actions (default 300)
+"""
+import asyncio
+import heapq
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import async_session
+from models.rule import Rule
+from models.scheduled_action import ScheduledAction
+from services.ticket_state import ticket_state_store
+from utils.log import get_logger, new_correlation_id
+
+logger = get_logger("scheduler")
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_HORIZON = float(os.getenv("SCHEDULER_HORIZON", "300"))
+SCHEDULER_LOAD_INTERVAL = float(os.getenv("SCHEDULER_LOAD_INTERVAL", "60"))
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "300"))
+
+# Delay before an action whose execution raised is tried again
+RETRY_DELAY = 60
+# Maximum actions claimed per UPDATE
+CLAIM_BATCH_SIZE = 100
+
+_scheduled = ScheduledAction.__table__
+
+
+def _status_list(value: Any) -> Optional[List[str]]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    return [str(status).lower() for status in value]
+
+
+def status_allowed(if_status: Optional[str], status: Optional[str]) -> bool:
+    """Check a ticket status against a scheduled action's if_status condition"""
+    if not if_status:
+        return True
+    return (status or "").lower() in json.loads(if_status)
+
+
+class ActionScheduler:
+    def __init__(
+        self,
+        horizon: float = SCHEDULER_HORIZON,
+        load_interval: float = SCHEDULER_LOAD_INTERVAL,
+        lease_seconds: float = SCHEDULER_LEASE_SECONDS
+    ):
+        self.horizon = horizon
+        # Loads must overlap, or actions due between two horizons would be missed
+        self.load_interval = min(load_interval, horizon / 2)
+        self.lease_seconds = lease_seconds
+        self.scheduler_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._heap: List[Tuple[datetime, int]] = []
+        self._known: Set[int] = set()
+        self._loaded_until: Optional[datetime] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._firing: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def schedule(
+        self,
+        session: AsyncSession,
+        rule: Rule,
+        action_index: int,
+        action: Dict[str, Any],
+        delay_seconds: float,
+        event_id: Optional[str] = None,
+        ticket: Optional[Dict[str, Any]] = None
+    ) -> ScheduledAction:
+        """Store a delayed action; it runs `delay_seconds` from now"""
+        if_status = _status_list(action.get("if_status"))
+        action = {key: value for key, value in action.items() if key not in ("delay_seconds", "if_status")}
+        ticket_id = ticket.get("ticket_id") if ticket else None
+        scheduled = ScheduledAction(
+            user_id=rule.user_id,
+            rule_id=rule.id,
+            action_index=action_index,
+            action=json.dumps(action),
+            platform=rule.trigger_platform,
+            ticket_id=str(ticket_id) if ticket_id is not None else None,
+            if_status=json.dumps(if_status) if if_status else None,
+            event_id=event_id,
+            due_at=datetime.utcnow() + timedelta(seconds=delay_seconds)
+        )
+        session.add(scheduled)
+        await session.commit()
+        await session.refresh(scheduled)
+        self._push(scheduled.id, scheduled.due_at)
+        return scheduled
+
+    async def cancel_for_ticket(self, session: AsyncSession, platform: str, ticket_id: Any, status: Optional[str]) -> int:
+        """Cancel pending actions of a ticket whose if_status no longer holds"""
+        result = await session.execute(
+            select(_scheduled.c.id, _scheduled.c.if_status).where(
+                _scheduled.c.platform == platform,
+                _scheduled.c.ticket_id == str(ticket_id),
+                _scheduled.c.status == "pending",
+                _scheduled.c.if_status.is_not(None)
+            )
+        )
+        cancelled = [row.id for row in result if not status_allowed(row.if_status, status)]
+        if cancelled:
+            await session.execute(
+                delete(_scheduled).where(_scheduled.c.id.in_(cancelled), _scheduled.c.status == "pending")
+            )
+            await session.commit()
+            logger.info("Cancelled %s scheduled actions of %s ticket %s", len(cancelled), platform, ticket_id)
+        return len(cancelled)
+
+    def _push(self, scheduled_id: int, due_at: datetime):
+        # Actions beyond the loaded horizon are picked up by a later load
+        if not self.running or self._loaded_until is None or due_at > self._loaded_until:
+            return
+        if scheduled_id in self._known:
+            return
+        self._known.add(scheduled_id)
+        heapq.heappush(self._heap, (due_at, scheduled_id))
+        if self._heap[0][1] == scheduled_id:
+            self._wake.set()
+
+    async def _load(self):
+        """Add actions due within the horizon (and expired claims) to the heap"""
+        now = datetime.utcnow()
+        until = now + timedelta(seconds=self.horizon)
+        async with async_session() as session:
+            result = await session.execute(
+                select(_scheduled.c.id, _scheduled.c.due_at).where(
+                    or_(
+                        and_(_scheduled.c.status == "pending", _scheduled.c.due_at <= until),
+                        and_(_scheduled.c.status == "running", _scheduled.c.locked_until < now),
+                    )
+                )
+            )
+            rows = result.all()
+        self._loaded_until = until
+        for row in rows:
+            if row.id not in self._known:
+                self._known.add(row.id)
+                heapq.heappush(self._heap, (row.due_at, row.id))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_load = loop.time()
+        while True:
+            if loop.time() >= next_load:
+                try:
+                    await self._load()
+                except Exception as e:
+                    logger.error("Failed to load scheduled actions: %s", e)
+                next_load = loop.time() + self.load_interval
+
+            now = datetime.utcnow()
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < CLAIM_BATCH_SIZE:
+                due.append(heapq.heappop(self._heap)[1])
+            if due:
+                task = asyncio.create_task(self._fire(due))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+                continue
+
+            timeout = next_load - loop.time()
+            if self._heap:
+                timeout = min(timeout, (self._heap[0][0] - now).total_seconds())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, session: AsyncSession, ids: List[int]) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        result = await session.execute(
+            update(_scheduled)
+            .where(
+                _scheduled.c.id.in_(ids),
+                or_(
+                    _scheduled.c.status == "pending",
+                    and_(_scheduled.c.status == "running", _scheduled.c.locked_until < now),
+                )
+            )
+            .values(
+                status="running",
+                locked_by=self.scheduler_id,
+                locked_until=now + timedelta(seconds=self.lease_seconds)
+            )
+            .returning(*_scheduled.c)
+        )
+        rows = [dict(row._mapping) for row in result]
+        await session.commit()
+        return rows
+
+    async def _fire(self, ids: List[int]):
+        from services import rule_engine
+
+        try:
+            async with async_session() as session:
+                claimed = await self._claim(session, ids)
+        except Exception as e:
+            logger.error("Failed to claim scheduled actions: %s", e)
+            return
+        finally:
+            self._known.difference_update(ids)
+
+        for row in claimed:
+            new_correlation_id(row["event_id"])
+            try:
+                async with async_session() as session:
+                    rule = await session.get(Rule, row["rule_id"])
+                    if rule is None:
+                        logger.info("Dropping scheduled action %s of deleted rule %s", row["id"], row["rule_id"])
+                    elif row["if_status"] and row["ticket_id"] is not None and not status_allowed(
+                        row["if_status"],
+                        (await ticket_state_store.get(session, row["platform"], row["ticket_id"]) or {}).get("status")
+                    ):
+                        logger.info("Scheduled action %s cancelled, ticket status changed", row["id"],
+                                    extra={"rule_id": rule.id})
+                    else:
+                        await rule_engine.run_action(
+                            rule, row["action_index"], json.loads(row["action"]), session,
+                            event_id=row["event_id"], ticket_id=row["ticket_id"]
+                        )
+                    await session.execute(delete(_scheduled).where(_scheduled.c.id == row["id"]))
+                    await session.commit()
+            except Exception as e:
+                logger.exception("Scheduled action %s failed: %s", row["id"], e)
+                try:
+                    async with async_session() as session:
+                        await session.execute(
+                            update(_scheduled)
+                            .where(_scheduled.c.id == row["id"], _scheduled.c.locked_by == self.scheduler_id)
+                            .values(
+                                status="pending", locked_by=None, locked_until=None,
+                                due_at=datetime.utcnow() + timedelta(seconds=RETRY_DELAY)
+                            )
+                        )
+                        await session.commit()
+                except Exception as e:
+                    # The lease expires and the action is claimed again
+                    logger.error("Failed to release scheduled action %s: %s", row["id"], e)
+
+    def start(self):
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._firing:
+            await asyncio.gather(*list(self._firing), return_exceptions=True)
+        self._heap.clear()
+        self._known.clear()
+        self._loaded_until = None
+
+
+action_scheduler = ActionScheduler()
+
+
+def start_scheduler():
+    if SCHEDULER_ENABLED:
+        action_scheduler.start()
+
+
+async def stop_scheduler():
+    await action_scheduler.stop()
@@ -0,0 +1,219 @@
+"""
+Slack channel and user directory, and multi-channel message delivery
+
+Slack actions of token-based integrations may name channels ("#support",
+"support") instead of channel IDs, send to several channels at once with
+"channels": [...], and mention people by email: "@jane@example.com" in the
+message becomes a real mention of that workspace member (unknown emails are
+left as they are). Combined with placeholders, "@{{requester.email}}"
+mentions the ticket's requester.
+
+Channel names are resolved through a per-integration directory built from
+the paginated conversations.list and refreshed every SLACK_DIRECTORY_REFRESH
+seconds in the background (and on demand, at most once a minute, when a name
+is not found). Emails are resolved with users.lookupByEmail and cached for
+SLACK_USER_CACHE_TTL seconds.
+
+Messages to several channels are posted concurrently over the shared HTTP
+pool. Every call waits for a token of its method's Slack rate tier (per
+integration, and per channel for chat.postMessage), and a 429 pauses that
+bucket for the Retry-After time before the call is retried.
+
+Environment variables:
+    SLACK_DIRECTORY_REFRESH: Seconds between channel directory refreshes (default 900)
+    SLACK_USER_CACHE_TTL: Seconds email lookups are cached (default 3600)
+    SLACK_FANOUT_CONCURRENCY: Channels posted to at the same time per action (default 10)
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from modules.slack.actions import list_channels, lookup_user_by_email, post_message
+from utils.log import get_logger
+from utils.rate_limit import RateLimiter
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("slack_directory")
+
+SLACK_DIRECTORY_REFRESH = float(os.getenv("SLACK_DIRECTORY_REFRESH", "900"))
+SLACK_USER_CACHE_TTL = float(os.getenv("SLACK_USER_CACHE_TTL", "3600"))
+SLACK_FANOUT_CONCURRENCY = int(os.getenv("SLACK_FANOUT_CONCURRENCY", "10"))
+
+# Slack rate tiers as (calls per second, burst)
+RATE_TIERS: Dict[str, Tuple[float, float]] = {
+    "conversations.list": (20 / 60, 5),  # Tier 2
+    "users.lookupByEmail": (50 / 60, 10),  # Tier 3
+    "chat.postMessage": (1, 1),  # About one message per second per channel
+}
+# Retries of a rate limited call
+MAX_RATE_LIMIT_RETRIES = 3
+# Shortest time between two on-demand refreshes for unknown channel names
+MIN_REFRESH_INTERVAL = 60
+
+_CHANNEL_ID = re.compile(r"^[CGD][A-Z0-9]{8,}$")
+_EMAIL_MENTION = re.compile(r"(?<![\w<])@([\w.+-]+@[\w-]+(?:\.[\w-]+)+)")
+
+
+class SlackDirectory:
+    def __init__(self):
+        # integration id -> (channel name -> ID, load time)
+        self._channels: Dict[int, Tuple[Dict[str, str], float]] = {}
+        # integration id -> config, for background refreshes
+        self._configs: Dict[int, Dict[str, Any]] = {}
+        self._refreshing: Dict[int, asyncio.Task] = {}
+        self._users = TTLCache(SLACK_USER_CACHE_TTL)
+        self._limiter = RateLimiter()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _call(self, integration_id: int, method: str, fn: Callable[..., Dict[str, Any]], *args,
+                    bucket: Any = None) -> Dict[str, Any]:
+        rate, burst = RATE_TIERS[method]
+        key = (integration_id, method, bucket)
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self._limiter.acquire(key, rate, burst)
+            result = await asyncio.to_thread(fn, *args)
+            if result.get("error") != "ratelimited":
+                return result
+            logger.warning("Slack %s rate limited, retrying in %ss", method, result["retry_after"])
+            self._limiter.pause(key, result["retry_after"], rate)
+        return result
+
+    async def refresh_channels(self, integration_id: int, config: Dict[str, Any]):
+        """Reload an integration's channel names from conversations.list"""
+        names: Dict[str, str] = {}
+        cursor = None
+        while True:
+            result = await self._call(integration_id, "conversations.list", list_channels, config, cursor)
+            if not result.get("ok"):
+                logger.warning("Failed to list Slack channels of integration %s: %s", integration_id, result.get("error"))
+                if integration_id in self._channels:
+                    return
+                break
+            for channel in result.get("channels", []):
+                names[channel["name"].lower()] = channel["id"]
+            cursor = (result.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                break
+        self._channels[integration_id] = (names, time.monotonic())
+        self._configs[integration_id] = config
+
+    async def _refresh_once(self, integration_id: int, config: Dict[str, Any]):
+        # Concurrent lookups share one refresh
+        task = self._refreshing.get(integration_id)
+        if task is None:
+            task = self._refreshing[integration_id] = asyncio.create_task(self.refresh_channels(integration_id, config))
+            task.add_done_callback(lambda _: self._refreshing.pop(integration_id, None))
+        await asyncio.shield(task)
+
+    async def channel_id(self, integration_id: int, config: Dict[str, Any], channel: str) -> Optional[str]:
+        """Resolve a channel name (with or without "#") or ID to a channel ID"""
+        value = channel.strip()
+        if _CHANNEL_ID.match(value):
+            return value
+        name = value.lstrip("#").lower()
+        entry = self._channels.get(integration_id)
+        if entry is None or (name not in entry[0] and time.monotonic() - entry[1] > MIN_REFRESH_INTERVAL):
+            await self._refresh_once(integration_id, config)
+            entry = self._channels.get(integration_id)
+        return entry[0].get(name) if entry else None
+
+    async def user_id(self, integration_id: int, config: Dict[str, Any], email: str) -> Optional[str]:
+        """Slack user ID of a workspace member's email (None if there is none)"""
+        key = (integration_id, email.lower())
+        cached = self._users.get(key, False)
+        if cached is not False:
+            return cached
+        result = await self._call(integration_id, "users.lookupByEmail", lookup_user_by_email, config, email)
+        if result.get("ok"):
+            user_id = result["user"]["id"]
+        elif result.get("error") == "users_not_found":
+            user_id = None
+        else:
+            logger.warning("Slack user lookup failed: %s", result.get("error"))
+            return None
+        self._users.put(key, user_id)
+        return user_id
+
+    async def resolve_mentions(self, integration_id: int, config: Dict[str, Any], text: str) -> str:
+        """Turn "@email" into Slack mentions"""
+        emails = list(dict.fromkeys(_EMAIL_MENTION.findall(text)))
+        if not emails:
+            return text
+        user_ids = await asyncio.gather(*[self.user_id(integration_id, config, email) for email in emails])
+        mentions = {email: f"<@{user_id}>" for email, user_id in zip(emails, user_ids) if user_id}
+        return _EMAIL_MENTION.sub(lambda match: mentions.get(match.group(1), match.group(0)), text)
+
+    async def send(self, integration_id: int, config: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Post a message to one or more channels
+
+        Args:
+            integration_id: Slack integration
+            config: Decrypted config with the token
+            params: channel or channels (names or IDs), message, optional blocks and attachments
+
+        Returns:
+            Dict with success (all channels succeeded) and per-channel results
+        """
+        channels = params.get("channels") or params.get("channel") or "#general"
+        if isinstance(channels, str):
+            channels = [channels]
+        params = dict(params)
+        if params.get("message"):
+            params["message"] = await self.resolve_mentions(integration_id, config, params["message"])
+
+        semaphore = asyncio.Semaphore(SLACK_FANOUT_CONCURRENCY)
+
+        async def deliver(channel: str) -> Dict[str, Any]:
+            channel_id = await self.channel_id(integration_id, config, channel)
+            if channel_id is None:
+                return {"channel": channel, "success": False, "message": f"Unknown Slack channel: {channel}"}
+            async with semaphore:
+                data = await self._call(
+                    integration_id, "chat.postMessage", post_message, config, channel_id, params, bucket=channel_id
+                )
+            if data.get("ok"):
+                return {"channel": channel, "success": True}
+            return {"channel": channel, "success": False, "message": f"Failed to send Slack message: {data.get('error')}"}
+
+        results = await asyncio.gather(*[deliver(channel) for channel in dict.fromkeys(channels)])
+        failed = [result for result in results if not result["success"]]
+        response = {"success": not failed, "results": results}
+        if failed:
+            response["message"] = "; ".join(result["message"] for result in failed)
+        return response
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(SLACK_DIRECTORY_REFRESH)
+            for integration_id, config in list(self._configs.items()):
+                try:
+                    await self._refresh_once(integration_id, config)
+                except Exception as e:
+                    logger.error("Failed to refresh Slack channels of integration %s: %s", integration_id, e)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+slack_directory = SlackDirectory()
+
+
+def start_slack_directory():
+    slack_directory.start()
+
+
+async def stop_slack_directory():
+    await slack_directory.stop()
@@ -0,0 +1,226 @@
+"""
+Last-known ticket state and transition detection
+
+Each event's ticket attributes (status, priority, tags) are compared with the
+stored state of the ticket to work out what actually changed. The state is
+kept in the ticket_state table with an in-memory LRU in front of it. Cached
+copies carry the row version and every write is conditional on it, so a copy
+made stale by another process is detected by the write itself and reloaded;
+a cache hit therefore costs one UPDATE and no SELECT. In queue mode the
+per-ticket partitioning keeps a ticket on one worker, so its cache hits.
+
+Environment variables:
+    TICKET_STATE_ENABLED: Detect transitions (default true); when false, rules
+        match on the payload alone as before
+    TICKET_STATE_CACHE_SIZE: Tickets kept in memory per process (default 10000)
+"""
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.ticket_state import TicketState
+from utils.log import get_logger
+
+logger = get_logger("ticket_state")
+
+TICKET_STATE_ENABLED = os.getenv("TICKET_STATE_ENABLED", "true").lower() == "true"
+TICKET_STATE_CACHE_SIZE = int(os.getenv("TICKET_STATE_CACHE_SIZE", "10000"))
+
+_states = TicketState.__table__
+
+# Attempts before giving up on concurrent writers of the same ticket
+_MAX_WRITE_ATTEMPTS = 3
+
+
+def normalize_tags(tags: Any) -> Optional[List[str]]:
+    """Tags as a sorted list; None when the payload carries no tags"""
+    if tags is None:
+        return None
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return sorted({str(tag).strip() for tag in tags if str(tag).strip()})
+
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, str) and isinstance(b, str):
+        return a.lower() == b.lower()
+    return a == b
+
+
+def compute_changes(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Diff two ticket states
+
+    Args:
+        previous: State before the event (None for a ticket seen for the first time)
+        current: State after the event
+
+    Returns:
+        Dict with is_new, status_changed/status_from/status_to,
+        priority_changed/priority_from/priority_to, tags_added and tags_removed,
+        plus the two states (used to merge the changes of several events)
+    """
+    before = previous or {"status": None, "priority": None, "tags": []}
+    before_tags = set(before["tags"])
+    current_tags = set(current["tags"])
+    return {
+        "is_new": previous is None,
+        "status_changed": not _same(before["status"], current["status"]),
+        "status_from": before["status"],
+        "status_to": current["status"],
+        "priority_changed": not _same(before["priority"], current["priority"]),
+        "priority_from": before["priority"],
+        "priority_to": current["priority"],
+        "tags_added": sorted(current_tags - before_tags),
+        "tags_removed": sorted(before_tags - current_tags),
+        "previous": previous,
+        "current": current,
+    }
+
+
+def merge_changes(earlier: Optional[Dict[str, Any]], later: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Net changes of two consecutive events (state before the first -> state after the second)"""
+    if earlier is None or later is None:
+        return later
+    return compute_changes(earlier["previous"], later["current"])
+
+
+class TicketStateStore:
+    def __init__(self, cache_size: int = TICKET_STATE_CACHE_SIZE):
+        self.cache_size = cache_size
+        # (platform, ticket_id) -> {"state", "version", "last_event_id", "previous"}
+        self._cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+    def _remember(self, key: Tuple[str, str], entry: Dict[str, Any]):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, session: AsyncSession, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        result = await session.execute(
+            select(
+                _states.c.status, _states.c.priority, _states.c.tags, _states.c.version,
+                _states.c.last_event_id, _states.c.previous
+            ).where(_states.c.platform == key[0], _states.c.ticket_id == key[1])
+        )
+        row = result.first()
+        if row is None:
+            return None
+        return {
+            "state": {"status": row.status, "priority": row.priority, "tags": json.loads(row.tags)},
+            "version": row.version,
+            "last_event_id": row.last_event_id,
+            "previous": json.loads(row.previous) if row.previous else None,
+        }
+
+    async def get(self, session: AsyncSession, platform: str, ticket_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Last-known state of a ticket (status, priority, tags), or None if never seen
+
+        Always read from the table, since a cached copy may be stale.
+        """
+        key = (platform, str(ticket_id))
+        entry = await self._load(session, key)
+        if entry is None:
+            return None
+        self._remember(key, entry)
+        return entry["state"]
+
+    async def observe(
+        self,
+        session: AsyncSession,
+        platform: str,
+        ticket: Dict[str, Any],
+        event_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Record the ticket attributes of an event and return what changed
+
+        Attributes missing from the payload (None) keep their stored value.
+        Observing the most recent event again (a retry) returns the same
+        changes as the first time instead of "nothing changed".
+
+        Args:
+            session: Database session (committed by this method)
+            platform: Helpdesk platform
+            ticket: Normalized ticket fields (ticket_id, status, priority, tags)
+            event_id: ID of the event
+
+        Returns:
+            Changes as returned by compute_changes(), or None when the ticket has no ID
+        """
+        if ticket.get("ticket_id") is None:
+            return None
+        key = (platform, str(ticket["ticket_id"]))
+        tags = normalize_tags(ticket.get("tags"))
+
+        for _ in range(_MAX_WRITE_ATTEMPTS):
+            entry = self._cache.get(key)
+            if entry is None:
+                entry = await self._load(session, key)
+            if entry and event_id and entry["last_event_id"] == event_id:
+                return compute_changes(entry["previous"], entry["state"])
+
+            previous = entry["state"] if entry else None
+            version = entry["version"] if entry else 0
+            current = {
+                "status": ticket.get("status"),
+                "priority": ticket.get("priority"),
+                "tags": tags,
+            }
+            for field in current:
+                if current[field] is None:
+                    current[field] = previous[field] if previous else ([] if field == "tags" else None)
+            if current["priority"] is not None:
+                current["priority"] = str(current["priority"])
+
+            values = {
+                "status": current["status"],
+                "priority": current["priority"],
+                "tags": json.dumps(current["tags"]),
+                "last_event_id": event_id,
+                "previous": json.dumps(previous) if previous else None,
+                "updated_at": datetime.utcnow(),
+            }
+            try:
+                if previous is None:
+                    session.add(TicketState(platform=key[0], ticket_id=key[1], version=1, **values))
+                    await session.commit()
+                else:
+                    # Also verifies that the cached copy is current
+                    result = await session.execute(
+                        update(_states)
+                        .where(_states.c.platform == key[0], _states.c.ticket_id == key[1], _states.c.version == version)
+                        .values(version=version + 1, **values)
+                    )
+                    await session.commit()
+                    if result.rowcount != 1:
+                        self._cache.pop(key, None)
+                        continue
+            except IntegrityError:
+                # Another process inserted the ticket first
+                await session.rollback()
+                self._cache.pop(key, None)
+                continue
+
+            self._remember(key, {
+                "state": current,
+                "version": version + 1,
+                "last_event_id": event_id,
+                "previous": previous,
+            })
+            return compute_changes(previous, current)
+
+        logger.warning("Gave up recording state of %s ticket %s after concurrent updates", platform, key[1])
+        self._cache.pop(key, None)
+        return None
+
+
+ticket_state_store = TicketStateStore()
@@ -0,0 +1,199 @@
+"""
+Trello board metadata and concurrent card creation
+
+Trello actions of DB-backed integrations may name the board, list and labels
+instead of giving their IDs:
+
+    {"platform": "trello", "action": "create_card", "integration_id": 3,
+     "board": "Support", "list": "Escalations", "labels": ["bug"],
+     "name": "{{ticket.subject}}", "desc": "..."}
+
+Board names of an integration and the lists and labels of each board are
+loaded once and cached for TRELLO_METADATA_TTL seconds; a name that is not in
+the cache triggers a reload (at most once a minute) so new lists and labels
+are picked up. IDs (board_id, list_id, label IDs) are used as they are.
+
+Card creations are not serialized: up to TRELLO_CONCURRENCY requests per
+board are in flight at once over the shared HTTP pool. Every request waits
+for a token of Trello's limits (100 requests per 10 seconds per token, 300
+per API key), and a 429 pauses the token's bucket for the Retry-After time
+before the request is retried.
+
+Environment variables:
+    TRELLO_METADATA_TTL: Seconds board, list and label names are cached (default 600)
+    TRELLO_CONCURRENCY: Card creations in flight per board (default 5)
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.trello.actions import create_card, get_board, list_boards
+from utils.log import get_logger
+from utils.rate_limit import RateLimiter
+from utils.ttl_cache import TTLCache
+
+logger = get_logger("trello_directory")
+
+TRELLO_METADATA_TTL = float(os.getenv("TRELLO_METADATA_TTL", "600"))
+TRELLO_CONCURRENCY = int(os.getenv("TRELLO_CONCURRENCY", "5"))
+
+# Trello limits as (requests per second, burst)
+TOKEN_RATE = (10, 100)
+API_KEY_RATE = (30, 300)
+# Retries of a rate limited request
+MAX_RATE_LIMIT_RETRIES = 3
+# Shortest time between two reloads for names missing from the metadata
+MIN_RELOAD_INTERVAL = 60
+
+_TRELLO_ID = re.compile(r"^[0-9a-f]{24}$")
+
+
+class TrelloDirectory:
+    def __init__(self, concurrency: int = TRELLO_CONCURRENCY):
+        self.concurrency = concurrency
+        # (integration id, "boards") -> (board name -> ID, load time)
+        # (integration id, board ID) -> ({"lists": name -> ID, "labels": name -> ID}, load time)
+        self._metadata = TTLCache(TRELLO_METADATA_TTL, 1000)
+        self._loading: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._limiter = RateLimiter()
+
+    async def _call(self, config: Dict[str, Any], fn: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
+        keys = [(("token", config.get("token")), TOKEN_RATE), (("key", config.get("api_key")), API_KEY_RATE)]
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            for key, (rate, burst) in keys:
+                await self._limiter.acquire(key, rate, burst)
+            result = await asyncio.to_thread(fn, config, *args)
+            if "retry_after" not in result:
+                return result
+            logger.warning("Trello rate limited, retrying in %ss", result["retry_after"])
+            self._limiter.pause(keys[0][0], result["retry_after"], keys[0][1][0])
+        return result
+
+    async def _load(self, integration_id: int, config: Dict[str, Any], scope: str) -> Optional[Dict[str, Any]]:
+        """Load an integration's board names (scope "boards") or a board's lists and labels"""
+        key = (integration_id, scope)
+        # Concurrent callers share one load
+        task = self._loading.get(key)
+        if task is None:
+            if scope == "boards":
+                coroutine = self._call(config, list_boards)
+            else:
+                coroutine = self._call(config, get_board, scope)
+            task = self._loading[key] = asyncio.create_task(coroutine)
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        result = await asyncio.shield(task)
+        if not result["success"]:
+            logger.warning("Failed to load Trello %s of integration %s: %s", scope, integration_id, result["message"])
+            return None
+        data = result["data"]
+        if scope == "boards":
+            names = {board["name"].lower(): board["id"] for board in data}
+        else:
+            names = {
+                "lists": {item["name"].lower(): item["id"] for item in data.get("lists", [])},
+                "labels": {item["name"].lower(): item["id"] for item in data.get("labels", []) if item.get("name")}
+            }
+        self._metadata.put(key, (names, time.monotonic()))
+        return names
+
+    async def _names(self, integration_id: int, config: Dict[str, Any], scope: str,
+                     missing: Callable[[Dict[str, Any]], bool]) -> Optional[Dict[str, Any]]:
+        """Cached names, reloaded if `missing` says they lack a wanted name"""
+        cached = self._metadata.get((integration_id, scope))
+        if cached is None:
+            return await self._load(integration_id, config, scope)
+        names, loaded_at = cached
+        if missing(names) and time.monotonic() - loaded_at > MIN_RELOAD_INTERVAL:
+            return await self._load(integration_id, config, scope) or names
+        return names
+
+    async def board_id(self, integration_id: int, config: Dict[str, Any], board: str) -> Optional[str]:
+        """Resolve a board name or ID to a board ID"""
+        if _TRELLO_ID.match(board):
+            return board
+        name = board.strip().lower()
+        names = await self._names(integration_id, config, "boards", lambda names: name not in names)
+        return (names or {}).get(name)
+
+    async def resolve(
+        self, integration_id: int, config: Dict[str, Any], action: Dict[str, Any]
+    ) -> Tuple[Optional[str], List[str], List[str], Optional[str]]:
+        """
+        Resolve an action's list and labels
+
+        Returns:
+            Tuple of (list ID, label IDs, unknown label names, error message)
+        """
+        list_ref = str(action.get("list_id") or action.get("list") or "")
+        labels = action.get("labels") or []
+        if isinstance(labels, str):
+            labels = [label.strip() for label in labels.split(",") if label.strip()]
+        if not list_ref:
+            return None, [], [], "Missing list or list_id"
+
+        board = action.get("board_id") or action.get("board")
+        if not board:
+            # Without a board only IDs can be used
+            if not _TRELLO_ID.match(list_ref):
+                return None, [], [], "List names need a board"
+            label_ids = [label for label in labels if _TRELLO_ID.match(label)]
+            return list_ref, label_ids, [label for label in labels if label not in label_ids], None
+
+        board_id = await self.board_id(integration_id, config, str(board))
+        if board_id is None:
+            return None, [], [], f"Unknown Trello board: {board}"
+
+        wanted_list = list_ref.strip().lower()
+        wanted_labels = [label.lower() for label in labels if not _TRELLO_ID.match(label)]
+
+        def missing(names: Dict[str, Any]) -> bool:
+            if not _TRELLO_ID.match(list_ref) and wanted_list not in names["lists"]:
+                return True
+            return any(label not in names["labels"] for label in wanted_labels)
+
+        names = await self._names(integration_id, config, board_id, missing)
+        if names is None:
+            return None, [], [], f"Failed to load Trello board {board}"
+
+        list_id = list_ref if _TRELLO_ID.match(list_ref) else names["lists"].get(wanted_list)
+        if list_id is None:
+            return None, [], [], f"Unknown Trello list: {list_ref}"
+        label_ids, unknown = [], []
+        for label in labels:
+            label_id = label if _TRELLO_ID.match(label) else names["labels"].get(label.lower())
+            if label_id:
+                label_ids.append(label_id)
+            else:
+                unknown.append(label)
+        return list_id, label_ids, unknown, None
+
+    async def create_card(self, integration_id: int, config: Dict[str, Any], action: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create a card from a rule action
+
+        Returns:
+            Dict with success and the created card as data, or message
+        """
+        if not action.get("name"):
+            return {"success": False, "message": "Missing name for create_card action"}
+        list_id, label_ids, unknown, error = await self.resolve(integration_id, config, action)
+        if error:
+            return {"success": False, "message": error}
+        if unknown:
+            logger.warning("Unknown Trello labels ignored: %s", ", ".join(unknown))
+
+        # Cards of one board are created concurrently, up to the limit
+        semaphore = self._semaphores.setdefault(
+            str(action.get("board_id") or action.get("board") or list_id).lower(), asyncio.Semaphore(self.concurrency)
+        )
+        async with semaphore:
+            result = await self._call(config, create_card, list_id, action, label_ids)
+        if unknown:
+            result = dict(result, unknown_labels=unknown)
+        return result
+
+
+trello_directory = TrelloDirectory()
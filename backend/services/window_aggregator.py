@@ -0,0 +1,402 @@
+"""
+Windowed aggregation triggers
+
+A rule with trigger_event "window_aggregate" fires when an aggregate over the
+platform's recent events reaches a threshold, e.g. "20 tickets tagged outage
+within 10 minutes":
+
+    {
+        "window_seconds": 600,
+        "mode": "sliding",              # or "tumbling"
+        "aggregate": "distinct_count",  # count (events), distinct_count, rate (per minute)
+        "field": "ticket_id",           # distinct_count: what is counted
+        "filter": {"tags": "outage"},   # only events matching every entry
+        "group_by": "priority",         # optional: one window per value
+        "threshold": 20,
+        "cooldown_seconds": 600         # sliding: quiet time after firing (default window_seconds)
+    }
+
+Fields are the normalized ticket fields (ticket_id, status, priority, tags) or
+dotted paths into the webhook payload. Tumbling windows fire at most once per
+window.
+
+State is kept per (rule, group) as a ring of time buckets (WINDOW_BUCKETS per
+sliding window), each holding an event count and, for distinct counts, a
+HyperLogLog. Each event updates one bucket; expired buckets are dropped and
+the aggregate is computed from the live ones, so memory per group is fixed
+and history is never rescanned. Groups per rule are capped at
+WINDOW_MAX_GROUPS (least recently updated are evicted). Changed state is
+checkpointed to the window_state table every WINDOW_CHECKPOINT_INTERVAL
+seconds and on shutdown, and loaded back the first time a rule is seen.
+
+A window needs to see every event of its rule, so in queue mode the events
+are forwarded to one job stream per rule (ordering key "window:<rule id>"),
+which places each rule's windows on a single worker. When the stream's
+partition moves to another worker, the old owner checkpoints the rule and
+forgets it (release_rules), and loads it again if the partition comes back.
+Checkpoints carry the row version they were loaded at and every write is
+conditional on it: a process whose copy is stale (a former owner, or another
+web replica in inline mode) does not overwrite the newer state but drops its
+copy of the rule, losing its own counts since the last checkpoint, and
+reloads it on the rule's next event.
+
+Environment variables:
+    WINDOW_BUCKETS: Buckets per sliding window (default 20)
+    WINDOW_MAX_GROUPS: group_by values tracked per rule (default 1000)
+    WINDOW_CHECKPOINT_INTERVAL: Seconds between state checkpoints (default 10)
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import async_session
+from models.rule import Rule
+from models.window_state import WindowState
+from utils.hll import HyperLogLog
+from utils.log import get_logger
+
+logger = get_logger("window_aggregator")
+
+WINDOW_TRIGGER = "window_aggregate"
+
+WINDOW_BUCKETS = int(os.getenv("WINDOW_BUCKETS", "20"))
+WINDOW_MAX_GROUPS = int(os.getenv("WINDOW_MAX_GROUPS", "1000"))
+WINDOW_CHECKPOINT_INTERVAL = float(os.getenv("WINDOW_CHECKPOINT_INTERVAL", "10"))
+
+AGGREGATES = ("count", "distinct_count", "rate")
+MODES = ("sliding", "tumbling")
+
+_states = WindowState.__table__
+
+
+def window_ordering_key(rule_id: int) -> str:
+    """Ordering key of a rule's job stream in queue mode"""
+    return f"window:{rule_id}"
+
+
+def field_values(name: str, ticket: Dict[str, Any], payload: Dict[str, Any]) -> List[str]:
+    """Values of a ticket field or dotted payload path, as strings (lists yield every item)"""
+    if name in ticket and name != "changes":
+        value = ticket[name]
+    else:
+        value = payload
+        for part in name.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [str(item) for item in value if item is not None]
+    return [str(value)]
+
+
+class WindowSpec:
+    """Parsed and validated window_aggregate trigger_data"""
+    def __init__(self, data: Dict[str, Any]):
+        self.window_seconds = float(data.get("window_seconds", 0))
+        self.mode = data.get("mode", "sliding")
+        self.aggregate = data.get("aggregate", "count")
+        self.field = data.get("field", "ticket_id")
+        self.filter = data.get("filter") or {}
+        self.group_by = data.get("group_by")
+        self.threshold = float(data.get("threshold", 0))
+        self.cooldown_seconds = float(data.get("cooldown_seconds", self.window_seconds))
+
+        if self.window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+        if self.mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if self.aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {', '.join(AGGREGATES)}")
+        if self.threshold <= 0:
+            raise ValueError("threshold must be positive")
+        if not isinstance(self.filter, dict):
+            raise ValueError("filter must be an object")
+
+        if self.mode == "tumbling":
+            self.bucket_seconds = self.window_seconds
+            self.bucket_count = 1
+        else:
+            self.bucket_seconds = max(self.window_seconds / WINDOW_BUCKETS, 1.0)
+            self.bucket_count = math.ceil(self.window_seconds / self.bucket_seconds)
+        # Checkpoints of a different configuration are discarded
+        self.signature = json.dumps(
+            [self.window_seconds, self.mode, self.aggregate, self.field, self.group_by, self.bucket_seconds]
+        )
+
+    def matches(self, ticket: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+        for name, expected in self.filter.items():
+            expected = {str(value).lower() for value in (expected if isinstance(expected, list) else [expected])}
+            if not expected & {value.lower() for value in field_values(name, ticket, payload)}:
+                return False
+        return True
+
+
+class _Group:
+    __slots__ = ("signature", "buckets", "last_fired", "version")
+
+    def __init__(self, signature: str, version: Optional[int] = None):
+        self.signature = signature
+        # bucket index -> [event count, HyperLogLog or None]
+        self.buckets: Dict[int, list] = {}
+        self.last_fired: Optional[float] = None
+        # Version of the stored checkpoint this copy is based on (None: not stored)
+        self.version = version
+
+    def expire(self, current: int, bucket_count: int):
+        for index in [index for index in self.buckets if index <= current - bucket_count]:
+            del self.buckets[index]
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "signature": self.signature,
+            "last_fired": self.last_fired,
+            "buckets": {str(index): [count, hll.dumps() if hll else None]
+                        for index, (count, hll) in self.buckets.items()},
+        })
+
+    @classmethod
+    def loads(cls, data: str, version: Optional[int] = None) -> "_Group":
+        data = json.loads(data)
+        group = cls(data["signature"], version)
+        group.last_fired = data.get("last_fired")
+        group.buckets = {
+            int(index): [count, HyperLogLog.loads(hll) if hll else None]
+            for index, (count, hll) in data["buckets"].items()
+        }
+        return group
+
+
+class WindowAggregator:
+    def __init__(self, max_groups: int = WINDOW_MAX_GROUPS):
+        self.max_groups = max_groups
+        self._groups: Dict[int, "OrderedDict[str, _Group]"] = {}
+        self._dirty: Set[Tuple[int, str]] = set()
+        # (rule id, group key) -> version of the checkpoint to delete
+        self._evicted: Dict[Tuple[int, str], Optional[int]] = {}
+        self._lock = asyncio.Lock()
+        # One checkpoint at a time, so two cannot write the same group version
+        self._checkpoint_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load_rule(self, session: AsyncSession, rule_id: int):
+        result = await session.execute(
+            select(_states.c.group_key, _states.c.state, _states.c.version).where(_states.c.rule_id == rule_id)
+        )
+        groups = OrderedDict()
+        for group_key, state, version in result:
+            try:
+                groups[group_key] = _Group.loads(state, version)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Discarding unreadable window state of rule %s: %s", rule_id, e)
+        self._groups[rule_id] = groups
+
+    def _group(self, rule_id: int, key: str, spec: WindowSpec) -> _Group:
+        groups = self._groups[rule_id]
+        group = groups.get(key)
+        if group is None or group.signature != spec.signature:
+            group = groups[key] = _Group(spec.signature, group.version if group else None)
+        groups.move_to_end(key)
+        while len(groups) > self.max_groups:
+            evicted, evicted_group = groups.popitem(last=False)
+            self._dirty.discard((rule_id, evicted))
+            if evicted_group.version is not None:
+                self._evicted[(rule_id, evicted)] = evicted_group.version
+        return group
+
+    async def observe(
+        self,
+        session: AsyncSession,
+        rule: Rule,
+        ticket: Dict[str, Any],
+        payload: Dict[str, Any],
+        at: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Add one event to a window_aggregate rule's windows
+
+        Args:
+            session: Database session (to load checkpoints)
+            rule: The window_aggregate rule
+            ticket: Normalized ticket fields of the event
+            payload: Webhook payload
+            at: Event time (epoch seconds, defaults to now)
+
+        Returns:
+            One {"group": ..., "value": ...} per window that reached its threshold
+        """
+        spec = WindowSpec(json.loads(rule.trigger_data))
+        if not spec.matches(ticket, payload):
+            return []
+        at = at or time.time()
+
+        if spec.group_by:
+            keys = field_values(spec.group_by, ticket, payload)
+        else:
+            keys = ["*"]
+        distinct = field_values(spec.field, ticket, payload) if spec.aggregate == "distinct_count" else []
+
+        fired = []
+        async with self._lock:
+            if rule.id not in self._groups:
+                await self._load_rule(session, rule.id)
+            current = int(at // spec.bucket_seconds)
+            for key in keys:
+                group = self._group(rule.id, key, spec)
+                group.expire(current, spec.bucket_count)
+                bucket = group.buckets.setdefault(current, [0, None])
+                bucket[0] += 1
+                if distinct:
+                    if bucket[1] is None:
+                        bucket[1] = HyperLogLog()
+                    for value in distinct:
+                        bucket[1].add(value)
+
+                if spec.aggregate == "distinct_count":
+                    value = HyperLogLog.union(hll for _, hll in group.buckets.values() if hll).count()
+                else:
+                    value = sum(count for count, _ in group.buckets.values())
+                    if spec.aggregate == "rate":
+                        value = round(value * 60 / spec.window_seconds, 2)
+
+                if value >= spec.threshold and self._may_fire(group, spec, at, current):
+                    group.last_fired = at
+                    fired.append({"group": key, "value": value})
+                self._dirty.add((rule.id, key))
+        return fired
+
+    @staticmethod
+    def _may_fire(group: _Group, spec: WindowSpec, at: float, current: int) -> bool:
+        if group.last_fired is None:
+            return True
+        if spec.mode == "tumbling":
+            return int(group.last_fired // spec.bucket_seconds) != current
+        return at - group.last_fired >= spec.cooldown_seconds
+
+    async def checkpoint(self, release: Optional[Callable[[int], bool]] = None):
+        """
+        Write changed window state to the database
+
+        Args:
+            release: Rules to forget once checkpointed (see release_rules)
+        """
+        async with self._checkpoint_lock:
+            await self._checkpoint(release)
+
+    async def _checkpoint(self, release: Optional[Callable[[int], bool]]):
+        async with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            evicted, self._evicted = self._evicted, {}
+            # rule id -> [(group key, group, state)]
+            states: Dict[int, List[Tuple[str, _Group, str]]] = {}
+            for rule_id, key in dirty:
+                group = self._groups.get(rule_id, {}).get(key)
+                if group is not None:
+                    states.setdefault(rule_id, []).append((key, group, group.dumps()))
+            released = [rule_id for rule_id in self._groups if release and release(rule_id)]
+            for rule_id in released:
+                del self._groups[rule_id]
+        if released:
+            logger.info("Released window state of %s rules", len(released))
+
+        for rule_id in set(states) | {rule_id for rule_id, _ in evicted}:
+            rule_evicted = {key: version for (evicted_rule, key), version in evicted.items() if evicted_rule == rule_id}
+            try:
+                async with async_session() as session:
+                    written = await self._write_rule(session, rule_id, states.get(rule_id, []), rule_evicted)
+            except Exception as e:
+                logger.error("Failed to checkpoint window state of rule %s: %s", rule_id, e, extra={"rule_id": rule_id})
+                if rule_id in released:
+                    continue
+                async with self._lock:
+                    self._dirty |= {(rule_id, key) for key, _, _ in states.get(rule_id, [])}
+                    self._evicted.update({(rule_id, key): version for key, version in rule_evicted.items()})
+                continue
+
+            async with self._lock:
+                if written:
+                    for key, group, _ in states.get(rule_id, []):
+                        group.version = (group.version or 0) + 1
+                elif rule_id not in released:
+                    # Another process wrote newer state; reload it on the rule's next event
+                    logger.warning(
+                        "Window state of rule %s was changed by another process, reloading it", rule_id,
+                        extra={"rule_id": rule_id}
+                    )
+                    self._groups.pop(rule_id, None)
+                    self._dirty = {(dirty_rule, key) for dirty_rule, key in self._dirty if dirty_rule != rule_id}
+
+    @staticmethod
+    async def _write_rule(
+        session: AsyncSession,
+        rule_id: int,
+        states: List[Tuple[str, _Group, str]],
+        evicted: Dict[str, Optional[int]]
+    ) -> bool:
+        """Checkpoint one rule's changed groups in one transaction; False if a stored version moved on"""
+        for key, version in evicted.items():
+            await session.execute(
+                delete(_states).where(_states.c.rule_id == rule_id, _states.c.group_key == key, _states.c.version == version)
+            )
+        try:
+            for key, group, state in states:
+                if group.version is None:
+                    session.add(WindowState(rule_id=rule_id, group_key=key, state=state, version=1))
+                    await session.flush()
+                    continue
+                result = await session.execute(
+                    update(_states)
+                    .where(_states.c.rule_id == rule_id, _states.c.group_key == key, _states.c.version == group.version)
+                    .values(state=state, version=group.version + 1, updated_at=datetime.utcnow())
+                )
+                if result.rowcount != 1:
+                    await session.rollback()
+                    return False
+        except IntegrityError:
+            # Another process stored the group first
+            await session.rollback()
+            return False
+        await session.commit()
+        return True
+
+    async def release_rules(self, owned: Callable[[int], bool]):
+        """Checkpoint and forget the rules this process no longer owns (owned(rule_id) is False)"""
+        await self.checkpoint(release=lambda rule_id: not owned(rule_id))
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(WINDOW_CHECKPOINT_INTERVAL)
+            await self.checkpoint()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._checkpoint_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.checkpoint()
+
+
+window_aggregator = WindowAggregator()
+
+
+def start_window_checkpoints():
+    window_aggregator.start()
+
+
+async def stop_window_checkpoints():
+    await window_aggregator.stop()
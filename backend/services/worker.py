@@ -0,0 +1,242 @@
+"""
+Job worker: claims queued jobs from the database and runs them
+
+Any number of workers (processes, containers, nodes) can run against the same
+database. Each one claims batches of due jobs with FOR UPDATE SKIP LOCKED,
+runs up to WORKER_CONCURRENCY of them at a time and extends their leases with
+a heartbeat. If a worker dies, its leases expire and other workers pick the
+jobs up again. Failed jobs are retried with exponential backoff.
+
+Jobs are spread over EVENT_PARTITIONS partitions by a hash of their ordering
+key (platform and ticket id for events). Workers register themselves in the
+event_worker table and divide the partitions among the live workers with
+rendezvous hashing, so when a worker joins or leaves only the partitions it
+gains or loses move. Jobs of one ticket are therefore claimed by one worker
+and run one at a time in order, while different tickets run in parallel.
+Window state of window_aggregate rules whose partition moved away is
+checkpointed and dropped on rebalance.
+
+Environment variables:
+    WORKER_CONCURRENCY: Jobs run concurrently per worker process (default 10)
+    WORKER_BATCH_SIZE: Maximum jobs claimed per query (default 10)
+    WORKER_POLL_INTERVAL: Seconds between claims when the queue is empty (default 1.0)
+    WORKER_LEASE_SECONDS: Lease length; a job is re-claimable this long after the last heartbeat (default 60)
+    WORKER_HEARTBEAT_INTERVAL: Seconds between lease extensions (default a third of the lease)
+    EVENT_JOB_RETRY_DELAY: Base retry delay in seconds, doubled per attempt (default 10)
+    EVENT_JOB_RETENTION_HOURS: Finished jobs are deleted after this many hours (default 72)
+    EVENT_PARTITIONS: Number of partitions (default 64, same value on web and workers)
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import async_session
+from models.event_job import EventJob
+from repositories.event_job_repository import EVENT_PARTITIONS, EventJobRepository, partition_for
+from services.event_pipeline import run_debounce_job, run_event_job, run_window_job
+from services.window_aggregator import window_aggregator, window_ordering_key
+from utils.log import get_logger, new_correlation_id
+
+logger = get_logger("worker")
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "10"))
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "10"))
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+WORKER_LEASE_SECONDS = float(os.getenv("WORKER_LEASE_SECONDS", "60"))
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", str(WORKER_LEASE_SECONDS / 3)))
+EVENT_JOB_RETRY_DELAY = float(os.getenv("EVENT_JOB_RETRY_DELAY", "10"))
+EVENT_JOB_RETENTION_HOURS = float(os.getenv("EVENT_JOB_RETENTION_HOURS", "72"))
+
+# Longest retry delay, whatever the attempt number
+MAX_RETRY_DELAY = 900
+# Seconds between sweeps for abandoned and expired jobs
+HOUSEKEEPING_INTERVAL = 60
+
+JobHandler = Callable[[EventJob, AsyncSession], Awaitable[Any]]
+
+# Job kind -> handler
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    "event": run_event_job,
+    "window": run_window_job,
+    "debounce": run_debounce_job,
+}
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt, after `attempts` failed ones"""
+    return min(EVENT_JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY)
+
+
+def assign_partitions(worker_id: str, workers: Sequence[str], partitions: int = EVENT_PARTITIONS) -> List[int]:
+    """
+    Partitions owned by `worker_id` among `workers` (rendezvous hashing)
+
+    Each partition goes to the worker with the highest hash of (worker, partition),
+    so every worker computes the same assignment from the same worker list.
+    """
+    def score(worker: str, partition: int) -> bytes:
+        return hashlib.md5(f"{worker}:{partition}".encode()).digest()
+
+    if not workers:
+        return []
+    return [
+        partition for partition in range(partitions)
+        if max(workers, key=lambda worker: score(worker, partition)) == worker_id
+    ]
+
+
+class Worker:
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: int = WORKER_CONCURRENCY,
+        batch_size: int = WORKER_BATCH_SIZE,
+        poll_interval: float = WORKER_POLL_INTERVAL,
+        lease_seconds: float = WORKER_LEASE_SECONDS,
+        heartbeat_interval: float = WORKER_HEARTBEAT_INTERVAL
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        self._partitions: List[int] = []
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+
+    def stop(self):
+        """Stop claiming new jobs; run() returns once in-flight jobs finish"""
+        self._stopping.set()
+        self._wake.set()
+
+    async def run(self):
+        logger.info("Worker %s started (concurrency %s)", self.worker_id, self.concurrency)
+        await self._rebalance()
+        background = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._housekeeping_loop()),
+        ]
+        try:
+            while not self._stopping.is_set():
+                claimed = 0
+                free = self.concurrency - len(self._in_flight)
+                if free > 0:
+                    try:
+                        claimed = await self._claim(min(free, self.batch_size))
+                    except Exception as e:
+                        logger.error("Failed to claim jobs: %s", e)
+
+                # Claim again right away while there is work and room for it
+                if claimed and len(self._in_flight) < self.concurrency:
+                    continue
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            if self._in_flight:
+                logger.info("Worker %s waiting for %s in-flight jobs", self.worker_id, len(self._in_flight))
+                await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            try:
+                async with async_session() as session:
+                    await EventJobRepository(session).unregister_worker(self.worker_id)
+            except Exception as e:
+                logger.error("Failed to unregister worker: %s", e)
+            logger.info("Worker %s stopped", self.worker_id)
+
+    async def _claim(self, limit: int) -> int:
+        async with async_session() as session:
+            jobs = await EventJobRepository(session).claim(
+                self.worker_id, limit, self.lease_seconds, partitions=self._partitions
+            )
+        for job in jobs:
+            self._in_flight[job.id] = asyncio.create_task(self._execute(job))
+        return len(jobs)
+
+    async def _execute(self, job: EventJob):
+        new_correlation_id(job.event_id)
+        handler = JOB_HANDLERS.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job.kind}'")
+            async with async_session() as session:
+                await handler(job, session)
+            async with async_session() as session:
+                if not await EventJobRepository(session).complete(job.id, self.worker_id):
+                    logger.warning("Lost the lease on job %s before it completed", job.id, extra={"job_id": job.id})
+        except Exception as e:
+            logger.exception("Job %s failed (attempt %s/%s): %s", job.id, job.attempts, job.max_attempts, e,
+                             extra={"job_id": job.id})
+            retry_at = None
+            if handler is not None:
+                retry_at = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+            try:
+                async with async_session() as session:
+                    await EventJobRepository(session).fail(job, self.worker_id, str(e), retry_at)
+            except Exception as e:
+                # The lease expires and the job is claimed again
+                logger.error("Failed to record failure of job %s: %s", job.id, e, extra={"job_id": job.id})
+        finally:
+            self._in_flight.pop(job.id, None)
+            self._wake.set()
+
+    async def _rebalance(self):
+        """Refresh this worker's registry entry and recompute its partitions"""
+        async with async_session() as session:
+            repository = EventJobRepository(session)
+            await repository.register_worker(self.worker_id)
+            workers = await repository.live_workers(self.lease_seconds)
+        if self.worker_id not in workers:
+            workers.append(self.worker_id)
+        partitions = assign_partitions(self.worker_id, workers)
+        if partitions != self._partitions:
+            logger.info(
+                "Worker %s owns %s of %s partitions (%s live workers)",
+                self.worker_id, len(partitions), EVENT_PARTITIONS, len(workers)
+            )
+            self._partitions = partitions
+            owned = set(partitions)
+            await window_aggregator.release_rules(
+                lambda rule_id: partition_for(window_ordering_key(rule_id)) in owned
+            )
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._rebalance()
+                if self._in_flight:
+                    async with async_session() as session:
+                        await EventJobRepository(session).heartbeat(
+                            self.worker_id, list(self._in_flight), self.lease_seconds
+                        )
+            except Exception as e:
+                logger.error("Heartbeat failed: %s", e)
+
+    async def _housekeeping_loop(self):
+        while True:
+            try:
+                async with async_session() as session:
+                    repository = EventJobRepository(session)
+                    abandoned = await repository.fail_abandoned()
+                    if abandoned:
+                        logger.warning("Marked %s abandoned jobs failed", abandoned)
+                    await repository.purge_finished(
+                        datetime.utcnow() - timedelta(hours=EVENT_JOB_RETENTION_HOURS)
+                    )
+            except Exception as e:
+                logger.error("Job housekeeping failed: %s", e)
+            await asyncio.sleep(HOUSEKEEPING_INTERVAL)
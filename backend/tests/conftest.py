@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules are imported from the backend directory, as the app runs from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Services import db, which needs a URL; the tests do not touch the database
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
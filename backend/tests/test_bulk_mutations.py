@@ -0,0 +1,54 @@
+import asyncio
+
+from services.bulk_mutations import BULK_LIMIT, BulkMutationCoalescer, _chunks, _Mutation
+from services.idempotency import current_key
+
+
+def mutations(ticket_ids):
+    return [_Mutation(ticket_id, {}, None) for ticket_id in ticket_ids]
+
+
+def ids(chunks):
+    return [[mutation.ticket_id for mutation in chunk] for chunk in chunks]
+
+
+def test_distinct_tickets_share_a_chunk():
+    assert ids(_chunks(mutations([1, 2, 3]))) == [[1, 2, 3]]
+
+
+def test_repeated_ticket_starts_a_new_chunk():
+    assert ids(_chunks(mutations([1, 2, 1, 3, "2"]))) == [[1, 2], [1, 3, "2"]]
+
+
+def test_creations_without_ticket_id_are_not_split():
+    assert ids(_chunks(mutations([None, None, 1]))) == [[None, None, 1]]
+
+
+def test_chunks_are_bulk_sized():
+    chunks = _chunks(mutations(range(BULK_LIMIT * 2 + 5)))
+    assert [len(chunk) for chunk in chunks] == [BULK_LIMIT, BULK_LIMIT, 5]
+    assert [m.ticket_id for chunk in chunks for m in chunk] == list(range(BULK_LIMIT * 2 + 5))
+
+
+def test_keyed_creations_are_sent_on_their_own(monkeypatch):
+    sent = []
+
+    def single(platform, action_type, config, ticket_id, data, idempotency_key=None):
+        sent.append((data["subject"], idempotency_key))
+        return {"success": True, "data": {"ticket": {"id": len(sent)}}}
+
+    async def create(subject, key):
+        token = current_key.set(key)
+        try:
+            return await coalescer.submit("zendesk", 1, {}, "create_ticket", {"subject": subject})
+        finally:
+            current_key.reset(token)
+
+    async def main():
+        return await asyncio.gather(create("a", "key-a"), create("b", "key-b"))
+
+    coalescer = BulkMutationCoalescer(window=60)
+    monkeypatch.setattr(BulkMutationCoalescer, "_single", staticmethod(single))
+    results = asyncio.run(main())
+    assert [result["success"] for result in results] == [True, True]
+    assert sorted(sent) == [("a", "key-a"), ("b", "key-b")]
@@ -0,0 +1,40 @@
+from collections import deque
+
+from modules.discord.action import MAX_CONTENT_LENGTH
+from services.discord_delivery import _merge, _Message
+
+
+def message(merge=True, **payload):
+    return _Message(payload, merge, None)
+
+
+def contents(messages):
+    return [m.payload.get("content") for m in messages]
+
+
+def test_plain_messages_of_one_sender_are_merged():
+    queue = deque([message(content="a"), message(content="b"), message(content="c")])
+    assert contents(_merge(queue)) == ["a", "b", "c"]
+    assert not queue
+
+
+def test_merging_stops_at_another_sender():
+    queue = deque([message(content="a"), message(content="b", username="bot"), message(content="c")])
+    assert contents(_merge(queue)) == ["a"]
+    assert contents(queue) == ["b", "c"]
+
+
+def test_embeds_and_unmergeable_messages_are_sent_alone():
+    queue = deque([message(content="a", embeds=[{}]), message(content="b")])
+    assert contents(_merge(queue)) == ["a"]
+    queue = deque([message(content="a"), message(merge=False, content="b")])
+    assert contents(_merge(queue)) == ["a"]
+
+
+def test_merged_content_fits_discord_limit():
+    half = "x" * (MAX_CONTENT_LENGTH // 2)
+    queue = deque([message(content=half), message(content=half), message(content="y")])
+    taken = _merge(queue)
+    assert contents(taken) == [half]
+    assert len("\n".join(contents(taken))) <= MAX_CONTENT_LENGTH
+    assert contents(queue) == [half, "y"]
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from utils.json_stream import iter_json_items
+
+
+def parse(*chunks, max_item_bytes=1024 * 1024):
+    async def stream():
+        for chunk in chunks:
+            yield chunk.encode() if isinstance(chunk, str) else chunk
+
+    async def collect():
+        return [item async for item in iter_json_items(stream(), max_item_bytes)]
+
+    return asyncio.run(collect())
+
+
+def test_array():
+    assert parse('[{"a": 1}, [2], "x", null, 3.5]') == [{"a": 1}, [2], "x", None, 3.5]
+
+
+def test_empty_array():
+    assert parse("  [ ]  ") == []
+
+
+def test_ndjson():
+    assert parse('{"a": 1}\n{"b": 2}\n') == [{"a": 1}, {"b": 2}]
+
+
+def test_items_split_across_chunks():
+    assert parse('[{"na', 'me": "r', 'ule"}, 1', '2, 3]') == [{"name": "rule"}, 12, 3]
+
+
+def test_number_at_chunk_end_in_ndjson():
+    assert parse("1", "2\n3") == [12, 3]
+
+
+def test_multibyte_character_split_across_chunks():
+    data = '["é"]'.encode()
+    assert parse(data[:3], data[3:]) == ["é"]
+
+
+@pytest.mark.parametrize("body", [
+    "[1 2]",
+    '[{"a": 1} {"b": 2}]',
+    "[1,,2]",
+    "[,1]",
+    "[1,]",
+    '{"a": 1}{"b": 2}',
+])
+def test_missing_or_extra_separators_are_rejected(body):
+    with pytest.raises(ValueError):
+        parse(body)
+
+
+@pytest.mark.parametrize("body", ["[1, 2", '[{"a": 1}', "[1] 2", '{"a": '])
+def test_incomplete_or_trailing_data_is_rejected(body):
+    with pytest.raises(ValueError):
+        parse(body)
+
+
+def test_oversized_item_is_rejected():
+    with pytest.raises(ValueError, match="larger than"):
+        parse('["' + "x" * 50, "x" * 50, '"]', max_item_bytes=64)
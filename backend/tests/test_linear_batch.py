@@ -0,0 +1,43 @@
+from modules.linear import action
+
+
+def respond(*responses):
+    calls = []
+
+    def graphql(token, query, variables=None):
+        calls.append(sorted(variables))
+        return responses[len(calls) - 1]
+    return graphql, calls
+
+
+def created(alias):
+    return {alias: {"success": True, "issue": {"id": alias, "identifier": "ENG-1", "url": None}}}
+
+
+def test_input_error_retries_each_issue(monkeypatch):
+    graphql, calls = respond(
+        {"errors": [{"message": 'Variable "$i1" got invalid value', "extensions": {"code": "BAD_USER_INPUT"}}]},
+        {"data": created("i0")},
+        {"errors": [{"message": 'Variable "$i0" got invalid value', "extensions": {"code": "BAD_USER_INPUT"}}]},
+    )
+    monkeypatch.setattr(action, "graphql", graphql)
+    results = action.create_issues("token", [{"title": "a"}, {"title": "b"}])
+    assert [result["status"] for result in results] == ["success", "error"]
+    assert calls == [["i0", "i1"], ["i0"], ["i0"]]
+
+
+def test_rate_limit_is_not_retried(monkeypatch):
+    graphql, calls = respond({"errors": [{"message": "Rate limit exceeded", "extensions": {"code": "RATELIMITED"}}]})
+    monkeypatch.setattr(action, "graphql", graphql)
+    results = action.create_issues("token", [{"title": "a"}, {"title": "b"}, {"title": "c"}])
+    assert [result["status"] for result in results] == ["error"] * 3
+    assert all("Rate limit exceeded" in result["message"] for result in results)
+    assert len(calls) == 1
+
+
+def test_transport_failure_is_not_retried(monkeypatch):
+    graphql, calls = respond({"errors": [{"message": "HTTP 503"}]})
+    monkeypatch.setattr(action, "graphql", graphql)
+    results = action.create_issues("token", [{"title": "a"}, {"title": "b"}])
+    assert [result["status"] for result in results] == ["error", "error"]
+    assert len(calls) == 1
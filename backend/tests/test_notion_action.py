@@ -0,0 +1,53 @@
+import pytest
+
+from modules.notion.action import MAX_TEXT_LENGTH, coerce_property
+
+
+def test_text_is_split_into_rich_text_objects():
+    value = coerce_property("rich_text", "x" * (MAX_TEXT_LENGTH + 1))
+    assert [len(part["text"]["content"]) for part in value["rich_text"]] == [MAX_TEXT_LENGTH, 1]
+    assert coerce_property("title", None) == {"title": [{"text": {"content": ""}}]}
+
+
+@pytest.mark.parametrize("value, expected", [("3", 3), ("2.5", 2.5), (7, 7), ("", None)])
+def test_number(value, expected):
+    assert coerce_property("number", value) == {"number": expected}
+
+
+@pytest.mark.parametrize("value", ["abc", True])
+def test_invalid_number(value):
+    with pytest.raises(ValueError):
+        coerce_property("number", value)
+
+
+@pytest.mark.parametrize("value, expected", [(True, True), ("yes", True), ("0", False), ("", False)])
+def test_checkbox(value, expected):
+    assert coerce_property("checkbox", value) == {"checkbox": expected}
+
+
+def test_select_and_multi_select():
+    assert coerce_property("select", "High") == {"select": {"name": "High"}}
+    assert coerce_property("select", "") == {"select": None}
+    with pytest.raises(ValueError):
+        coerce_property("select", "a,b")
+    assert coerce_property("multi_select", "vip, billing") == {"multi_select": [{"name": "vip"}, {"name": "billing"}]}
+    assert coerce_property("multi_select", ["vip"]) == {"multi_select": [{"name": "vip"}]}
+
+
+def test_status_must_exist():
+    assert coerce_property("status", "Done", ["Todo", "Done"]) == {"status": {"name": "Done"}}
+    with pytest.raises(ValueError, match="unknown status"):
+        coerce_property("status", "Closed", ["Todo", "Done"])
+
+
+def test_date():
+    assert coerce_property("date", "2026-10-18T09:00:00Z") == {"date": {"start": "2026-10-18T09:00:00Z"}}
+    with pytest.raises(ValueError):
+        coerce_property("date", "yesterday")
+
+
+def test_read_only_and_unknown_types():
+    with pytest.raises(ValueError, match="read-only"):
+        coerce_property("formula", 1)
+    with pytest.raises(ValueError, match="unsupported"):
+        coerce_property("hologram", 1)
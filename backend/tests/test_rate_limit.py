@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from utils.rate_limit import RateLimiter
+
+
+def test_burst_is_immediate_then_rate_limited():
+    async def run():
+        limiter = RateLimiter()
+        started = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire("key", rate=20, burst=3)
+        burst = time.monotonic() - started
+        await limiter.acquire("key", rate=20, burst=3)
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.03
+    assert total >= 0.04
+
+
+def test_keys_have_separate_buckets():
+    async def run():
+        limiter = RateLimiter()
+        started = time.monotonic()
+        await limiter.acquire("a", rate=1)
+        await limiter.acquire("b", rate=1)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.03
+
+
+def test_pause_delays_the_next_token():
+    async def run():
+        limiter = RateLimiter()
+        limiter.pause("key", 0.1, rate=100)
+        started = time.monotonic()
+        await limiter.acquire("key", rate=100)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
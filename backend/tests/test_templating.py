@@ -0,0 +1,37 @@
+from utils.templating import render, resolve
+
+CONTEXT = {
+    "ticket": {"id": 42, "tags": ["vip", "billing"], "subject": "Refund"},
+    "requester": {"email": "jane@example.com"},
+    "organization": None,
+}
+
+
+def test_resolve_paths():
+    assert resolve("ticket.id", CONTEXT) == 42
+    assert resolve("ticket.tags.1", CONTEXT) == "billing"
+    assert resolve("ticket.tags.5", CONTEXT) is None
+    assert resolve("organization.name", CONTEXT) is None
+
+
+def test_placeholders_in_text():
+    assert render("Ticket {{ticket.id}} from {{ requester.email }}", CONTEXT) == "Ticket 42 from jane@example.com"
+
+
+def test_missing_value_renders_empty():
+    assert render("Org: {{organization.name}}", CONTEXT) == "Org: "
+    assert render("{{organization.name}}", CONTEXT) == ""
+
+
+def test_whole_placeholder_keeps_type():
+    assert render("{{ticket.tags}}", CONTEXT) == ["vip", "billing"]
+    assert render("{{ticket.id}}", CONTEXT) == 42
+
+
+def test_structures_in_text_are_json():
+    assert render("Tags: {{ticket.tags}}", CONTEXT) == 'Tags: ["vip", "billing"]'
+
+
+def test_nested_values():
+    action = {"title": "{{ticket.subject}}", "labels": ["{{ticket.tags.0}}", "static"], "priority": 2}
+    assert render(action, CONTEXT) == {"title": "Refund", "labels": ["vip", "static"], "priority": 2}
@@ -0,0 +1,35 @@
+"""
+Shared HTTP connection pool for outbound API calls
+
+A requests.Session keeps TLS connections to each API host open between
+calls; it is safe to use from the worker threads asyncio.to_thread runs
+blocking calls in.
+
+Environment variables:
+    HTTP_POOL_SIZE: Open connections kept per host (default 50)
+"""
+import os
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "50"))
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """The process-wide pooled session"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=20, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
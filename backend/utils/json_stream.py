@@ -0,0 +1,110 @@
+"""
+Incremental parsing of large JSON request bodies
+"""
+import codecs
+import json
+from typing import Any, AsyncIterator
+
+# Largest single item (e.g. one rule) accepted while waiting for it to complete
+MAX_ITEM_BYTES = 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+
+async def iter_json_items(chunks: AsyncIterator[bytes], max_item_bytes: int = MAX_ITEM_BYTES) -> AsyncIterator[Any]:
+    """
+    Yield the items of a streamed JSON array or NDJSON body one at a time
+
+    Only the item currently being parsed is buffered, so memory stays bounded
+    regardless of the body size. The format is detected from the first
+    non-whitespace character: "[" means a JSON array, anything else is read
+    as newline (or whitespace) separated JSON documents.
+
+    Raises:
+        ValueError: If the body is not valid JSON or an item exceeds max_item_bytes
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    decoder = json.JSONDecoder()
+    buffer = ""
+    is_array = None
+    finished = False
+    eof = False
+    # Whether the last thing read was an item (arrays then need "," or "]", NDJSON whitespace)
+    after_item = False
+    # Array: the last separator was a comma (a value must follow)
+    after_comma = False
+    chunks = chunks.__aiter__()
+
+    while not finished:
+        if not eof:
+            try:
+                chunk = await chunks.__anext__()
+                buffer += text_decoder.decode(chunk)
+            except StopAsyncIteration:
+                buffer += text_decoder.decode(b"", final=True)
+                eof = True
+
+        pos = 0
+        while True:
+            start = pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos > start and not is_array:
+                after_item = False  # Whitespace separates NDJSON documents
+            if pos >= len(buffer):
+                break
+
+            if is_array is None:
+                is_array = buffer[pos] == "["
+                if is_array:
+                    pos += 1
+                continue
+
+            if is_array and buffer[pos] == "]":
+                if after_comma:
+                    raise ValueError("Invalid JSON: trailing comma in array")
+                finished = True
+                pos += 1
+                break
+            if is_array and buffer[pos] == ",":
+                if not after_item:
+                    raise ValueError("Invalid JSON: unexpected ',' in array")
+                after_item, after_comma = False, True
+                pos += 1
+                continue
+            if after_item:
+                raise ValueError(
+                    "Invalid JSON: expected ',' or ']' after array item" if is_array
+                    else "Invalid JSON: expected whitespace between documents"
+                )
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"Invalid JSON: {e.msg}")
+                break  # Item is incomplete; wait for more data
+            if end == len(buffer) and not eof:
+                break  # A number may continue in the next chunk; wait for more data
+            pos = end
+            after_item, after_comma = True, False
+            yield item
+
+        buffer = buffer[pos:]
+        if len(buffer) > max_item_bytes:
+            raise ValueError(f"JSON item larger than {max_item_bytes} bytes")
+
+        if eof:
+            if is_array and not finished:
+                raise ValueError("Invalid JSON: unterminated array")
+            if buffer.strip():
+                raise ValueError("Invalid JSON: trailing data")
+            break
+
+    # Make sure nothing but whitespace follows the closing bracket
+    if buffer.strip():
+        raise ValueError("Invalid JSON: trailing data after array")
+    if not eof:
+        async for chunk in chunks:
+            if text_decoder.decode(chunk).strip():
+                raise ValueError("Invalid JSON: trailing data after array")
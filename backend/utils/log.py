@@ -0,0 +1,226 @@
+"""
+Structured logging for the backend
+
+Log records are handed to a bounded in-memory queue and formatted/written by a
+background listener thread, so the event loop never blocks on stdout.
+
+Environment variables:
+    LOG_LEVEL: Default level for every logger (default INFO)
+    LOG_LEVELS: Per-component overrides, e.g. "webhooks=DEBUG,rule_engine=WARNING".
+        Plain names refer to components ("supportops.<name>"), dotted names
+        such as "sqlalchemy.engine" are used as-is.
+    LOG_FORMAT: "json" (default) or "text"
+    LOG_MAX_PAYLOAD_CHARS: Maximum characters of a payload written to the log
+    LOG_PAYLOAD_SAMPLE_RATE: Fraction (0.0-1.0) of payload log lines that are kept
+    LOG_QUEUE_SIZE: Maximum number of records waiting to be written
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_MAX_PAYLOAD_CHARS = int(os.getenv("LOG_MAX_PAYLOAD_CHARS", "2000"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+COMPONENT_PREFIX = "supportops"
+
+# Correlation id shared by every log line written while handling one event
+correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "correlation_id", default=None
+)
+
+# Attributes present on every LogRecord; anything else was passed via `extra`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "correlation_id"
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def new_correlation_id(value: Optional[str] = None) -> str:
+    """Set (or generate) the correlation id for the current context and return it"""
+    value = value or uuid.uuid4().hex
+    correlation_id.set(value)
+    return value
+
+
+def get_correlation_id() -> Optional[str]:
+    """Get the correlation id of the current context"""
+    return correlation_id.get()
+
+
+class Truncated:
+    """
+    Lazy, truncated representation of a payload
+
+    Serialization only happens when the record is formatted, which is done by
+    the listener thread and skipped entirely when the level is disabled.
+    """
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: int = None):
+        self.value = value
+        self.max_chars = max_chars or LOG_MAX_PAYLOAD_CHARS
+
+    def __str__(self) -> str:
+        if isinstance(self.value, str):
+            text = self.value
+        else:
+            try:
+                text = json.dumps(self.value, default=str, separators=(",", ":"))
+            except Exception:
+                text = repr(self.value)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}...<{len(text) - self.max_chars} more chars>"
+        return text
+
+    __repr__ = __str__
+
+
+def truncate(value: Any, max_chars: int = None) -> Truncated:
+    """Wrap a payload so it is serialized lazily and cut to LOG_MAX_PAYLOAD_CHARS"""
+    return Truncated(value, max_chars)
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, level: int = logging.DEBUG, **extra):
+    """
+    Log a (potentially large) payload, sampled by LOG_PAYLOAD_SAMPLE_RATE
+
+    Args:
+        logger: Logger to write to
+        message: Message prefix; the payload is appended
+        payload: Any JSON-serializable value
+        level: Log level (default DEBUG)
+        extra: Structured fields added to the record
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1.0 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.log(level, "%s: %s", message, truncate(payload), extra=extra)
+
+
+def get_logger(component: str) -> logging.Logger:
+    """Get the logger for a backend component (e.g. "webhooks", "rule_engine")"""
+    return logging.getLogger(f"{COMPONENT_PREFIX}.{component}")
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks and defers formatting to the listener
+
+    The stock QueueHandler formats the message in the calling thread; here
+    only the correlation id is captured (it lives in the caller's context)
+    and records are dropped, not waited on, when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.correlation_id = correlation_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        cid = getattr(record, "correlation_id", None)
+        if cid:
+            entry["correlation_id"] = cid
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable format for local development"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = None
+        return super().format(record)
+
+
+def _apply_component_levels(spec: str):
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = (part.strip() for part in item.split("=", 1))
+        if not name:
+            continue
+        logger_name = name if "." in name else f"{COMPONENT_PREFIX}.{name}"
+        logging.getLogger(logger_name).setLevel(level.upper())
+
+
+def configure_logging():
+    """
+    Install the queue-backed handler on the root logger and start the listener
+
+    Safe to call more than once; only the first call has an effect.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(LOG_LEVEL)
+    _apply_component_levels(LOG_LEVELS)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    if _queue_handler is not None and _queue_handler.dropped:
+        sys.stderr.write(f"logging: dropped {_queue_handler.dropped} records (queue full)\n")
@@ -0,0 +1,40 @@
+"""
+Async token-bucket rate limiting
+"""
+import asyncio
+import time
+from typing import Dict, Hashable, List
+
+
+class RateLimiter:
+    """
+    One token bucket per key; each bucket refills at `rate` tokens per second
+    up to `burst`. acquire() waits until a token is available.
+    """
+
+    def __init__(self):
+        # key -> [tokens, last refill time]
+        self._buckets: Dict[Hashable, List[float]] = {}
+
+    def _refill(self, key: Hashable, rate: float, burst: float) -> List[float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket
+
+    async def acquire(self, key: Hashable, rate: float, burst: float = 1):
+        while True:
+            bucket = self._refill(key, rate, burst)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return
+            await asyncio.sleep((1 - bucket[0]) / rate)
+
+    def pause(self, key: Hashable, seconds: float, rate: float):
+        """Empty a bucket so it has no token for `seconds` (e.g. a Retry-After)"""
+        bucket = self._refill(key, rate, 1)
+        bucket[0] = min(bucket[0], 0) - seconds * rate
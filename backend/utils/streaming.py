@@ -0,0 +1,132 @@
+"""
+Bounded-memory request bodies for forwarding downloads to upload endpoints
+
+A download (requests response opened with stream=True) is read in chunks of
+STREAM_CHUNK_SIZE bytes and handed to the upload request as a file-like
+body, so only a chunk or two of a transfer is in memory at any time. Bodies
+have a known length, as upload endpoints want a Content-Length; a download
+of unknown size is first spooled to a temporary file (in memory only up to
+STREAM_SPOOL_SIZE bytes).
+
+Environment variables:
+    STREAM_CHUNK_SIZE: Bytes read from a download at a time (default 65536)
+    STREAM_SPOOL_SIZE: Bytes of an unsized download kept in memory before spooling to disk (default 1048576)
+"""
+import os
+import tempfile
+import uuid
+from typing import IO, Iterator, List, Optional, Union
+
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "65536"))
+STREAM_SPOOL_SIZE = int(os.getenv("STREAM_SPOOL_SIZE", "1048576"))
+
+
+class StreamBody:
+    """
+    File-like request body over an iterator of byte chunks
+
+    requests sends a body with read() and __len__ in blocks with a
+    Content-Length header instead of loading it.
+    """
+
+    def __init__(self, chunks: Iterator[bytes], length: int):
+        self._chunks = chunks
+        self._buffer = b""
+        self.length = length
+        # Bytes read so far; a source that yields more than `length` is cut off
+        self.sent = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, size: int = -1) -> bytes:
+        while (size < 0 or len(self._buffer) < size) and self.sent + len(self._buffer) < self.length:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        size = min(size, self.length - self.sent)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self.sent += len(data)
+        return data
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            data = self.read(STREAM_CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+
+class MultipartBody(StreamBody):
+    """
+    multipart/form-data body of JSON fields and one streamed file
+
+    Use `content_type` as the request's Content-Type header.
+    """
+
+    def __init__(self, json_fields: dict, file_field: str, filename: str, file_type: str, file_body: StreamBody):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = b"".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n'
+            f"Content-Type: application/json\r\n\r\n{value}\r\n".encode()
+            for name, value in json_fields.items()
+        )
+        safe_name = filename.replace('"', "'").replace("\r", " ").replace("\n", " ")
+        head += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{safe_name}"\r\n'
+            f"Content-Type: {file_type or 'application/octet-stream'}\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        parts: List[Union[bytes, StreamBody]] = [head, file_body, tail]
+        super().__init__(self._iter_parts(parts), len(head) + len(file_body) + len(tail))
+
+    @staticmethod
+    def _iter_parts(parts) -> Iterator[bytes]:
+        for part in parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part
+
+
+def sized_body(response, size: Optional[int] = None, max_size: Optional[int] = None) -> StreamBody:
+    """
+    Body streaming a download, with its length
+
+    The length is the given size or the response's Content-Length; without
+    either, the download is spooled to a temporary file first.
+
+    Raises:
+        ValueError: If the download is larger than max_size
+    """
+    length = size or int(response.headers.get("Content-Length") or 0) or None
+    if length is not None:
+        if max_size is not None and length > max_size:
+            raise ValueError(f"File is larger than {max_size} bytes")
+        return StreamBody(response.iter_content(STREAM_CHUNK_SIZE), length)
+
+    spool: IO[bytes] = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_SIZE)
+    length = 0
+    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+        length += len(chunk)
+        if max_size is not None and length > max_size:
+            spool.close()
+            raise ValueError(f"File is larger than {max_size} bytes")
+        spool.write(chunk)
+    spool.seek(0)
+
+    def chunks() -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = spool.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            spool.close()
+
+    return StreamBody(chunks(), length)
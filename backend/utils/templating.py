@@ -0,0 +1,54 @@
+"""
+Placeholders in rule actions
+
+String values of an action may reference event data with double braces,
+e.g. "Ticket {{ticket.id}} from {{organization.name}}". Paths are dotted keys
+(list items by index: "{{ticket.tags.0}}"); a path that does not resolve
+renders as an empty string. A string that is only one placeholder keeps the
+referenced value's type, so "{{ticket.tags}}" yields a list.
+"""
+import json
+import re
+from typing import Any, Dict
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([\w.-]+)\s*\}\}")
+
+
+def resolve(path: str, context: Dict[str, Any]) -> Any:
+    """Look up a dotted path in the context (None if it does not exist)"""
+    value: Any = context
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def render(value: Any, context: Dict[str, Any]) -> Any:
+    """Replace placeholders in every string of a (nested) action value"""
+    if isinstance(value, str):
+        if "{{" not in value:
+            return value
+        whole = _PLACEHOLDER.fullmatch(value.strip())
+        if whole:
+            resolved = resolve(whole.group(1), context)
+            return "" if resolved is None else resolved
+        return _PLACEHOLDER.sub(lambda match: _to_text(resolve(match.group(1), context)), value)
+    if isinstance(value, dict):
+        return {key: render(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render(item, context) for item in value]
+    return value
@@ -0,0 +1,65 @@
+# backend/worker.py
+"""
+Worker process entry point
+
+Runs queued events outside the web process. Set PROCESSING_MODE=queue on the
+web service so webhooks enqueue instead of executing rules inline, then start
+as many workers as needed (on any number of machines):
+
+    python worker.py
+"""
+import asyncio
+import signal
+
+from db import init_db, close_db
+from services.bulk_mutations import flush_bulk_mutations
+from services.linear_batcher import flush_linear_batcher
+from services.discord_delivery import flush_discord_delivery
+from services.debounce import flush_debouncer
+from services.execution_log import start_execution_log, stop_execution_log
+from services.execution_maintenance import ensure_partitions
+from services.scheduler import start_scheduler, stop_scheduler
+from services.window_aggregator import start_window_checkpoints, stop_window_checkpoints
+from services.poller import start_poller, stop_poller
+from services.slack_directory import start_slack_directory, stop_slack_directory
+from services.worker import Worker
+from utils.log import configure_logging, shutdown_logging, get_logger
+
+configure_logging()
+logger = get_logger("app")
+
+
+async def main():
+    await init_db()
+    await ensure_partitions()
+    start_execution_log()
+    start_scheduler()
+    start_window_checkpoints()
+    start_poller()
+    start_slack_directory()
+
+    worker = Worker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await stop_poller()
+        await stop_slack_directory()
+        await stop_scheduler()
+        await flush_debouncer()
+        await flush_bulk_mutations()
+        await flush_linear_batcher()
+        await flush_discord_delivery()
+        await stop_window_checkpoints()
+        await stop_execution_log()
+        await close_db()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown_logging()
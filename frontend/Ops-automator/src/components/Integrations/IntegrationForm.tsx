@@ -28,7 +28,8 @@ const IntegrationForm = () => {
   const integrationTypes = [
     { value: 'zendesk', label: 'Zendesk' },
     { value: 'freshdesk', label: 'Freshdesk' },
-    { value: 'slack', label: 'Slack' }
+    { value: 'slack', label: 'Slack' },
+    { value: 'trello', label: 'Trello' }
   ];
   
   // Configuration fields for each integration type
@@ -45,6 +46,10 @@ const IntegrationForm = () => {
     slack: [
       { name: 'webhook_url', label: 'Webhook URL', type: 'text', placeholder: 'https://hooks.slack.com/services/...' },
       { name: 'default_channel', label: 'Default Channel', type: 'text', placeholder: '#general' }
+    ],
+    trello: [
+      { name: 'api_key', label: 'API Key', type: 'password', placeholder: 'Your Trello API key' },
+      { name: 'token', label: 'Token', type: 'password', placeholder: 'Your Trello token' }
     ]
   };
 
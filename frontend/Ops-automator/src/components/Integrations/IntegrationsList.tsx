@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
+import { fetchAllPages } from '../../utils/fetchAllPages';
 
 interface Integration {
   id: string;
@@ -22,13 +23,7 @@ const IntegrationsList = () => {
         // For demo purposes, we're using a fixed user ID
         // In a real app, this would come from authentication
         const userId = 1;
-        const response = await fetch(`${API_URL}/integrations?user_id=${userId}`);
-        
-        if (!response.ok) {
-          throw new Error(`Error ${response.status}: ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+        const data = await fetchAllPages<Integration>(`${API_URL}/integrations?user_id=${userId}`);
         setIntegrations(data);
       } catch (err) {
         setError(err instanceof Error ? err.message : 'Failed to fetch integrations');
@@ -70,7 +65,8 @@ const IntegrationsList = () => {
       'freshdesk': 'Freshdesk',
       'jira': 'Jira',
       'github': 'GitHub',
-      'slack': 'Slack'
+      'slack': 'Slack',
+      'trello': 'Trello'
     };
     
     return types[type] || type;
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
+import { fetchAllPages } from '../../utils/fetchAllPages';
 
 interface Action {
   platform: string;
@@ -116,11 +117,8 @@ const RuleEditor = () => {
     const fetchIntegrations = async () => {
       try {
         const API_URL = import.meta.env.VITE_API_URL || '';
-        const response = await fetch(`${API_URL}/integrations`);
-        if (response.ok) {
-          const data = await response.json();
-          setAvailableIntegrations(data);
-        }
+        const data = await fetchAllPages<{id: string, name: string, integration_type: string}>(`${API_URL}/integrations`);
+        setAvailableIntegrations(data);
       } catch (error) {
         console.error('Failed to fetch integrations:', error);
       }
@@ -148,7 +146,7 @@ const RuleEditor = () => {
 
   const handleActionPlatformChange = (e: React.ChangeEvent<HTMLSelectElement>) => {
     const platform = e.target.value;
-    const isIntegrationPlatform = ['zendesk', 'freshdesk', 'slack'].includes(platform);
+    const isIntegrationPlatform = ['zendesk', 'freshdesk', 'slack', 'trello'].includes(platform);
     const integrationsOfType = availableIntegrations.filter(i => i.integration_type === platform);
     
     setCurrentAction({
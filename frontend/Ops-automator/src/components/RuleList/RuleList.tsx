@@ -1,4 +1,5 @@
 import { useState, useEffect } from 'react';
+import { fetchAllPages } from '../../utils/fetchAllPages';
 
 interface Action {
   platform: string;
@@ -34,13 +35,7 @@ const RuleList = () => {
       setError(null);
       
       const API_URL = import.meta.env.VITE_API_URL || '';
-            const response = await fetch(`${API_URL}/rules/`);
-      
-      if (!response.ok) {
-        throw new Error(`Error fetching rules: ${response.statusText}`);
-      }
-      
-      const data = await response.json();
+      const data = await fetchAllPages<Rule>(`${API_URL}/rules/`);
       setRules(data);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to fetch rules');
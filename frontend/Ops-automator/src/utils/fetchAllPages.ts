@@ -0,0 +1,21 @@
+// List endpoints return one page at a time; the next page is requested by
+// passing the X-Next-Cursor response header back as `cursor`.
+export const fetchAllPages = async <T,>(url: string): Promise<T[]> => {
+  const items: T[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const separator = url.includes('?') ? '&' : '?';
+    const pageUrl: string = cursor ? `${url}${separator}cursor=${encodeURIComponent(cursor)}` : url;
+    const response: Response = await fetch(pageUrl);
+
+    if (!response.ok) {
+      throw new Error(`Error ${response.status}: ${response.statusText}`);
+    }
+
+    items.push(...(await response.json()));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return items;
+};